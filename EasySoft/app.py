@@ -4,10 +4,14 @@ from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 import os
 import logging
+import re
 import threading
+import time
 from config import Config
+from static_files import StaticIndex
 from services.chatbot_service import ChatbotService
 from services.weaviate_service import WeaviateService
+from services.document_admin_service import DocumentAdminService
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,6 +20,34 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 BASE_DIR = os.path.abspath(os.getcwd())
 app = Flask(__name__, static_url_path='/chatbotia/static')
 
+# Extensiones servidas por la ruta comodin (assets/, template/ y whxdata/ sirven cualquier archivo)
+ALLOWED_EXTENSIONS = (
+    '.htm', '.html', '.css', '.js', '.svg', '.jpg', '.jpeg', 
+    '.png', '.gif', '.ico', '.bmp', '.webp', '.tiff', '.pdf',
+    '.json', '.xml', '.txt', '.md'
+)
+
+# Indice de archivos estaticos: metadatos, ETag y variantes .gz calculados una vez al iniciar
+static_index = StaticIndex(
+    BASE_DIR, ALLOWED_EXTENSIONS,
+    open_dirs=('assets', 'template', 'whxdata'),
+    max_age=Config.STATIC_CACHE_MAX_AGE,
+    refresh_seconds=Config.STATIC_INDEX_REFRESH_SECONDS,
+    gzip_max_bytes=Config.STATIC_GZIP_MAX_BYTES,
+    logger=logging.getLogger(__name__)
+)
+
+def serve_indexed(rel_path, not_found_message="Archivo no encontrado"):
+    """Sirve un archivo del indice (gzip negociado, ETag, Cache-Control) o 404"""
+    started = time.perf_counter()
+    entry = static_index.lookup(rel_path)
+    response = static_index.response(entry, request, started) if entry else None
+    if response is None:
+        if entry is None:
+            static_index.not_found(started)
+        return not_found_message, 404
+    return response
+
 # ? CONFIGURACIN CORS MEJORADA PARA GITHUB PAGES
 CORS(app, 
      resources={
@@ -88,20 +120,103 @@ def handle_options():
         response.headers['Access-Control-Allow-Headers'] = 'Content-Type, X-Session-ID, Authorization'
     return response
 
-# Inicializar servicios
-weaviate_service = WeaviateService()
-chatbot_service = ChatbotService(weaviate_service)
+# Servicios: se crean en init_services(), una vez por proceso. Con serve.py cada worker los
+# crea despues del fork (las conexiones a Weaviate/OpenAI no se comparten entre procesos).
+# Con otros lanzadores (flask run, gunicorn app:app) se crean en el primer request que los usa
+weaviate_service = None
+chatbot_service = None
+document_admin_service = None
 chat_history_lock = threading.Lock()
+services_lock = threading.Lock()
+services_enabled = True   # serve.py --no-services: los endpoints que los usan responden 503
+SERVICE_ENDPOINTS = {
+    'chat', 'clear_chat_history', 'health_check', 'update_documents', 'get_ingest_job',
+    'cancel_ingest_job', 'get_document_stats', 'scan_documents'
+}
+
+# Arranque en caliente: /ready responde 200 cuando warm_up() termino en este proceso
+warmup_status = {"ready": False, "seconds": None, "steps": {}}
+warmup_lock = threading.Lock()
+# serve.py lo reemplaza por una funcion que devuelve (workers listos, workers totales)
+workers_ready = None
+
+LOCAL_REF = re.compile(r'(?:src|href)="(?!https?:|//|#|mailto:)([^"?#]+)"')
+
+def init_services():
+    """Crea los servicios de chat y administracion (una sola vez por proceso)"""
+    global weaviate_service, chatbot_service, document_admin_service
+    with services_lock:
+        if chatbot_service is None:
+            weaviate_service = WeaviateService()
+            chatbot_service = ChatbotService(weaviate_service)
+            document_admin_service = DocumentAdminService()
+
+@app.before_request
+def ensure_services():
+    """Crea los servicios en el primer request que los necesita; si no se puede, 503 con el motivo"""
+    if request.endpoint not in SERVICE_ENDPOINTS or chatbot_service is not None:
+        return None
+    if not services_enabled:
+        return jsonify({'error': 'Servicios deshabilitados en este proceso (--no-services)'}), 503
+    try:
+        init_services()
+    except Exception as e:
+        logging.error(f"? No se pudieron iniciar los servicios: {e}")
+        return jsonify({'error': f'Servicios no disponibles: {str(e)}'}), 503
+    return None
+
+def close_services():
+    if chatbot_service is not None:
+        chatbot_service.cleanup()
+    if document_admin_service is not None:
+        document_admin_service.close()
+
+def warm_static():
+    """Pide la portada y los recursos locales que referencia (rutas de Flask, indice y cache de disco)"""
+    entry = static_index.lookup('index.htm')
+    refs = []
+    if entry:
+        with open(entry.path, encoding='utf-8', errors='ignore') as f:
+            refs = LOCAL_REF.findall(f.read())
+    client = app.test_client()
+    for path in ['/', '/config.js', '/api/info'] + ['/' + ref.lstrip('./') for ref in refs]:
+        client.get(path, headers={'Accept-Encoding': 'gzip'}).close()
+
+def warm_up():
+    """Abre las conexiones y llena las caches antes de marcar el proceso como listo"""
+    started = time.perf_counter()
+    steps = {}
+
+    def step(name, fn):
+        step_started = time.perf_counter()
+        try:
+            fn()
+            steps[name] = f"{(time.perf_counter() - step_started) * 1000:.0f} ms"
+        except Exception as e:
+            logging.warning(f"?? Warm-up '{name}' fallo: {e}")
+            steps[name] = f"error: {e}"
+
+    if weaviate_service is not None and weaviate_service.client is not None:
+        step("weaviate", lambda: weaviate_service.client.collections.get(
+            weaviate_service.collection_name).query.fetch_objects(limit=1))
+    if weaviate_service is not None and weaviate_service.keyword_index is not None:
+        step("keyword_index", lambda: weaviate_service.keyword_index.search("EasySoft"))
+    if chatbot_service is not None and Config.WARMUP_OPENAI:
+        step("openai", lambda: chatbot_service.openai_service.create_embedding("EasySoft"))
+    step("static", warm_static)
+
+    warmup_status.update(ready=True, seconds=round(time.perf_counter() - started, 3), steps=steps)
+    logging.info(f"? Warm-up completo en {warmup_status['seconds']}s: {steps}")
 
 @app.route('/chatbotia/')
 @app.route('/')
 def index():
-    return send_from_directory(BASE_DIR, 'index.htm')
+    return serve_indexed('index.htm')
 
 @app.route('/favicon.ico')
 def favicon():
     """Maneja solicitudes de favicon"""
-    return send_from_directory(BASE_DIR, 'Favicon-EasySoft.svg', mimetype='image/svg+xml')
+    return serve_indexed('Favicon-EasySoft.svg')
 
 # Tambin agregar una ruta de bienvenida
 @app.route('/api/info')
@@ -133,60 +248,27 @@ window.CHATBOT_CONFIG = {{
 # Rutas para archivos estaticos con subpath
 @app.route('/assets/<path:filename>')
 def serve_assets(filename):
-    assets_path = os.path.join(BASE_DIR, 'assets')
-    file_path = os.path.join(assets_path, filename)
-    
-    if os.path.exists(file_path) and os.path.isfile(file_path):
-        directory = os.path.dirname(file_path)
-        filename_only = os.path.basename(file_path)
-        return send_from_directory(directory, filename_only)
-    else:
-        return f"Archivo no encontrado: assets/{filename}", 404
+    return serve_indexed(f"assets/{filename}", f"Archivo no encontrado: assets/{filename}")
 
 @app.route('/template/<path:filename>')
 def serve_template(filename):
-    template_path = os.path.join(BASE_DIR, 'template')
-    file_path = os.path.join(template_path, filename)
-    
-    if os.path.exists(file_path) and os.path.isfile(file_path):
-        directory = os.path.dirname(file_path)
-        filename_only = os.path.basename(file_path)
-        return send_from_directory(directory, filename_only)
-    else:
-        return f"Archivo no encontrado: template/{filename}", 404
+    return serve_indexed(f"template/{filename}", f"Archivo no encontrado: template/{filename}")
 
 @app.route('/whxdata/<path:filename>')
 def serve_whxdata(filename):
-    whxdata_path = os.path.join(BASE_DIR, 'whxdata')
-    file_path = os.path.join(whxdata_path, filename)
-    
-    if os.path.exists(file_path) and os.path.isfile(file_path):
-        directory = os.path.dirname(file_path)
-        filename_only = os.path.basename(file_path)
-        return send_from_directory(directory, filename_only)
-    else:
-        return f"Archivo no encontrado: whxdata/{filename}", 404
+    return serve_indexed(f"whxdata/{filename}", f"Archivo no encontrado: whxdata/{filename}")
 
 @app.route('/<path:filename>')
 def serve_static_files(filename):
     try:
-        full_path = os.path.join(BASE_DIR, filename)
-        allowed_extensions = (
-            '.htm', '.html', '.css', '.js', '.svg', '.jpg', '.jpeg', 
-            '.png', '.gif', '.ico', '.bmp', '.webp', '.tiff', '.pdf',
-            '.json', '.xml', '.txt', '.md'
-        )
-        
-        if os.path.isfile(full_path):
-            file_extension = os.path.splitext(filename)[1].lower()
-            if file_extension in allowed_extensions:
-                directory = os.path.dirname(full_path)
-                filename_only = os.path.basename(full_path)
-                return send_from_directory(directory, filename_only)
-            else:
+        started = time.perf_counter()
+        entry = static_index.lookup(filename)
+        if entry is None:
+            static_index.not_found(started)
+            if static_index.exists(filename):
                 return "Tipo de archivo no permitido", 403
-        else:
             return "Archivo no encontrado", 404
+        return static_index.response(entry, request, started) or ("Archivo no encontrado", 404)
             
     except Exception as e:
         logging.error(f"Error sirviendo archivo estatico {filename}: {e}")
@@ -232,6 +314,28 @@ def health_check():
     status_code = 200 if health_status.get("status") == "ok" else 503
     return jsonify(health_status), status_code
 
+@app.route('/ready', methods=['GET'])
+def ready_check():
+    """Readiness: 200 cuando el warm-up termino (con serve.py, en todos los workers)"""
+    if not warmup_status['ready'] and workers_ready is None:
+        # Sin serve.py ni app.py (flask run, gunicorn app:app): el primer /ready hace el warm-up
+        with warmup_lock:
+            if not warmup_status['ready']:
+                try:
+                    if services_enabled:
+                        init_services()
+                    warm_up()
+                except Exception as e:
+                    logging.error(f"? No se pudieron iniciar los servicios: {e}")
+                    return jsonify(dict(warmup_status, pid=os.getpid(), error=str(e))), 503
+    status = dict(warmup_status, pid=os.getpid())
+    ready = status['ready']
+    if workers_ready is not None:
+        done, total = workers_ready()
+        status['workers'] = {'ready': done, 'total': total}
+        ready = ready and done == total
+    return jsonify(status), 200 if ready else 503
+
 @app.route('/debug/files', methods=['GET'])
 def debug_files():
     try:
@@ -257,10 +361,15 @@ def debug_files():
     except Exception as e:
         return jsonify({"error": str(e)})
 
+@app.route('/debug/static', methods=['GET'])
+def debug_static():
+    """Bytes enviados/ahorrados por gzip, 304 y latencia de los archivos estaticos"""
+    return jsonify(static_index.stats())
+
 # Rutas de administracion con subpath
 @app.route('/admin/documents/update', methods=['POST'])
 def update_documents():
-    """Actualiza documentos en Weaviate"""
+    """Lanza la actualizacion de documentos como trabajo en segundo plano"""
     try:
         data = request.get_json() or {}
         document_path = data.get('path', 'C:\\Easysoft')
@@ -270,26 +379,21 @@ def update_documents():
         # if not is_admin_user(request):
         #     return jsonify({'error': 'No autorizado'}), 403
         
-        from weaviate_manager import WeaviateManager
-        
-        manager = WeaviateManager()
-        try:
-            stats = manager.update_documents(document_path, force_rebuild)
-            
-            if "error" in stats:
-                return jsonify({
-                    'success': False,
-                    'error': 'Error durante la actualizacion'
-                }), 500
-            
+        job, created = document_admin_service.submit_update(document_path, force_rebuild)
+        if not created:
             return jsonify({
-                'success': True,
-                'message': 'Documentos actualizados exitosamente',
-                'stats': stats
-            })
-            
-        finally:
-            manager.cleanup()
+                'success': False,
+                'error': f"Ya hay una ingesta en curso para la coleccion '{job.collection}'",
+                'job_id': job.id,
+                'status_url': f'/admin/jobs/{job.id}'
+            }), 409
+        
+        return jsonify({
+            'success': True,
+            'message': 'Actualizacion iniciada en segundo plano',
+            'job_id': job.id,
+            'status_url': f'/admin/jobs/{job.id}'
+        }), 202
             
     except Exception as e:
         logging.error(f"Error en update_documents: {e}")
@@ -298,68 +402,47 @@ def update_documents():
             'error': f'Error del servidor: {str(e)}'
         }), 500
 
+@app.route('/admin/jobs/<job_id>', methods=['GET'])
+def get_ingest_job(job_id):
+    """Avance de un trabajo de ingesta (archivos, chunks, throughput, errores)"""
+    job = document_admin_service.get_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    return jsonify({'success': True, 'job': document_admin_service.to_dict(job)})
+
+@app.route('/admin/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_ingest_job(job_id):
+    """Cancela un trabajo de ingesta; lo ya procesado se conserva y se reanuda en la proxima actualizacion"""
+    job = document_admin_service.cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    if not job.cancel_requested.is_set():
+        return jsonify({
+            'success': False,
+            'error': f'El trabajo ya termino ({job.status})',
+            'job': document_admin_service.to_dict(job)
+        }), 409
+    return jsonify({'success': True, 'job': document_admin_service.to_dict(job)})
+
 @app.route('/admin/documents/stats', methods=['GET'])
 def get_document_stats():
-    '''Obtiene estadisticas de documentos con mejor manejo de errores'''
+    '''Estadisticas de documentos (en memoria; ?refresh=1 para recalcular)'''
     try:
-        logging.info("Obteniendo estadisticas de documentos...")
-        from weaviate_manager import WeaviateManager
+        refresh = request.args.get('refresh', '').lower() in ('1', 'true')
+        stats = document_admin_service.get_stats(refresh=refresh)
         
-        manager = WeaviateManager()
-        try:
-            # Verificar conexion a Weaviate
-            if not manager.weaviate_client or not manager.weaviate_client.is_ready():
-                logging.error("Weaviate no esta conectado o no esta listo")
-                return jsonify({
-                    'success': False,
-                    'error': 'No se pudo conectar a Weaviate',
-                    'stats': {
-                        'total_documents_weaviate': 0,
-                        'total_documents_registry': 0,
-                        'connection_status': 'disconnected'
-                    }
-                })
-            
-            # Verificar si la coleccion existe
-            if not manager.weaviate_client.collections.exists("Documento"):
-                logging.warning("La coleccion 'Documento' no existe")
-                return jsonify({
-                    'success': True,
-                    'stats': {
-                        'total_documents_weaviate': 0,
-                        'total_documents_registry': len(manager.document_registry),
-                        'vectorized_documents': 0,
-                        'documents_with_errors': 0,
-                        'collection_exists': False
-                    }
-                })
-            
-            # Obtener estadisticas
-            stats = manager.get_statistics()
-            
-            # Agregar informacion adicional
-            stats['connection_status'] = 'connected'
-            stats['collection_exists'] = True
-            
-            if "error" in stats:
-                logging.error(f"Error en estadisticas: {stats['error']}")
-                return jsonify({
-                    'success': False,
-                    'error': stats['error'],
-                    'stats': {
-                        'total_documents_weaviate': 0,
-                        'total_documents_registry': 0
-                    }
-                })
-            
-            logging.info(f"Estadisticas obtenidas exitosamente: {stats}")
+        if "error" in stats:
+            logging.error(f"Error en estadisticas: {stats['error']}")
             return jsonify({
-                'success': True,
+                'success': False,
+                'error': stats['error'],
                 'stats': stats
             })
-            
-        finally:
-            manager.cleanup()
+        
+        return jsonify({
+            'success': True,
+            'stats': stats
+        })
             
     except Exception as e:
         logging.error(f"Error en get_document_stats: {e}")
@@ -380,30 +463,29 @@ def scan_documents():
         data = request.get_json() or {}
         document_path = data.get('path', 'C:\\Local\\EasySoft')
         
-        from weaviate_manager import WeaviateManager
-        
-        manager = WeaviateManager()
-        try:
-            found_files = manager.scan_directory(document_path)
-            changes = manager.detect_changes(found_files)
-            
-            # Preparar resumen
-            summary = {}
-            for change_type, files in changes.items():
-                summary[change_type] = {
-                    'count': len(files),
-                    'files': [os.path.basename(f) for f in files[:10]]  # Primeros 10
-                }
-            
+        changes, total_files_found, job = document_admin_service.scan(document_path)
+        if job is not None:
             return jsonify({
-                'success': True,
-                'path': document_path,
-                'summary': summary,
-                'total_files_found': len(found_files)
-            })
-            
-        finally:
-            manager.cleanup()
+                'success': False,
+                'error': f"Hay una ingesta en curso para la coleccion '{job.collection}'",
+                'job_id': job.id,
+                'status_url': f'/admin/jobs/{job.id}'
+            }), 409
+        
+        # Preparar resumen
+        summary = {}
+        for change_type, files in changes.items():
+            summary[change_type] = {
+                'count': len(files),
+                'files': [os.path.basename(f) for f in files[:10]]  # Primeros 10
+            }
+        
+        return jsonify({
+            'success': True,
+            'path': document_path,
+            'summary': summary,
+            'total_files_found': total_files_found
+        })
             
     except Exception as e:
         logging.error(f"Error en scan_documents: {e}")
@@ -417,8 +499,11 @@ def admin_panel():
     return send_from_directory('.', 'admin_panel.html')
 
 if __name__ == '__main__':
+    # Servidor de desarrollo; en produccion usar serve.py (waitress)
     try:
+        init_services()
+        warm_up()
         print(f" Iniciando servidor en http://{Config.FLASK_HOST}:{Config.FLASK_PORT}/")
         app.run(debug=Config.FLASK_DEBUG, host=Config.FLASK_HOST, port=Config.FLASK_PORT)
     finally:
-        chatbot_service.cleanup()
\ No newline at end of file
+        close_services()
\ No newline at end of file
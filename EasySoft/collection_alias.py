@@ -0,0 +1,105 @@
+# collection_alias.py - Alias de colección propio (la versión de Weaviate usada no soporta aliases)
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import weaviate.classes as wvc
+from weaviate.classes.config import Configure, Property, DataType, Tokenization
+from weaviate.classes.query import Filter
+from weaviate.util import generate_uuid5
+
+ALIAS_COLLECTION = "DocumentoAlias"
+DEFAULT_ALIAS = "Documento"
+
+
+def _alias_uuid(alias: str) -> str:
+    return generate_uuid5(f"alias:{alias}")
+
+
+def _retired_uuid(collection_name: str) -> str:
+    return generate_uuid5(f"retired:{collection_name}")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _ensure_alias_collection(client):
+    if not client.collections.exists(ALIAS_COLLECTION):
+        client.collections.create(
+            name=ALIAS_COLLECTION,
+            properties=[
+                Property(name="nombre", data_type=DataType.TEXT, tokenization=Tokenization.FIELD),
+                Property(name="destino", data_type=DataType.TEXT, tokenization=Tokenization.FIELD),
+                Property(name="estado", data_type=DataType.TEXT, tokenization=Tokenization.FIELD),
+                Property(name="fecha", data_type=DataType.DATE),
+            ],
+            vectorizer_config=Configure.Vectorizer.none()
+        )
+    return client.collections.get(ALIAS_COLLECTION)
+
+
+def _upsert(client, uuid: str, properties: dict):
+    collection = _ensure_alias_collection(client)
+    result = collection.data.insert_many([wvc.data.DataObject(properties=properties, uuid=uuid)])
+    if result.errors:
+        raise RuntimeError(next(iter(result.errors.values())).message)
+
+
+def resolve_collection(client, alias: str = DEFAULT_ALIAS) -> str:
+    """Colección a la que apunta el alias; sin alias guardado es la colección con ese nombre"""
+    if not client.collections.exists(ALIAS_COLLECTION):
+        return alias
+    obj = client.collections.get(ALIAS_COLLECTION).query.fetch_object_by_id(_alias_uuid(alias))
+    if obj is None or not obj.properties.get("destino"):
+        return alias
+    return obj.properties["destino"]
+
+
+def _version_number(name: str, alias: str) -> Optional[int]:
+    match = re.match(rf"^{re.escape(alias)}_v(\d+)$", name, re.IGNORECASE)
+    return int(match.group(1)) if match else None
+
+
+def list_versions(client, alias: str = DEFAULT_ALIAS) -> List[str]:
+    """Colecciones versionadas existentes del alias, de la más antigua a la más nueva"""
+    names = [name for name in client.collections.list_all(simple=True) if _version_number(name, alias) is not None]
+    return sorted(names, key=lambda name: _version_number(name, alias))
+
+
+def next_version_name(client, alias: str = DEFAULT_ALIAS) -> str:
+    """Siguiente nombre versionado libre: Documento_v1, Documento_v2, ..."""
+    versions = list_versions(client, alias)
+    last = _version_number(versions[-1], alias) if versions else 0
+    return f"{alias}_v{last + 1}"
+
+
+def swap_alias(client, target: str, alias: str = DEFAULT_ALIAS) -> Optional[str]:
+    """Apunta el alias a target y marca la colección anterior como retirada; devuelve la anterior"""
+    previous = resolve_collection(client, alias)
+    _upsert(client, _alias_uuid(alias), {"nombre": alias, "destino": target, "estado": "alias", "fecha": _now()})
+    if previous != target and client.collections.exists(previous):
+        _upsert(client, _retired_uuid(previous), {"nombre": previous, "destino": target, "estado": "retirada", "fecha": _now()})
+        return previous
+    return None
+
+
+def collect_garbage(client, grace: timedelta, alias: str = DEFAULT_ALIAS) -> List[str]:
+    """Elimina las colecciones retiradas hace más de 'grace' (nunca la que apunta el alias)"""
+    if not client.collections.exists(ALIAS_COLLECTION):
+        return []
+    current = resolve_collection(client, alias)
+    collection = client.collections.get(ALIAS_COLLECTION)
+    response = collection.query.fetch_objects(filters=Filter.by_property("estado").equal("retirada"), limit=1000)
+    cutoff = datetime.now(timezone.utc) - grace
+    deleted = []
+    for obj in response.objects:
+        name = obj.properties.get("nombre")
+        retired_at = obj.properties.get("fecha")
+        if not name or name == current or (retired_at and retired_at > cutoff):
+            continue
+        if client.collections.exists(name):
+            client.collections.delete(name)
+        collection.data.delete_by_id(obj.uuid)
+        deleted.append(name)
+    return deleted
@@ -18,10 +18,24 @@ class Config:
     # ?? MEJORA PARA CONSISTENCIA: Umbral más permisivo
     WEAVIATE_DISTANCE_THRESHOLD = float(os.getenv('WEAVIATE_DISTANCE_THRESHOLD', 0.45))  # Era 0.35, ahora 0.45
     
+    # Pata léxica en el proceso: BM25 sobre el índice de búsqueda de RoboHelp (whxdata) en vez de hybrid
+    KEYWORD_SEARCH_ENABLED = os.getenv('KEYWORD_SEARCH_ENABLED', 'True').lower() == 'true'
+    WHXDATA_PATH = os.getenv('WHXDATA_PATH', 'whxdata')
+    KEYWORD_CANDIDATE_FACTOR = int(os.getenv('KEYWORD_CANDIDATE_FACTOR', 3))  # Candidatos vectoriales por resultado
+    KEYWORD_FUSION_K = int(os.getenv('KEYWORD_FUSION_K', 60))  # Constante de Reciprocal Rank Fusion
+    KEYWORD_STRONG_RANK = int(os.getenv('KEYWORD_STRONG_RANK', 3))  # Top-k BM25: entra aunque supere el umbral de distancia
+    
     # Flask - Para desarrollo local con subpath
     FLASK_HOST = os.getenv('FLASK_HOST', '0.0.0.0')
     FLASK_PORT = int(os.getenv('FLASK_PORT', 5000))
     FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+
+    # Producción (serve.py): waitress con workers preforkeados sobre el mismo socket
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', 1))  # Procesos; el historial de chat y los trabajos de ingesta son por proceso
+    WEB_THREADS = int(os.getenv('WEB_THREADS', 8))  # Hilos por worker (las esperas a OpenAI/Weaviate liberan el GIL)
+    WEB_CONNECTION_LIMIT = int(os.getenv('WEB_CONNECTION_LIMIT', 100))  # Conexiones abiertas por worker
+    WEB_SHUTDOWN_TIMEOUT = float(os.getenv('WEB_SHUTDOWN_TIMEOUT', 30))  # Segundos para terminar antes de SIGKILL
+    WARMUP_OPENAI = os.getenv('WARMUP_OPENAI', 'True').lower() == 'true'  # Un embedding de prueba abre la conexión TLS
     
     # URLs para desarrollo local con subpath
     BASE_URL = os.getenv('BASE_URL', 'http://intranetqa.bas.com.ar/chatbotia')
@@ -30,7 +44,84 @@ class Config:
     MAX_HISTORY_MESSAGES = int(os.getenv('MAX_HISTORY_MESSAGES', 8))  # Era 6, ahora 8
     SIMILARITY_THRESHOLD = float(os.getenv('SIMILARITY_THRESHOLD', 0.80))  # Era 0.80, ahora 0.65
     OPENAI_MAX_OUTPUT_TOKENS = int(os.getenv('OPENAI_MAX_OUTPUT_TOKENS', 1800))  # Era 1500, ahora 1800
-    
+
+    # Latencia de OpenAI: reintentos con backoff (jitter) y hedging de embeddings
+    OPENAI_REQUEST_TIMEOUT = float(os.getenv('OPENAI_REQUEST_TIMEOUT', 60))
+    OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 2))
+    OPENAI_RETRY_BASE_DELAY = float(os.getenv('OPENAI_RETRY_BASE_DELAY', 0.5))
+    OPENAI_RETRY_MAX_DELAY = float(os.getenv('OPENAI_RETRY_MAX_DELAY', 8))
+    OPENAI_HEDGE_EMBEDDINGS = os.getenv('OPENAI_HEDGE_EMBEDDINGS', 'False').lower() == 'true'
+    OPENAI_HEDGE_PERCENTILE = float(os.getenv('OPENAI_HEDGE_PERCENTILE', 95))
+    OPENAI_HEDGE_DEFAULT_DELAY = float(os.getenv('OPENAI_HEDGE_DEFAULT_DELAY', 1.0))  # Hasta tener muestras
+    OPENAI_HEDGE_MIN_SAMPLES = int(os.getenv('OPENAI_HEDGE_MIN_SAMPLES', 20))
+
+    # Ruteo por niveles: modelo liviano para follow-ups y respuestas cortas
+    OPENAI_CHAT_MODEL = os.getenv('OPENAI_CHAT_MODEL', 'gpt-5-mini')
+    OPENAI_LIGHT_MODEL = os.getenv('OPENAI_LIGHT_MODEL', 'gpt-5-nano')
+    OPENAI_LIGHT_MAX_OUTPUT_TOKENS = int(os.getenv('OPENAI_LIGHT_MAX_OUTPUT_TOKENS', 900))
+    ROUTING_ENABLED = os.getenv('ROUTING_ENABLED', 'True').lower() == 'true'
+    ROUTING_LIGHT_MAX_CONTEXT_CHARS = int(os.getenv('ROUTING_LIGHT_MAX_CONTEXT_CHARS', 2500))
+    # Opcional: también van al liviano las primeras preguntas con hasta N resultados (0 = desactivado)
+    ROUTING_LIGHT_MAX_RESULTS = int(os.getenv('ROUTING_LIGHT_MAX_RESULTS', 0))
+    # Precios USD por millón de tokens "modelo:entrada:salida" (para estimar costo por nivel)
+    OPENAI_MODEL_PRICES = os.getenv('OPENAI_MODEL_PRICES', 'gpt-5-mini:0.25:2.00,gpt-5-nano:0.05:0.40')
+
+    # Ingesta: embeddings por lotes (cantidad de items y tokens estimados por request)
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 128))
+    EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv('EMBEDDING_BATCH_MAX_TOKENS', 200000))
+    EMBEDDING_BATCH_RETRIES = int(os.getenv('EMBEDDING_BATCH_RETRIES', 3))
+    WEAVIATE_INSERT_BATCH_SIZE = int(os.getenv('WEAVIATE_INSERT_BATCH_SIZE', 200))  # Objetos por insert_many
+    # Chunking medido en tokens del tokenizer local (tiktoken) del modelo de embeddings
+    TOKENIZER_ENCODING = os.getenv('TOKENIZER_ENCODING', 'cl100k_base')
+    CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', 512))
+    CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', 64))
+    EMBEDDING_MAX_INPUT_TOKENS = int(os.getenv('EMBEDDING_MAX_INPUT_TOKENS', 8191))  # Límite por texto de la API
+    # Archivos de texto plano desde este tamaño se procesan por streaming (sin cargarlos enteros)
+    STREAM_CHUNKING_MIN_BYTES = int(os.getenv('STREAM_CHUNKING_MIN_BYTES', 8 * 1024 * 1024))
+    STREAM_READ_CHARS = int(os.getenv('STREAM_READ_CHARS', 256 * 1024))  # Caracteres por lectura
+    # Chunks casi idénticos (SimHash de 64 bits): se guarda uno solo y las demás rutas quedan en el registro
+    NEAR_DUPLICATE_ENABLED = os.getenv('NEAR_DUPLICATE_ENABLED', 'True').lower() == 'true'
+    NEAR_DUPLICATE_MAX_DISTANCE = int(os.getenv('NEAR_DUPLICATE_MAX_DISTANCE', 3))  # Bits distintos tolerados
+    # Cache local de vectores por contenido del chunk: los chunks sin cambios no se re-vectorizan
+    EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', 'True').lower() == 'true'
+    EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', 'embedding_cache.sqlite3')
+    # Estimación previa (estimate): precio y límites de throughput para proyectar costo y duración
+    EMBEDDING_PRICE_PER_MILLION = float(os.getenv('EMBEDDING_PRICE_PER_MILLION', 0.10))  # USD por millón de tokens
+    EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv('EMBEDDING_TOKENS_PER_MINUTE', 1000000))  # Límite TPM de la cuenta
+    EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv('EMBEDDING_REQUESTS_PER_MINUTE', 3000))  # Límite RPM de la cuenta
+    WEAVIATE_INSERT_OBJECTS_PER_SECOND = float(os.getenv('WEAVIATE_INSERT_OBJECTS_PER_SECOND', 500))
+    # Registro de documentos (SQLite); document_metadata.json se migra automáticamente la primera vez
+    DOCUMENT_REGISTRY_PATH = os.getenv('DOCUMENT_REGISTRY_PATH', 'document_registry.sqlite3')
+
+    # Pipeline de ingesta: procesos para extracción/chunking, hilos para embeddings (0 = en el mismo proceso/hilo)
+    INGEST_EXTRACT_WORKERS = int(os.getenv('INGEST_EXTRACT_WORKERS', min(4, os.cpu_count() or 1)))
+    INGEST_EMBED_WORKERS = int(os.getenv('INGEST_EMBED_WORKERS', 4))
+    INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', 8))  # Lotes en cola entre etapas (back-pressure)
+
+    # Detección de cambios: solo se hashean archivos con (tamaño, mtime) distinto al registro
+    SCAN_HASH_WORKERS = int(os.getenv('SCAN_HASH_WORKERS', 4))
+
+    # Reconstrucción sin corte: colecciones versionadas (Documento_vN) detrás de un alias propio
+    COLLECTION_ALIAS_REFRESH_SECONDS = float(os.getenv('COLLECTION_ALIAS_REFRESH_SECONDS', 30))
+    COLLECTION_GC_GRACE_HOURS = float(os.getenv('COLLECTION_GC_GRACE_HOURS', 24))  # Antes de borrar versiones retiradas
+    REBUILD_MAX_ERROR_RATIO = float(os.getenv('REBUILD_MAX_ERROR_RATIO', 0.02))  # Máximo de archivos con error para publicar
+    SNAPSHOT_PART_SIZE = int(os.getenv('SNAPSHOT_PART_SIZE', 5000))  # Objetos por parte en export/import (memoria acotada)
+    VERIFY_BATCH_SIZE = int(os.getenv('VERIFY_BATCH_SIZE', 5000))  # Objetos comparados (y huérfanos borrados) por tanda en verify
+
+    # Modo watch: eventos del sistema de archivos (inotify vía watchdog) o sondeo periódico
+    WATCH_DEBOUNCE_SECONDS = float(os.getenv('WATCH_DEBOUNCE_SECONDS', 2))   # Silencio antes de procesar una ráfaga
+    WATCH_MAX_DELAY_SECONDS = float(os.getenv('WATCH_MAX_DELAY_SECONDS', 30))  # Espera máxima con escrituras continuas
+    WATCH_POLL_SECONDS = float(os.getenv('WATCH_POLL_SECONDS', 10))  # Intervalo del sondeo (sin watchdog o --polling)
+    WATCH_BATCH_SIZE = int(os.getenv('WATCH_BATCH_SIZE', 500))  # Rutas pendientes / archivos por tanda
+
+    # Panel de administración: estadísticas en memoria (se recalculan tras cada ingesta)
+    ADMIN_STATS_TTL_SECONDS = float(os.getenv('ADMIN_STATS_TTL_SECONDS', 300))
+
+    # Archivos estáticos de la ayuda: índice en memoria, variantes .gz, ETag y Cache-Control
+    STATIC_CACHE_MAX_AGE = int(os.getenv('STATIC_CACHE_MAX_AGE', 604800))  # Segundos (las páginas .htm se revalidan siempre)
+    STATIC_INDEX_REFRESH_SECONDS = float(os.getenv('STATIC_INDEX_REFRESH_SECONDS', 300))  # 0 = solo al iniciar
+    STATIC_GZIP_MAX_BYTES = int(os.getenv('STATIC_GZIP_MAX_BYTES', 2 * 1024 * 1024))  # Sin .gz válido: comprimir en memoria hasta este tamaño
+
     # Configuración de subpath para reverse proxy
     APPLICATION_ROOT = '/chatbotia'
     
@@ -1080,14 +1080,30 @@ def admin_panel():
                 
                 const data = await response.json();
                 
-                if (data.success) {
-                    displayUpdateResults(data.stats);
+                if (!data.success) {
+                    log(`❌ Error en ${action.toLowerCase()}: ${data.error}`, 'error');
+                    resultsEl.innerHTML = `<div class="error">Error: ${data.error}</div>`;
+                    return;
+                }
+                
+                // La ingesta corre en segundo plano: consultar el avance del trabajo
+                log(`⏳ Trabajo ${data.job_id} en curso...`);
+                let job;
+                do {
+                    await new Promise(resolve => setTimeout(resolve, 2000));
+                    job = (await (await fetch(`${API_BASE}/admin/jobs/${data.job_id}`)).json()).job;
+                    const p = job.progress || {};
+                    resultsEl.innerHTML = `<div>⏳ ${p.files_done || 0}/${p.files_total || 0} archivos, ${p.chunks_embedded || 0} chunks (${p.chunks_per_second || 0}/s), ${p.errors || 0} errores</div>`;
+                } while (job.status === 'queued' || job.status === 'running');
+                
+                if (job.status === 'completed') {
+                    displayUpdateResults(job.result);
                     log(`✅ ${action} completada exitosamente`);
                     // Recargar estadísticas
                     loadStats();
                 } else {
-                    log(`❌ Error en ${action.toLowerCase()}: ${data.error}`, 'error');
-                    resultsEl.innerHTML = `<div class="error">Error: ${data.error}</div>`;
+                    log(`❌ ${action}: ${job.status} ${job.error || ''}`, 'error');
+                    resultsEl.innerHTML = `<div class="error">${job.status}: ${job.error || ''}</div>`;
                 }
             } catch (error) {
                 log(`❌ Error de conexión: ${error.message}`, 'error');
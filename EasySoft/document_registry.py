@@ -0,0 +1,328 @@
+# document_registry.py - Registro transaccional de documentos (SQLite con WAL)
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import asdict, fields
+from typing import Dict, Iterator, List, Optional
+
+
+class DocumentRegistry:
+    """
+    Registro de documentos procesados, con interfaz de diccionario {ruta: DocumentInfo}.
+    Cada asignación o borrado se confirma de inmediato (upsert por documento), así que
+    una ingesta interrumpida conserva lo que ya terminó. Las filas se leen a pedido y quedan
+    en memoria hasta que otro proceso (CLI, watch, panel) confirma cambios en la base: se
+    detecta con PRAGMA data_version antes de cada lectura o escritura.
+
+    Con staging=True usa las tablas staging_* de la misma base: ahí escribe un rebuild sin
+    tocar el registro de la colección publicada, y promote() lo reemplaza al publicar.
+    registry_meta guarda a qué colección corresponde cada juego de tablas.
+    """
+
+    TABLES = ("documents", "chunk_fingerprints", "chunk_duplicates")
+    META_SCHEMA = "CREATE TABLE IF NOT EXISTS registry_meta (key TEXT PRIMARY KEY, value TEXT)"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS {p}documents (
+            file_path TEXT PRIMARY KEY,
+            file_hash TEXT,
+            status TEXT NOT NULL,
+            error TEXT,
+            updated_at TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS {p}idx_documents_hash ON {p}documents (file_hash);
+        CREATE INDEX IF NOT EXISTS {p}idx_documents_status ON {p}documents (status);
+        CREATE INDEX IF NOT EXISTS {p}idx_documents_error ON {p}documents (error) WHERE error IS NOT NULL;
+        CREATE TABLE IF NOT EXISTS {p}chunk_fingerprints (
+            uuid TEXT PRIMARY KEY,
+            doc_path TEXT NOT NULL,
+            simhash INTEGER NOT NULL,
+            tokens INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS {p}idx_fingerprints_doc ON {p}chunk_fingerprints (doc_path);
+        CREATE TABLE IF NOT EXISTS {p}chunk_duplicates (
+            uuid TEXT PRIMARY KEY,
+            doc_path TEXT NOT NULL,
+            canonical_uuid TEXT NOT NULL,
+            canonical_simhash INTEGER NOT NULL,
+            tokens INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS {p}idx_duplicates_doc ON {p}chunk_duplicates (doc_path);
+        CREATE INDEX IF NOT EXISTS {p}idx_duplicates_canonical ON {p}chunk_duplicates (canonical_uuid);
+    """
+
+    def __init__(self, db_path: str, record_type, legacy_json_path: Optional[str] = None, logger=None,
+                 staging: bool = False):
+        self.db_path = db_path
+        self.staging = staging
+        self._p = "staging_" if staging else ""
+        self.record_type = record_type
+        self.logger = logger
+        self._field_names = {f.name for f in fields(record_type)}
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA.format(p=self._p))
+        self._conn.execute(self.META_SCHEMA)
+        self._conn.commit()
+
+        if legacy_json_path and not staging:
+            self._migrate_json(legacy_json_path)
+
+        # Filas ya leídas ({ruta: DocumentInfo o None si no está}); la base es la fuente de verdad
+        self._cache: Dict[str, Optional[object]] = {}
+        self._data_version = None
+
+    @staticmethod
+    def _status(info) -> str:
+        if info.error:
+            return "error"
+        return "vectorized" if info.vectorized else "pending"
+
+    def _from_values(self, values: Dict):
+        # Ignora campos desconocidos; los faltantes toman el valor por defecto del dataclass
+        return self.record_type(**{k: v for k, v in values.items() if k in self._field_names})
+
+    def _from_row(self, data: str):
+        return self._from_values(json.loads(data))
+
+    def _row(self, path: str, info) -> tuple:
+        return (path, info.file_hash, self._status(info), info.error, info.updated_at,
+                json.dumps(asdict(info), ensure_ascii=False))
+
+    def _migrate_json(self, json_path: str):
+        """Importa una única vez el document_metadata.json anterior"""
+        if not os.path.exists(json_path):
+            return
+        if self._conn.execute(f"SELECT COUNT(*) FROM {self._p}documents").fetchone()[0]:
+            return
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            rows = [self._row(path, self._from_values(info)) for path, info in data.items()]
+            with self._conn:
+                self._conn.executemany(f"INSERT OR REPLACE INTO {self._p}documents VALUES (?, ?, ?, ?, ?, ?)", rows)
+            os.replace(json_path, json_path + ".migrated")
+            if self.logger:
+                self.logger.info(f"?? Migrados {len(rows)} documentos desde {json_path}")
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f"?? Error migrando {json_path}: {e}")
+
+    def _revalidate(self):
+        """Descarta las filas en memoria si otra conexión confirmó cambios desde la última consulta"""
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._data_version = version
+            self._cache.clear()
+
+    # Interfaz de diccionario
+    def __contains__(self, path: str) -> bool:
+        return self.get(path) is not None
+
+    def __getitem__(self, path: str):
+        info = self.get(path)
+        if info is None:
+            raise KeyError(path)
+        return info
+
+    def get(self, path: str, default=None):
+        with self._lock:
+            self._revalidate()
+            if path not in self._cache:
+                row = self._conn.execute(f"SELECT data FROM {self._p}documents WHERE file_path = ?", (path,)).fetchone()
+                self._cache[path] = self._from_row(row[0]) if row else None
+            info = self._cache[path]
+        return default if info is None else info
+
+    def __setitem__(self, path: str, info):
+        with self._lock:
+            self._revalidate()
+            with self._conn:
+                self._conn.execute(f"INSERT OR REPLACE INTO {self._p}documents VALUES (?, ?, ?, ?, ?, ?)", self._row(path, info))
+            self._cache[path] = info
+
+    def __delitem__(self, path: str):
+        with self._lock:
+            self._revalidate()
+            with self._conn:
+                deleted = self._conn.execute(f"DELETE FROM {self._p}documents WHERE file_path = ?", (path,)).rowcount
+                self._conn.execute(f"DELETE FROM {self._p}chunk_fingerprints WHERE doc_path = ?", (path,))
+                self._conn.execute(f"DELETE FROM {self._p}chunk_duplicates WHERE doc_path = ?", (path,))
+            self._cache[path] = None
+        if not deleted:
+            raise KeyError(path)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self._p}documents").fetchone()[0]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return [path for (path,) in self._conn.execute(f"SELECT file_path FROM {self._p}documents")]
+
+    def values(self) -> List:
+        return [info for _, info in self.items()]
+
+    def items(self) -> List:
+        """Todas las filas (recorrido completo: stats, verify, rebuild); reutiliza las ya leídas"""
+        with self._lock:
+            self._revalidate()
+            result = []
+            for path, data in self._conn.execute(f"SELECT file_path, data FROM {self._p}documents"):
+                info = self._cache.get(path)
+                if info is None:
+                    info = self._cache[path] = self._from_row(data)
+                result.append((path, info))
+        return result
+
+    def clear(self):
+        with self._lock:
+            with self._conn:
+                self._conn.execute(f"DELETE FROM {self._p}documents")
+                self._conn.execute(f"DELETE FROM {self._p}chunk_fingerprints")
+                self._conn.execute(f"DELETE FROM {self._p}chunk_duplicates")
+            self._cache.clear()
+
+    # Colección a la que corresponde el registro
+    @property
+    def collection(self) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM registry_meta WHERE key = ?", (f"{self._p}collection",)).fetchone()
+        return row[0] if row else None
+
+    @collection.setter
+    def collection(self, name: Optional[str]):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO registry_meta VALUES (?, ?)", (f"{self._p}collection", name))
+
+    def promote(self):
+        """
+        Registro de staging -> registro publicado, en una sola transacción (los demás procesos
+        ven el anterior o el nuevo completo). Se llama después de mover el alias a la colección.
+        """
+        if not self.staging:
+            raise ValueError("Solo se promueve un registro de staging")
+        with self._lock:
+            with self._conn:
+                for table in self.TABLES:
+                    self._conn.execute(f"DELETE FROM {table}")
+                    self._conn.execute(f"INSERT INTO {table} SELECT * FROM staging_{table}")
+                    self._conn.execute(f"DELETE FROM staging_{table}")
+                self._conn.execute("INSERT OR REPLACE INTO registry_meta VALUES ('collection', ?)", (self.collection,))
+                self._conn.execute("DELETE FROM registry_meta WHERE key = 'staging_collection'")
+            self._cache.clear()
+
+    # Consultas indexadas
+    def _query(self, where: str, params: tuple) -> List:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT data FROM {self._p}documents WHERE {where}", params).fetchall()
+        return [self._from_row(data) for (data,) in rows]
+
+    def find_by_hash(self, file_hash: str) -> List:
+        return self._query("file_hash = ?", (file_hash,))
+
+    def by_status(self, status: str) -> List:
+        """status: 'vectorized', 'pending' o 'error'"""
+        return self._query("status = ?", (status,))
+
+    def with_errors(self) -> List:
+        return self._query("error IS NOT NULL", ())
+
+    def status_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute(f"SELECT status, COUNT(*) FROM {self._p}documents GROUP BY status").fetchall())
+
+    # Chunks casi duplicados: huellas de los canónicos y rutas alternativas de los omitidos
+    def fingerprints(self) -> List[tuple]:
+        """(uuid, documento, simhash con signo) de cada chunk canónico guardado en Weaviate"""
+        with self._lock:
+            return self._conn.execute(f"SELECT uuid, doc_path, simhash FROM {self._p}chunk_fingerprints").fetchall()
+
+    def replace_chunks(self, path: str, canonical: List[tuple], duplicates: List[tuple]):
+        """canonical: (uuid, simhash, tokens); duplicates: (uuid, canonical_uuid, canonical_simhash, tokens)"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute(f"DELETE FROM {self._p}chunk_fingerprints WHERE doc_path = ?", (path,))
+                self._conn.execute(f"DELETE FROM {self._p}chunk_duplicates WHERE doc_path = ?", (path,))
+                self._conn.executemany(f"INSERT OR REPLACE INTO {self._p}chunk_fingerprints VALUES (?, ?, ?, ?)",
+                                       [(uuid, path, fp, tokens) for uuid, fp, tokens in canonical])
+                self._conn.executemany(f"INSERT OR REPLACE INTO {self._p}chunk_duplicates VALUES (?, ?, ?, ?, ?)",
+                                       [(uuid, path, canonical_uuid, fp, tokens) for uuid, canonical_uuid, fp, tokens in duplicates])
+
+    def add_chunks(self, path: str, canonical: List[tuple], duplicates: List[tuple]):
+        """Como replace_chunks pero sin borrar los anteriores (documentos escritos por ventanas)"""
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(f"INSERT OR REPLACE INTO {self._p}chunk_fingerprints VALUES (?, ?, ?, ?)",
+                                       [(uuid, path, fp, tokens) for uuid, fp, tokens in canonical])
+                self._conn.executemany(f"INSERT OR REPLACE INTO {self._p}chunk_duplicates VALUES (?, ?, ?, ?, ?)",
+                                       [(uuid, path, canonical_uuid, fp, tokens) for uuid, canonical_uuid, fp, tokens in duplicates])
+
+    def orphaned_duplicates(self) -> List[str]:
+        """Documentos con chunks omitidos cuyo canónico ya no existe o cambió de contenido"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT DISTINCT d.doc_path FROM {self._p}chunk_duplicates d LEFT JOIN {self._p}chunk_fingerprints f "
+                "ON f.uuid = d.canonical_uuid AND f.simhash = d.canonical_simhash WHERE f.uuid IS NULL"
+            ).fetchall()
+        return [path for (path,) in rows if path in self]
+
+    def alternate_paths(self, canonical_uuid: str) -> List[str]:
+        """Otras rutas con un chunk casi idéntico al canónico indicado"""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT DISTINCT doc_path FROM {self._p}chunk_duplicates WHERE canonical_uuid = ?",
+                                      (canonical_uuid,)).fetchall()
+        return [path for (path,) in rows]
+
+    def duplicate_counts(self) -> Dict[str, int]:
+        """Chunks omitidos por documento (no tienen objeto en Weaviate)"""
+        with self._lock:
+            return dict(self._conn.execute(f"SELECT doc_path, COUNT(*) FROM {self._p}chunk_duplicates GROUP BY doc_path").fetchall())
+
+    def duplicate_uuids(self) -> Iterator[str]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT uuid FROM {self._p}chunk_duplicates").fetchall()
+        return (uuid for (uuid,) in rows)
+
+    def duplicate_stats(self) -> Dict[str, int]:
+        with self._lock:
+            count, tokens = self._conn.execute(f"SELECT COUNT(*), COALESCE(SUM(tokens), 0) FROM {self._p}chunk_duplicates").fetchone()
+            canonical = self._conn.execute(f"SELECT COUNT(DISTINCT canonical_uuid) FROM {self._p}chunk_duplicates").fetchone()[0]
+        return {"duplicate_chunks": count, "duplicate_tokens": tokens, "canonical_with_duplicates": canonical}
+
+    # Copia completa (export/import de la colección con sus vectores)
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "documents": {path: asdict(info) for path, info in self.items()},
+                "chunk_fingerprints": self._conn.execute(f"SELECT * FROM {self._p}chunk_fingerprints").fetchall(),
+                "chunk_duplicates": self._conn.execute(f"SELECT * FROM {self._p}chunk_duplicates").fetchall()
+            }
+
+    def restore(self, data: Dict):
+        """Reemplaza todo el registro por una copia tomada con snapshot()"""
+        documents = {path: self._from_values(values) for path, values in data.get("documents", {}).items()}
+        with self._lock:
+            with self._conn:
+                self._conn.execute(f"DELETE FROM {self._p}documents")
+                self._conn.execute(f"DELETE FROM {self._p}chunk_fingerprints")
+                self._conn.execute(f"DELETE FROM {self._p}chunk_duplicates")
+                self._conn.executemany(f"INSERT INTO {self._p}documents VALUES (?, ?, ?, ?, ?, ?)",
+                                       [self._row(path, info) for path, info in documents.items()])
+                self._conn.executemany(f"INSERT INTO {self._p}chunk_fingerprints VALUES (?, ?, ?, ?)",
+                                       [tuple(row) for row in data.get("chunk_fingerprints", [])])
+                self._conn.executemany(f"INSERT INTO {self._p}chunk_duplicates VALUES (?, ?, ?, ?, ?)",
+                                       [tuple(row) for row in data.get("chunk_duplicates", [])])
+            self._cache = dict(documents)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
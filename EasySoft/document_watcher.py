@@ -0,0 +1,190 @@
+# document_watcher.py - Modo watch: cambios del sistema de archivos -> actualización incremental
+import os
+import threading
+import time
+from typing import Callable, List, Optional, Set
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:   # Sin watchdog se usa el sondeo periódico
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class PendingPaths:
+    """
+    Rutas tocadas a la espera de procesarse, con debounce: una ráfaga de escrituras se
+    entrega como una sola tanda cuando hay WATCH_DEBOUNCE_SECONDS sin eventos (o tras
+    max_delay si las escrituras no paran). El tamaño está acotado: al superar max_paths
+    las rutas se agrupan en su directorio padre, que luego se recorre.
+    """
+
+    def __init__(self, root_path: str, debounce: float, max_delay: float, max_paths: int):
+        self.root_path = os.path.abspath(root_path)
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_paths = max(1, max_paths)
+        self._paths: Set[str] = set()
+        self._first = 0.0
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, path: str):
+        now = time.monotonic()
+        with self._lock:
+            if not self._paths:
+                self._first = now
+            self._paths.add(os.path.abspath(path))
+            self._last = now
+            if len(self._paths) > self.max_paths:
+                self._collapse()
+
+    def _collapse(self):
+        while len(self._paths) > self.max_paths:
+            parents = set()
+            for path in self._paths:
+                parent = os.path.dirname(path)
+                # Nunca por encima de la raíz vigilada
+                inside = parent == self.root_path or parent.startswith(self.root_path.rstrip(os.sep) + os.sep)
+                parents.add(parent if inside else path)
+            if parents == self._paths:
+                break
+            self._paths = parents
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._paths)
+
+    def take_ready(self) -> Optional[List[str]]:
+        """Devuelve la tanda si ya pasó el debounce (o la espera máxima); si no, None"""
+        now = time.monotonic()
+        with self._lock:
+            if not self._paths:
+                return None
+            if now - self._last < self.debounce and now - self._first < self.max_delay:
+                return None
+            batch = sorted(self._paths)
+            self._paths = set()
+            return batch
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Traduce los eventos de watchdog a rutas pendientes"""
+
+    EVENTS = {"created", "modified", "deleted", "moved", "closed"}
+
+    def __init__(self, pending: PendingPaths):
+        super().__init__()
+        self.pending = pending
+
+    def on_any_event(self, event):
+        if event.event_type not in self.EVENTS:
+            return
+        # La fecha de un directorio cambia con cada archivo hijo: ese evento ya llega aparte
+        if event.is_directory and event.event_type == "modified":
+            return
+        self.pending.add(event.src_path)
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.pending.add(dest_path)
+
+
+class DocumentWatcher:
+    """
+    Vigila root_path y entrega tandas de rutas tocadas a on_batch (WeaviateManager.update_paths).
+    Con watchdog usa inotify (o el backend nativo del sistema); sin él, o con polling=True,
+    recorre el árbol cada poll_interval comparando mtime/ctime con el sondeo anterior, sin
+    guardar una foto del árbol: la memoria no depende de la cantidad de archivos.
+    """
+
+    def __init__(self, root_path: str, on_batch: Callable[[List[str]], object],
+                 registered_paths: Callable[[], List[str]] = None,
+                 debounce: float = 2.0, max_delay: float = 30.0, max_paths: int = 500,
+                 poll_interval: float = 10.0, polling: bool = False, logger=None):
+        self.root_arg = root_path
+        self.root_path = os.path.abspath(root_path)
+        self.on_batch = on_batch
+        self.registered_paths = registered_paths or (lambda: [])
+        self.poll_interval = poll_interval
+        self.polling = polling or Observer is None
+        self.logger = logger
+        self.pending = PendingPaths(self.root_path, debounce, max_delay, max_paths)
+        self._tick = max(0.05, min(debounce, 0.5))
+        self._stop = threading.Event()
+        self._observer = None
+        self._since_ns = 0
+
+    def _log(self, message: str):
+        if self.logger:
+            self.logger.info(message)
+
+    def _as_registered(self, path: str) -> str:
+        """Ruta con la misma raíz que se usó al escanear (las claves del registro)"""
+        relative = os.path.relpath(path, self.root_path)
+        return self.root_arg if relative == os.curdir else os.path.join(self.root_arg, relative)
+
+    def _iter_files(self):
+        """Recorrido con os.scandir (una entrada de directorio a la vez)"""
+        stack = [self.root_path]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file():
+                            yield entry
+            except OSError:
+                continue
+
+    def poll(self):
+        """Un sondeo: archivos con mtime/ctime posterior al sondeo anterior y registrados que ya no existen"""
+        started_ns = time.time_ns()
+        for entry in self._iter_files():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            # ctime cubre archivos movidos dentro del árbol (conservan su mtime)
+            if max(stat.st_mtime_ns, stat.st_ctime_ns) >= self._since_ns:
+                self.pending.add(entry.path)
+        prefix = self.root_path.rstrip(os.sep) + os.sep
+        for file_path in self.registered_paths():
+            if os.path.abspath(file_path).startswith(prefix) and not os.path.exists(file_path):
+                self.pending.add(file_path)
+        self._since_ns = started_ns
+
+    def start(self):
+        self._since_ns = time.time_ns()
+        if not self.polling:
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self.pending), self.root_path, recursive=True)
+            self._observer.start()
+            self._log(f"?? Vigilando {self.root_path} (eventos del sistema de archivos)")
+        else:
+            self._log(f"?? Vigilando {self.root_path} (sondeo cada {self.poll_interval:.0f}s)")
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def run(self):
+        """Bucle principal (bloquea hasta stop() o Ctrl+C); las tandas se procesan en este hilo"""
+        self.start()
+        next_poll = time.monotonic() + self.poll_interval
+        try:
+            while not self._stop.wait(self._tick):
+                if self.polling and time.monotonic() >= next_poll:
+                    self.poll()
+                    next_poll = time.monotonic() + self.poll_interval
+                batch = self.pending.take_ready()
+                if batch:
+                    self._log(f"?? {len(batch)} rutas modificadas")
+                    self.on_batch([self._as_registered(path) for path in batch])
+        finally:
+            self.stop()
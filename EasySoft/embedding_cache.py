@@ -0,0 +1,77 @@
+# embedding_cache.py - Cache persistente de embeddings por contenido (SQLite)
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Guarda vectores indexados por (sha256 del texto, modelo).
+    Un chunk con el mismo texto que en una ingesta anterior reutiliza su vector
+    sin volver a llamar a la API.
+    """
+
+    def __init__(self, db_path: str = "embedding_cache.sqlite3"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                   text_hash TEXT NOT NULL,
+                   model TEXT NOT NULL,
+                   dims INTEGER NOT NULL,
+                   vector BLOB NOT NULL,
+                   PRIMARY KEY (text_hash, model)
+               )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def text_key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: Iterable[str], model: str) -> Dict[str, List[float]]:
+        """Devuelve {hash: vector} para los textos ya vectorizados con ese modelo"""
+        keys = list({self.text_key(t) for t in texts})
+        found = {}
+        with self._lock:
+            # SQLite limita la cantidad de parámetros por consulta
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *part]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, Optional[List[float]]]], model: str) -> int:
+        """Guarda pares (texto, vector) como float32; ignora vectores vacíos"""
+        rows = [
+            (self.text_key(text), model, len(vector), np.asarray(vector, dtype=np.float32).tobytes())
+            for text, vector in items if vector
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (text_hash, model, dims, vector) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,106 @@
+# html_sections.py - Un solo parseo lxml por archivo HTML, dividido en secciones por títulos
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import lxml.html
+from lxml import etree
+
+HEADING_LEVELS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+SKIP_TAGS = {"head", "script", "style", "noscript", "template", "iframe", "object"}
+BLOCK_TAGS = {
+    "p", "div", "br", "li", "ul", "ol", "dl", "dt", "dd", "tr", "table", "section", "article",
+    "header", "footer", "nav", "aside", "main", "pre", "blockquote", "hr", "form", "fieldset",
+    "figure", "figcaption", "caption", "address", "body"
+}
+CELL_TAGS = {"td", "th"}
+
+_SPACES = re.compile(r"[ \t\r\f\v\xa0]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+
+@dataclass
+class HtmlSection:
+    """Texto bajo un título, con la ruta de títulos que lo contiene (h1 > h2 > ...)"""
+    heading_path: List[str]
+    text: str
+
+    @property
+    def title(self) -> str:
+        return " > ".join(self.heading_path)
+
+
+def _clean(text: str) -> str:
+    lines = (_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def parse_html_sections(content: str) -> Tuple[List[HtmlSection], Optional[str]]:
+    """
+    Recorre el documento una sola vez y lo corta en cada h1-h6. Ignora head/script/style.
+    Devuelve (secciones, título de la página).
+    """
+    if not content.strip():
+        return [], None
+    parser = lxml.html.HTMLParser(encoding="utf-8", remove_comments=True)
+    try:
+        root = lxml.html.document_fromstring(content.encode("utf-8"), parser=parser)
+    except etree.ParserError:
+        return [], None   # Documento sin elementos
+
+    page_title = _clean(root.findtext(".//title") or "") or None
+    path: List[Tuple[int, str]] = []
+    sections: List[Tuple[List[str], List[str]]] = [([], [])]
+    parts = sections[0][1]
+    skipping = None
+
+    for event, element in etree.iterwalk(root, events=("start", "end")):
+        tag = element.tag.lower() if isinstance(element.tag, str) else None
+
+        if event == "start":
+            if skipping is not None or tag is None:
+                continue
+            if tag in SKIP_TAGS:
+                skipping = element
+                continue
+            level = HEADING_LEVELS.get(tag)
+            if level:
+                heading = _clean(element.text_content())
+                if heading:
+                    while path and path[-1][0] >= level:
+                        path.pop()
+                    path.append((level, heading))
+                    parts = [heading, "\n"]
+                    sections.append(([title for _, title in path], parts))
+                skipping = element
+                continue
+            if element.text:
+                parts.append(element.text)
+            continue
+
+        # Fin del elemento: separador de bloque y luego el texto que le sigue (tail)
+        if skipping is not None:
+            if element is not skipping:
+                continue
+            skipping = None
+            if tag in HEADING_LEVELS:
+                parts.append("\n")
+        elif tag in BLOCK_TAGS:
+            parts.append("\n")
+        elif tag in CELL_TAGS:
+            parts.append(" ")
+        if element.tail:
+            parts.append(element.tail)
+
+    result = []
+    for heading_path, section_parts in sections:
+        text = _clean("".join(section_parts))
+        if text:
+            # El texto previo al primer título se asocia al título de la página
+            result.append(HtmlSection(heading_path or ([page_title] if page_title else []), text))
+    return result, page_title
+
+
+def sections_text(sections: List[HtmlSection]) -> str:
+    """Texto plano del documento completo (secciones separadas por una línea en blanco)"""
+    return "\n\n".join(section.text for section in sections)
@@ -0,0 +1,191 @@
+# ingest_journal.py - Journal de trabajos de ingesta (checkpoints para reanudar update/rebuild)
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class IngestJournal:
+    """
+    Registra cada trabajo de ingesta y el avance por archivo (chunks preparados/escritos).
+    Un trabajo que no terminó (corte de OpenAI, reinicio del contenedor) se reanuda
+    saltando los archivos ya completados.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS ingest_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            root_path TEXT NOT NULL,
+            status TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            resumed_at REAL NOT NULL,
+            done_at_resume INTEGER NOT NULL DEFAULT 0,
+            finished_at REAL
+        );
+        CREATE TABLE IF NOT EXISTS ingest_job_files (
+            job_id INTEGER NOT NULL,
+            file_path TEXT NOT NULL,
+            change_type TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            chunks_total INTEGER NOT NULL DEFAULT 0,
+            chunks_done INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            updated_at REAL,
+            PRIMARY KEY (job_id, file_path)
+        );
+        CREATE INDEX IF NOT EXISTS idx_job_files_state ON ingest_job_files (job_id, state);
+    """
+
+    RESUMABLE = ("running", "interrupted")
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            with self._conn:
+                return self._conn.execute(sql, params)
+
+    def find_resumable(self, kind: str, root_path: str) -> Optional[int]:
+        """Último trabajo del mismo tipo y ruta que quedó sin terminar"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT id FROM ingest_jobs WHERE kind = ? AND root_path = ? AND status IN ({','.join('?' * len(self.RESUMABLE))}) "
+                "ORDER BY id DESC LIMIT 1",
+                (kind, root_path, *self.RESUMABLE)
+            ).fetchone()
+        return row[0] if row else None
+
+    def find_unfinished(self, kind: str) -> Optional[int]:
+        """Último trabajo del tipo indicado, de cualquier ruta, en curso o pendiente de reanudar"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT id FROM ingest_jobs WHERE kind = ? AND status IN ({','.join('?' * len(self.RESUMABLE))}) "
+                "ORDER BY id DESC LIMIT 1",
+                (kind, *self.RESUMABLE)
+            ).fetchone()
+        return row[0] if row else None
+
+    def start(self, kind: str, root_path: str, files: List[Tuple[str, str]]) -> int:
+        """Crea un trabajo con sus archivos [(change_type, ruta)] en estado pendiente"""
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute(
+                    "INSERT INTO ingest_jobs (kind, root_path, status, started_at, resumed_at) VALUES (?, ?, 'running', ?, ?)",
+                    (kind, root_path, now, now)
+                )
+                job_id = cursor.lastrowid
+                self._conn.executemany(
+                    "INSERT INTO ingest_job_files (job_id, file_path, change_type, updated_at) VALUES (?, ?, ?, ?)",
+                    [(job_id, path, change_type, now) for change_type, path in files]
+                )
+        return job_id
+
+    def resume(self, job_id: int, files: List[Tuple[str, str]]) -> Set[str]:
+        """Reabre un trabajo: agrega archivos nuevos y devuelve las rutas ya completadas"""
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                done = {path for (path,) in self._conn.execute(
+                    "SELECT file_path FROM ingest_job_files WHERE job_id = ? AND state = 'done'", (job_id,)
+                )}
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO ingest_job_files (job_id, file_path, change_type, updated_at) VALUES (?, ?, ?, ?)",
+                    [(job_id, path, change_type, now) for change_type, path in files]
+                )
+                self._conn.execute(
+                    "UPDATE ingest_jobs SET status = 'running', resumed_at = ?, done_at_resume = ? WHERE id = ?",
+                    (now, len(done), job_id)
+                )
+        return done
+
+    def mark_prepared(self, job_id: int, file_path: str, chunks_total: int):
+        self._execute(
+            "UPDATE ingest_job_files SET state = 'prepared', chunks_total = ?, updated_at = ? WHERE job_id = ? AND file_path = ?",
+            (chunks_total, time.time(), job_id, file_path)
+        )
+
+    def mark_done(self, job_id: int, file_path: str, chunks_done: int):
+        self._execute(
+            "UPDATE ingest_job_files SET state = 'done', chunks_done = ?, error = NULL, updated_at = ? WHERE job_id = ? AND file_path = ?",
+            (chunks_done, time.time(), job_id, file_path)
+        )
+
+    def mark_error(self, job_id: int, file_path: str, error: Optional[str]):
+        self._execute(
+            "UPDATE ingest_job_files SET state = 'error', error = ?, updated_at = ? WHERE job_id = ? AND file_path = ?",
+            (error, time.time(), job_id, file_path)
+        )
+
+    def finish(self, job_id: int, status: str = "completed"):
+        self._execute("UPDATE ingest_jobs SET status = ?, finished_at = ? WHERE id = ?", (status, time.time(), job_id))
+
+    def abandon_unfinished(self):
+        """Descarta los trabajos pendientes de reanudar (p. ej. tras un reset de la base)"""
+        self._execute(
+            f"UPDATE ingest_jobs SET status = 'abandoned', finished_at = ? WHERE status IN ({','.join('?' * len(self.RESUMABLE))})",
+            (time.time(), *self.RESUMABLE)
+        )
+
+    def progress(self, job_id: Optional[int] = None) -> Optional[Dict]:
+        """Avance del trabajo indicado (o del último) con velocidad y ETA estimada"""
+        with self._lock:
+            if job_id is None:
+                row = self._conn.execute("SELECT id FROM ingest_jobs ORDER BY id DESC LIMIT 1").fetchone()
+                if not row:
+                    return None
+                job_id = row[0]
+            job = self._conn.execute(
+                "SELECT kind, root_path, status, started_at, resumed_at, done_at_resume, finished_at FROM ingest_jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+            if not job:
+                return None
+            states = dict(self._conn.execute(
+                "SELECT state, COUNT(*) FROM ingest_job_files WHERE job_id = ? GROUP BY state", (job_id,)
+            ).fetchall())
+            chunks_total, chunks_done = self._conn.execute(
+                "SELECT COALESCE(SUM(chunks_total), 0), COALESCE(SUM(chunks_done), 0) FROM ingest_job_files WHERE job_id = ?",
+                (job_id,)
+            ).fetchone()
+
+        kind, root_path, status, started_at, resumed_at, done_at_resume, finished_at = job
+        total = sum(states.values())
+        done = states.get("done", 0)
+        errors = states.get("error", 0)
+        remaining = total - done - errors
+
+        # Velocidad medida desde el último arranque/reanudación
+        end = finished_at or time.time()
+        session_seconds = max(end - resumed_at, 1e-6)
+        rate = (done - done_at_resume) / session_seconds
+        eta = remaining / rate if rate > 0 and status == "running" else None
+
+        return {
+            "job_id": job_id,
+            "kind": kind,
+            "root_path": root_path,
+            "status": status,
+            "files_total": total,
+            "files_done": done,
+            "files_error": errors,
+            "files_remaining": remaining,
+            "chunks_total": chunks_total,
+            "chunks_done": chunks_done,
+            "percent": round(100.0 * (done + errors) / total, 1) if total else 100.0,
+            "files_per_minute": round(rate * 60, 1),
+            "elapsed_seconds": round(end - started_at, 1),
+            "eta_seconds": round(eta) if eta is not None else None
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
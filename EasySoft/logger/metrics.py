@@ -0,0 +1,44 @@
+# logger/metrics.py - Métricas livianas en memoria (latencias y percentiles)
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+
+class LatencyWindow:
+    """
+    Ventana deslizante de latencias (en segundos).
+    Permite calcular percentiles recientes sin dependencias externas.
+    """
+
+    def __init__(self, maxlen: int = 500):
+        self._samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Devuelve el percentil pedido (0-100) o None si no hay muestras"""
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        idx = int(round(pct / 100.0 * (len(ordered) - 1)))
+        return ordered[max(0, min(idx, len(ordered) - 1))]
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """Resumen serializable (ms) para logs y endpoints de salud"""
+        def to_ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            "samples": len(self),
+            "p50_ms": to_ms(self.percentile(50)),
+            "p95_ms": to_ms(self.percentile(95)),
+            "p99_ms": to_ms(self.percentile(99)),
+            "max_ms": to_ms(self.percentile(100)),
+        }
@@ -0,0 +1,90 @@
+# near_duplicates.py - Detección de chunks casi idénticos con SimHash (64 bits)
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+SIMHASH_BITS = 64
+SHINGLE_WORDS = 3
+_WORDS = re.compile(r"\w+", re.UNICODE)
+
+
+def simhash(text: str, shingle_words: int = SHINGLE_WORDS) -> int:
+    """Huella SimHash de 64 bits sobre shingles de palabras (textos parecidos -> pocos bits distintos)"""
+    words = _WORDS.findall(text.lower())
+    if not words:
+        return 0
+    shingles = [" ".join(words[i:i + shingle_words]) for i in range(max(1, len(words) - shingle_words + 1))]
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles)
+    # Bits de cada hash (fila por shingle); el bit de la huella queda en 1 si es mayoría
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(len(shingles), SIMHASH_BITS)
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def to_signed(value: int) -> int:
+    """SQLite guarda enteros de 64 bits con signo"""
+    return value - (1 << SIMHASH_BITS) if value >= 1 << (SIMHASH_BITS - 1) else value
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << SIMHASH_BITS) if value < 0 else value
+
+
+class SimHashIndex:
+    """
+    Huellas de los chunks canónicos, buscables por distancia de Hamming <= max_distance.
+    La huella se parte en max_distance + 1 bloques: dos huellas a esa distancia coinciden
+    exactamente en al menos un bloque, así que solo se comparan los candidatos de esos bloques.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.blocks = max_distance + 1
+        self.block_bits = -(-SIMHASH_BITS // self.blocks)
+        self._tables: List[Dict[int, List[str]]] = [{} for _ in range(self.blocks)]
+        self._entries: Dict[str, Tuple[int, str]] = {}   # uuid -> (huella, documento)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _keys(self, fingerprint: int):
+        mask = (1 << self.block_bits) - 1
+        for block in range(self.blocks):
+            yield block, fingerprint >> (block * self.block_bits) & mask
+
+    def add(self, uuid: str, doc_path: str, fingerprint: int):
+        self.remove(uuid)
+        self._entries[uuid] = (fingerprint, doc_path)
+        for block, key in self._keys(fingerprint):
+            self._tables[block].setdefault(key, []).append(uuid)
+
+    def remove(self, uuid: str):
+        entry = self._entries.pop(uuid, None)
+        if entry is None:
+            return
+        for block, key in self._keys(entry[0]):
+            bucket = self._tables[block].get(key, [])
+            if uuid in bucket:
+                bucket.remove(uuid)
+
+    def remove_documents(self, doc_paths):
+        doc_paths = set(doc_paths)
+        for uuid in [u for u, (_, path) in self._entries.items() if path in doc_paths]:
+            self.remove(uuid)
+
+    def find(self, fingerprint: int) -> Optional[Tuple[str, int]]:
+        """Chunk canónico más cercano (uuid, huella), o None"""
+        best = None
+        for block, key in self._keys(fingerprint):
+            for uuid in self._tables[block].get(key, ()):
+                candidate = self._entries[uuid][0]
+                distance = hamming(fingerprint, candidate)
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, uuid, candidate)
+        return (best[1], best[2]) if best else None
@@ -0,0 +1,276 @@
+# serve.py - Servidor de producción: waitress con workers preforkeados y arranque en caliente
+import argparse
+import http.client
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.sharedctypes import RawArray
+
+from waitress.server import create_server
+
+from config import Config
+import app as web
+
+RESTART_BACKOFF_SECONDS = 5   # Un worker que muere al arrancar no se relanza en bucle
+
+
+def _exit_on_signal(signum, frame):
+    raise SystemExit(0)
+
+
+def bind_socket(host: str, port: int, backlog: int = 1024) -> socket.socket:
+    """Socket de escucha creado antes del fork: todos los workers hacen accept() sobre él"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+def run_worker(sock: socket.socket, threads: int, with_services: bool = True, slot: int = 0, ready_slots=None):
+    """
+    Un worker: crea sus servicios (después del fork), hace el warm-up y recién entonces
+    empieza a aceptar conexiones. Mientras tanto los demás workers atienden el socket.
+    """
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, _exit_on_signal)
+    try:
+        Config.WEB_THREADS = threads   # Dimensiona el pool de hedging de OpenAIService
+        web.services_enabled = with_services
+        if with_services:
+            web.init_services()
+        web.warm_up()
+        if ready_slots is not None:
+            ready_slots[slot] = 1
+            web.workers_ready = lambda: (sum(ready_slots), len(ready_slots))
+
+        server = create_server(web.app, sockets=[sock], threads=threads,
+                               connection_limit=Config.WEB_CONNECTION_LIMIT, ident="EasySoft")
+        logging.info(f"? Worker {os.getpid()} listo ({threads} hilos)")
+        server.run()   # SIGTERM/SIGINT: waitress cierra el dispatcher y vuelve
+    except SystemExit:
+        pass
+    finally:
+        web.close_services()
+
+
+def run_prefork(sock: socket.socket, workers: int, threads: int, with_services: bool = True):
+    """Proceso maestro: lanza los workers, relanza los que mueren y los termina al recibir SIGTERM"""
+    ready_slots = RawArray("b", workers)   # Memoria compartida: 1 = worker con warm-up terminado
+    children = {}   # pid -> (slot, inicio)
+    stopping = threading.Event()
+
+    def spawn(slot: int):
+        ready_slots[slot] = 0
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(sock, threads, with_services, slot, ready_slots)
+            except BaseException:
+                logging.exception(f"? Worker {os.getpid()} terminó con error")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = (slot, time.monotonic())
+
+    def stop(signum, frame):
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for slot in range(workers):
+        spawn(slot)
+    logging.info(f"?? Maestro {os.getpid()}: {workers} workers x {threads} hilos")
+
+    while not stopping.wait(0.5):
+        while children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            slot, started = children.pop(pid)
+            ready_slots[slot] = 0
+            logging.warning(f"?? Worker {pid} terminó (estado {status}); se relanza")
+            if time.monotonic() - started < RESTART_BACKOFF_SECONDS and stopping.wait(RESTART_BACKOFF_SECONDS):
+                break
+            spawn(slot)
+
+    logging.info("?? Deteniendo workers...")
+    for pid in list(children):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.monotonic() + Config.WEB_SHUTDOWN_TIMEOUT
+    while children and time.monotonic() < deadline:
+        pid, _ = os.waitpid(-1, os.WNOHANG)
+        if pid:
+            children.pop(pid, None)
+        else:
+            time.sleep(0.1)
+    for pid in children:
+        logging.warning(f"?? Worker {pid} no terminó en {Config.WEB_SHUTDOWN_TIMEOUT}s; SIGKILL")
+        os.kill(pid, signal.SIGKILL)
+
+
+def serve(host: str, port: int, workers: int, threads: int, with_services: bool = True):
+    sock = bind_socket(host, port)
+    print(f" Iniciando servidor en http://{host}:{port}/ ({workers} workers x {threads} hilos)")
+    if workers > 1 and not hasattr(os, "fork"):
+        logging.warning("?? Sin os.fork en esta plataforma (Windows): se usa un solo proceso")
+        workers = 1
+    if workers > 1:
+        logging.warning("?? Con varios workers el historial de chat y los trabajos de ingesta son por "
+                        "proceso: usar afinidad de sesión en el proxy y lanzar las ingestas por CLI")
+        run_prefork(sock, workers, threads, with_services)
+    else:
+        run_worker(sock, threads, with_services)
+    sock.close()
+
+
+# ------------------------
+# Benchmark: servidor de desarrollo de Flask vs. serve.py
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(port: int, path: str, timeout: float = 60) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            try:
+                conn.request("GET", path)
+                if conn.getresponse().status == 200:
+                    return True
+            finally:
+                conn.close()
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def _load(port: int, paths, seconds: float, concurrency: int):
+    """Carga cerrada: cada hilo con su conexión keep-alive recorre paths hasta el plazo"""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client():
+        conn, local, failed, i = None, [], 0, 0
+        while time.monotonic() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            try:
+                conn = conn or http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+                started = time.perf_counter()
+                conn.request("GET", path, headers={"Accept-Encoding": "gzip"})
+                response = conn.getresponse()
+                response.read()
+                local.append(time.perf_counter() - started)
+                if response.status >= 400:
+                    failed += 1
+                if response.will_close:
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                if conn:
+                    conn.close()
+                conn = None
+        if conn:
+            conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in clients:
+        t.start()
+    for t in clients:
+        t.join()
+    latencies.sort()
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors[0],
+        "rps": count / seconds,
+        "p50_ms": latencies[count // 2] * 1000 if count else 0.0,
+        "p99_ms": latencies[min(count - 1, int(count * 0.99))] * 1000 if count else 0.0
+    }
+
+
+def benchmark(seconds: float, concurrency: int, workers: int, threads: int):
+    """
+    Requests/s y p99 de la portada de la ayuda, sus recursos y /api/info con el servidor de
+    desarrollo (como lo lanza app.py, sin recargador) y con serve.py. No usa Weaviate ni OpenAI:
+    mide el servidor HTTP, no el chat.
+    """
+    entry = web.static_index.lookup("index.htm")
+    refs = []
+    if entry:
+        with open(entry.path, encoding="utf-8", errors="ignore") as f:
+            refs = web.LOCAL_REF.findall(f.read())
+    paths = ["/", "/api/info"] + ["/" + ref.lstrip("./") for ref in refs]
+
+    dev_code = ("import app; app.app.run(host='127.0.0.1', port=%d, debug=%r, use_reloader=False)")
+    servers = [
+        (f"flask dev (debug={Config.FLASK_DEBUG})",
+         lambda port: [sys.executable, "-c", dev_code % (port, Config.FLASK_DEBUG)], "/api/info"),
+        (f"serve.py ({workers}x{threads})",
+         lambda port: [sys.executable, os.path.abspath(__file__), "--no-services", "--host", "127.0.0.1",
+                       "--port", str(port), "--workers", str(workers), "--threads", str(threads)], "/ready")
+    ]
+
+    print(f"{len(paths)} rutas, {concurrency} clientes, {seconds:.0f}s por servidor")
+    print(f"{'servidor':<28} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errores':>8}")
+    for name, command, ready_path in servers:
+        port = _free_port()
+        process = subprocess.Popen(command(port), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not _wait_ready(port, ready_path):
+                print(f"{name:<28} no arrancó")
+                continue
+            _load(port, paths, min(2.0, seconds), concurrency)   # Calentar keep-alive y caches
+            result = _load(port, paths, seconds, concurrency)
+            print(f"{name:<28} {result['rps']:>9.0f} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+                  f"{result['errors']:>8}")
+        finally:
+            process.send_signal(signal.SIGINT)
+            try:
+                process.wait(timeout=Config.WEB_SHUTDOWN_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de producción del chatbot (waitress)")
+    parser.add_argument("--host", default=Config.FLASK_HOST)
+    parser.add_argument("--port", type=int, default=Config.FLASK_PORT)
+    parser.add_argument("--workers", type=int, default=Config.WEB_WORKERS, help="Procesos (prefork)")
+    parser.add_argument("--threads", type=int, default=Config.WEB_THREADS, help="Hilos por worker")
+    parser.add_argument("--no-services", action="store_true",
+                        help="Solo ayuda y estáticos, sin Weaviate ni OpenAI (benchmarks)")
+    parser.add_argument("--benchmark", action="store_true", help="Comparar con el servidor de desarrollo de Flask")
+    parser.add_argument("--seconds", type=float, default=10, help="Duración del benchmark por servidor")
+    parser.add_argument("--concurrency", type=int, default=16, help="Clientes concurrentes del benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.seconds, args.concurrency, max(1, args.workers), max(1, args.threads))
+    else:
+        serve(args.host, args.port, max(1, args.workers), max(1, args.threads), not args.no_services)
+
+
+if __name__ == "__main__":
+    main()
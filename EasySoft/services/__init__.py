@@ -2,5 +2,6 @@
 from .chatbot_service import ChatbotService
 from .weaviate_service import WeaviateService
 from .openai_service import OpenAIService
+from .document_admin_service import DocumentAdminService
 
-__all__ = ['ChatbotService', 'WeaviateService', 'OpenAIService']
+__all__ = ['ChatbotService', 'WeaviateService', 'OpenAIService', 'DocumentAdminService']
@@ -779,7 +779,12 @@ class ChatbotService:
             logging.warning("🧠 PROMPT FINAL >>>\nSYSTEM:\n%s\nUSER:\n%s", system_prompt, user_question)
 
 
-            chatbot_response = self.openai_service.generate_response(messages)
+            is_followup = (
+                original_user_question != user_question
+                or "|| contexto_previo:" in anchored_q.lower()
+            )
+            route = self.openai_service.select_route(is_followup, len(context or ""), results_count)
+            chatbot_response = self.openai_service.generate_response(messages, route=route)
             chatbot_response = self._strip_unnecessary_disclaimer(chatbot_response)
             if not chatbot_response:
                 logging.error("❌ chatbot_response vacío o None. Posible causa: fallo de OpenAI o _strip_unnecessary_disclaimer.")
@@ -1058,6 +1063,10 @@ METADATOS DE BÚSQUEDA:
         }
         health_status["services"]["weaviate"] = self.weaviate_service.get_health_status()
         health_status["services"]["openai"] = self.openai_service.get_health_status()
+        health_status["metrics"] = {
+            "openai": self.openai_service.get_call_stats(),
+            "routing": self.openai_service.get_routing_stats()
+        }
 
         all_services_ok = all(service == "connected" for service in health_status["services"].values())
         if not all_services_ok:
@@ -0,0 +1,273 @@
+# services/document_admin_service.py - Ingesta en segundo plano para el panel de administración
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import Config
+from collection_alias import DEFAULT_ALIAS
+
+
+def _create_manager():
+    # Import diferido: el manager carga OpenAI, BeautifulSoup y el registro solo al lanzar un trabajo
+    from weaviate_manager import WeaviateManager
+    return WeaviateManager()
+
+
+@dataclass
+class IngestJob:
+    """Trabajo de ingesta lanzado desde /admin/documents/update"""
+    path: str
+    force_rebuild: bool = False
+    collection: str = DEFAULT_ALIAS
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    status: str = "queued"   # queued -> running -> completed | failed | cancelled
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    progress: Dict = field(default_factory=dict)
+    cancel_requested: threading.Event = field(default_factory=threading.Event)
+    manager: Any = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+
+class DocumentAdminService:
+    """
+    Ejecuta update/rebuild de documentos en un hilo propio para no bloquear el worker HTTP.
+    Solo se admite una ingesta a la vez por colección; el avance se lee del journal de
+    ingesta y de las estadísticas del manager mientras corre.
+    Un único WeaviateManager (creado al primer uso) atiende stats, scan y trabajos, y las
+    estadísticas se guardan en memoria hasta la próxima ingesta o ADMIN_STATS_TTL_SECONDS.
+    """
+
+    MAX_FINISHED_JOBS = 50
+
+    def __init__(self, manager_factory: Callable[[], Any] = None):
+        self._manager_factory = manager_factory or _create_manager
+        self._manager = None
+        self._manager_lock = threading.Lock()
+        self._stats: Optional[Dict] = None
+        self._stats_at = 0.0
+        self._stats_lock = threading.Lock()
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._active: Dict[str, str] = {}   # colección -> id del trabajo en curso
+        self._lock = threading.Lock()
+
+    def get_manager(self):
+        """Manager compartido: conexión a Weaviate, cliente OpenAI y registro se reutilizan"""
+        with self._manager_lock:
+            if self._manager is None:
+                self._manager = self._manager_factory()
+            return self._manager
+
+    def discard_manager(self):
+        """Descarta el manager (p. ej. tras perder la conexión); el próximo uso crea otro"""
+        if self._active:
+            return   # Lo está usando un trabajo en curso
+        with self._manager_lock:
+            manager, self._manager = self._manager, None
+        if manager is not None:
+            try:
+                manager.cleanup()
+            except Exception as e:
+                logging.warning(f"?? Error liberando el manager de documentos: {e}")
+
+    def get_stats(self, refresh: bool = False) -> Dict:
+        """Estadísticas en memoria; se recalculan tras cada ingesta, al vencer el TTL o a pedido"""
+        with self._stats_lock:
+            # Durante una ingesta se sirven las últimas estadísticas; al terminar se recalculan
+            expired = time.time() - self._stats_at > Config.ADMIN_STATS_TTL_SECONDS and not self._active
+            if self._stats is None or refresh or expired:
+                self._stats = self._compute_stats()
+                # Un error no queda en cache: el próximo pedido vuelve a intentar
+                self._stats_at = 0.0 if "error" in self._stats else time.time()
+            return dict(self._stats, cached_at=datetime.fromtimestamp(self._stats_at or time.time()).isoformat())
+
+    def _compute_stats(self) -> Dict:
+        try:
+            manager = self.get_manager()
+            if not manager.weaviate_client or not manager.weaviate_client.is_ready():
+                logging.error("Weaviate no esta conectado o no esta listo")
+                self.discard_manager()
+                return {
+                    'total_documents_weaviate': 0,
+                    'total_documents_registry': 0,
+                    'connection_status': 'disconnected',
+                    'error': 'No se pudo conectar a Weaviate'
+                }
+
+            if not manager.weaviate_client.collections.exists(manager.collection_name):
+                logging.warning(f"La coleccion '{manager.collection_name}' no existe")
+                return {
+                    'total_documents_weaviate': 0,
+                    'total_documents_registry': len(manager.document_registry),
+                    'vectorized_documents': 0,
+                    'documents_with_errors': 0,
+                    'connection_status': 'connected',
+                    'collection_exists': False
+                }
+
+            stats = manager.get_statistics()
+            stats['connection_status'] = 'connected'
+            stats['collection_exists'] = True
+            return stats
+        except Exception as e:
+            logging.error(f"Error obteniendo estadisticas de documentos: {e}")
+            self.discard_manager()
+            return {
+                'total_documents_weaviate': 0,
+                'total_documents_registry': 0,
+                'error': str(e)
+            }
+
+    def _refresh_stats(self):
+        with self._stats_lock:
+            self._stats = None
+        self.get_stats()
+
+    def submit_update(self, path: str, force_rebuild: bool = False,
+                      collection: str = DEFAULT_ALIAS) -> Tuple[IngestJob, bool]:
+        """Encola una ingesta; si ya hay una en curso para la colección devuelve esa (False)"""
+        with self._lock:
+            active_id = self._active.get(collection)
+            if active_id:
+                return self._jobs[active_id], False
+            job = IngestJob(path=path, force_rebuild=force_rebuild, collection=collection)
+            self._jobs[job.id] = job
+            self._active[collection] = job.id
+            self._prune()
+
+        threading.Thread(target=self._run, args=(job,), name=f"ingest-{job.id}", daemon=True).start()
+        logging.info(f"?? Trabajo de ingesta {job.id} encolado ({'rebuild' if force_rebuild else 'update'} de {path})")
+        return job, True
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: IngestJob):
+        job.status = "running"
+        job.started_at = time.time()
+        manager = None
+        try:
+            manager = self.get_manager()
+            manager.cancel_event.clear()
+            job.manager = manager
+            if job.cancel_requested.is_set():
+                manager.cancel()
+
+            result = manager.update_documents(job.path, force_rebuild=job.force_rebuild)
+            job.result = result
+            if result.get("aborted"):
+                job.status = "failed"
+                job.error = result["aborted"]
+            elif result.get("cancelled"):
+                job.status = "cancelled"
+            elif "error" in result:
+                job.status = "failed"
+                job.error = "Error durante la actualizacion"
+            else:
+                job.status = "completed"
+        except Exception as e:
+            logging.error(f"? Error en trabajo de ingesta {job.id}: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            if manager is not None:
+                job.progress = self._live_progress(job)
+                job.manager = None
+            job.finished_at = time.time()
+            with self._lock:
+                if self._active.get(job.collection) == job.id:
+                    del self._active[job.collection]
+            logging.info(f"?? Trabajo de ingesta {job.id} terminado: {job.status}")
+            self._refresh_stats()
+
+    def _live_progress(self, job: IngestJob) -> Dict:
+        manager = job.manager
+        if manager is None:
+            return job.progress
+
+        progress = {}
+        journal_job_id = manager.current_job_id or manager.last_job_id
+        if journal_job_id:
+            try:
+                progress = manager.journal.progress(journal_job_id) or {}
+            except Exception as e:
+                logging.warning(f"?? No se pudo leer el journal del trabajo {job.id}: {e}")
+
+        stats = manager.run_stats
+        elapsed = max(time.time() - (job.started_at or job.created_at), 1e-6)
+        progress.update({
+            "documents_written": stats.new + stats.modified,
+            "documents_deleted": stats.deleted,
+            "errors": stats.errors,
+            "chunks_embedded": stats.embedded_chunks,
+            "embedding_requests": stats.embedding_requests,
+            "cache_hits": stats.cache_hits,
+            "chunks_per_second": round(stats.embedded_chunks / elapsed, 1)
+        })
+        return progress
+
+    def get_job(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[IngestJob]:
+        """Pide cancelar el trabajo; lo ya escrito se conserva y el journal permite reanudarlo"""
+        job = self.get_job(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_requested.set()
+        manager = job.manager
+        if manager is not None:
+            manager.cancel()
+        logging.info(f"?? Cancelación solicitada para el trabajo {job.id}")
+        return job
+
+    def scan(self, path: str) -> Tuple[Optional[Dict], int, Optional[IngestJob]]:
+        """
+        Cambios pendientes en path sin actualizar nada: ({tipo: [rutas]}, archivos encontrados, None).
+        El manager es el de los trabajos: con una ingesta en curso no se escanea y se devuelve
+        (None, 0, trabajo). El lock se mantiene durante el scan para que no arranque uno a la par.
+        """
+        with self._lock:
+            if self._active:
+                return None, 0, self._jobs[next(iter(self._active.values()))]
+            manager = self.get_manager()
+            found_files = manager.scan_directory(path)
+            return manager.detect_changes(found_files), len(found_files), None
+
+    def close(self):
+        self.discard_manager()
+
+    def to_dict(self, job: IngestJob) -> Dict:
+        def iso(timestamp):
+            return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+        end = job.finished_at or time.time()
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "collection": job.collection,
+            "path": job.path,
+            "force_rebuild": job.force_rebuild,
+            "cancel_requested": job.cancel_requested.is_set(),
+            "created_at": iso(job.created_at),
+            "started_at": iso(job.started_at),
+            "finished_at": iso(job.finished_at),
+            "elapsed_seconds": round(end - job.started_at, 1) if job.started_at else 0.0,
+            "progress": self._live_progress(job),
+            "result": job.result,
+            "error": job.error
+        }
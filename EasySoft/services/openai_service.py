@@ -3,15 +3,30 @@
 import logging
 import traceback
 import json
-from typing import Optional, List, Dict, Any, Union
-from openai import OpenAI
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, List, Dict, Any, Union, Callable
+from openai import OpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
 from config import Config
 from logger.logging_utils import OpenAILogger, log_openai_call
+from logger.metrics import LatencyWindow
+
+# Errores transitorios que justifican reintentar (429, timeouts, red, 5xx)
+RETRIABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
 
 
 class OpenAIService:
     def __init__(self):
-        self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
+        # Los reintentos los maneja el servicio (con jitter y métricas), no el SDK
+        self.client = OpenAI(
+            api_key=Config.OPENAI_API_KEY,
+            max_retries=0,
+            timeout=Config.OPENAI_REQUEST_TIMEOUT
+        )
         self.system_prompt = (
             "Eres un asistente útil especializado en EasySoft. Responde preguntas solo en base a la "
             "información disponible. Si la información no está en el "
@@ -24,44 +39,300 @@ class OpenAIService:
         )
         self.max_out_tokens = getattr(Config, "OPENAI_MAX_OUTPUT_TOKENS", 1800)
         self.openai_logger = OpenAILogger()
-    
+
+        # Política de reintentos y hedging
+        self.max_retries = max(0, Config.OPENAI_MAX_RETRIES)
+        self.retry_base_delay = Config.OPENAI_RETRY_BASE_DELAY
+        self.retry_max_delay = Config.OPENAI_RETRY_MAX_DELAY
+        self.hedge_embeddings = Config.OPENAI_HEDGE_EMBEDDINGS
+        # Cada llamada con hedging ocupa hasta 2 hilos y el pool lo comparten todos los hilos web:
+        # más chico, las llamadas harían cola y la espera dispararía hedges innecesarios
+        self._hedge_pool = ThreadPoolExecutor(
+            max_workers=2 * max(1, Config.WEB_THREADS), thread_name_prefix="openai-hedge"
+        ) if self.hedge_embeddings else None
+
+        # Métricas por tipo de llamada ("chat", "embeddings")
+        self._stats_lock = threading.Lock()
+        self._call_stats: Dict[str, Dict[str, Any]] = {}
+        self._latencies: Dict[str, LatencyWindow] = {}
+
+        # Ruteo por niveles (modelo y tope de salida por turno) y sus métricas
+        self.routing_enabled = Config.ROUTING_ENABLED
+        self.model_prices = self._parse_model_prices(Config.OPENAI_MODEL_PRICES)
+        self.tiers = {
+            "standard": {"model": Config.OPENAI_CHAT_MODEL, "max_tokens": self.max_out_tokens},
+            "light": {"model": Config.OPENAI_LIGHT_MODEL, "max_tokens": Config.OPENAI_LIGHT_MAX_OUTPUT_TOKENS},
+        }
+        self._tier_stats: Dict[str, Dict[str, Any]] = {}
+        self._tier_latencies: Dict[str, LatencyWindow] = {}
+
+    # ------------------------------------------------------------------
+    # Ruteo por niveles
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _parse_model_prices(raw: str) -> Dict[str, Dict[str, float]]:
+        """Parsea 'modelo:entrada:salida,...' (USD por millón de tokens)"""
+        prices = {}
+        for item in (raw or "").split(","):
+            parts = [p.strip() for p in item.split(":")]
+            if len(parts) != 3:
+                continue
+            try:
+                prices[parts[0]] = {"input": float(parts[1]), "output": float(parts[2])}
+            except ValueError:
+                logging.warning(f"?? Precio de modelo inválido en OPENAI_MODEL_PRICES: '{item}'")
+        return prices
+
+    def default_route(self) -> Dict[str, Any]:
+        return {"tier": "standard", **self.tiers["standard"]}
+
+    def select_route(self, is_followup: bool, context_chars: int, results_count: int) -> Dict[str, Any]:
+        """
+        Elige modelo y tope de tokens de salida para el turno.
+        Nivel liviano: follow-ups (ordinales, acuses expandidos) con contexto chico; con
+        ROUTING_LIGHT_MAX_RESULTS > 0 también las preguntas con pocos resultados. El resto
+        va al modelo estándar.
+        """
+        if not self.routing_enabled:
+            return self.default_route()
+
+        small_context = context_chars <= Config.ROUTING_LIGHT_MAX_CONTEXT_CHARS
+        few_results = 0 < results_count <= Config.ROUTING_LIGHT_MAX_RESULTS
+        if small_context and (is_followup or few_results):
+            route = {"tier": "light", **self.tiers["light"]}
+        else:
+            route = self.default_route()
+
+        logging.info(
+            f"?? Ruteo: nivel '{route['tier']}' ({route['model']}, max {route['max_tokens']} tokens) - "
+            f"follow-up={is_followup}, contexto={context_chars} chars, resultados={results_count}"
+        )
+        return route
+
+    def _record_tier(self, route: Dict[str, Any], response: Any, elapsed: float) -> None:
+        """Acumula latencia, tokens y costo estimado por nivel"""
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        price = self.model_prices.get(route["model"], {"input": 0.0, "output": 0.0})
+        cost = (prompt_tokens * price["input"] + completion_tokens * price["output"]) / 1_000_000
+
+        with self._stats_lock:
+            tier = route["tier"]
+            if tier not in self._tier_stats:
+                self._tier_stats[tier] = {
+                    "model": route["model"],
+                    "calls": 0,
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "cost_usd": 0.0,
+                }
+                self._tier_latencies[tier] = LatencyWindow()
+            stats = self._tier_stats[tier]
+            stats["model"] = route["model"]
+            stats["calls"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["cost_usd"] += cost
+            self._tier_latencies[tier].add(elapsed)
+
+    def get_routing_stats(self) -> Dict[str, Any]:
+        """Latencia, tokens y costo acumulado por nivel de ruteo"""
+        with self._stats_lock:
+            snapshot = {}
+            for tier, stats in self._tier_stats.items():
+                entry = dict(stats)
+                entry["cost_usd"] = round(stats["cost_usd"], 6)
+                entry["avg_cost_usd"] = round(stats["cost_usd"] / stats["calls"], 6) if stats["calls"] else None
+                entry["latency"] = self._tier_latencies[tier].summary()
+                snapshot[tier] = entry
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # Reintentos, hedging y métricas
+    # ------------------------------------------------------------------
+    def _stats_for(self, call_name: str) -> Dict[str, Any]:
+        """Devuelve (creando si hace falta) el registro de métricas de una llamada"""
+        if call_name not in self._call_stats:
+            self._call_stats[call_name] = {
+                "calls": 0,
+                "attempts": 0,
+                "retries": 0,
+                "failures": 0,
+                "attempts_histogram": {},
+                "hedges_fired": 0,
+                "hedge_wins": 0,
+            }
+            self._latencies[call_name] = LatencyWindow()
+        return self._call_stats[call_name]
+
+    def _record_call(self, call_name: str, attempts: int, success: bool) -> None:
+        with self._stats_lock:
+            stats = self._stats_for(call_name)
+            stats["calls"] += 1
+            stats["attempts"] += attempts
+            stats["retries"] += attempts - 1
+            if not success:
+                stats["failures"] += 1
+            histogram = stats["attempts_histogram"]
+            histogram[attempts] = histogram.get(attempts, 0) + 1
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        """Backoff exponencial con full jitter; respeta Retry-After si viene en la respuesta"""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.retry_max_delay)
+            except ValueError:
+                pass
+        ceiling = min(self.retry_max_delay, self.retry_base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    def _call_with_retry(self, call_name: str, fn: Callable[[], Any]) -> Any:
+        """Ejecuta fn reintentando solo errores transitorios; registra intentos y latencia"""
+        attempt = 0
+        while True:
+            attempt += 1
+            started = time.monotonic()
+            try:
+                result = fn()
+            except RETRIABLE_ERRORS as e:
+                if attempt > self.max_retries:
+                    logging.error(f"? {call_name}: agotados {attempt} intentos ({type(e).__name__}: {e})")
+                    self._record_call(call_name, attempt, success=False)
+                    raise
+                delay = self._backoff_delay(attempt, e)
+                logging.warning(f"?? {call_name}: intento {attempt} falló ({type(e).__name__}), reintentando en {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            except Exception:
+                self._record_call(call_name, attempt, success=False)
+                raise
+
+            with self._stats_lock:
+                self._stats_for(call_name)
+                self._latencies[call_name].add(time.monotonic() - started)
+            self._record_call(call_name, attempt, success=True)
+            return result
+
+    def _hedge_delay(self, call_name: str) -> float:
+        """Demora antes de lanzar la petición duplicada: percentil configurado de latencias recientes"""
+        with self._stats_lock:
+            self._stats_for(call_name)
+            window = self._latencies[call_name]
+        if len(window) < Config.OPENAI_HEDGE_MIN_SAMPLES:
+            return Config.OPENAI_HEDGE_DEFAULT_DELAY
+        return max(0.05, window.percentile(Config.OPENAI_HEDGE_PERCENTILE))
+
+    def _hedged_call(self, call_name: str, fn: Callable[[], Any]) -> Any:
+        """
+        Lanza la petición y, si no respondió dentro del p95, lanza un duplicado.
+        Gana la primera respuesta exitosa; la otra se cancela si aún no empezó
+        o se descarta su resultado (el SDK no permite abortar una petición en curso).
+        """
+        primary = self._hedge_pool.submit(self._call_with_retry, call_name, fn)
+        done, _ = wait([primary], timeout=self._hedge_delay(call_name))
+        if done:
+            return primary.result()
+
+        hedge = self._hedge_pool.submit(self._call_with_retry, call_name, fn)
+        with self._stats_lock:
+            self._stats_for(call_name)["hedges_fired"] += 1
+
+        pending = {primary, hedge}
+        last_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    last_error = future.exception()
+                    continue
+                for other in pending:
+                    other.cancel()
+                if future is hedge:
+                    with self._stats_lock:
+                        self._stats_for(call_name)["hedge_wins"] += 1
+                return future.result()
+        raise last_error
+
+    def create_embedding(self, text: str, model: str = EMBEDDING_MODEL) -> List[float]:
+        """Obtiene el embedding de un texto con reintentos y hedging opcional"""
+        fn = lambda: self.client.embeddings.create(model=model, input=text)
+        if self._hedge_pool is not None:
+            response = self._hedged_call("embeddings", fn)
+        else:
+            response = self._call_with_retry("embeddings", fn)
+        return response.data[0].embedding
+
+    def get_call_stats(self) -> Dict[str, Any]:
+        """Métricas por tipo de llamada: intentos, reintentos, latencias y tasa de victoria del hedge"""
+        with self._stats_lock:
+            snapshot = {}
+            for call_name, stats in self._call_stats.items():
+                entry = dict(stats)
+                entry["attempts_histogram"] = dict(stats["attempts_histogram"])
+                entry["latency"] = self._latencies[call_name].summary()
+                entry["hedge_win_rate"] = (
+                    round(stats["hedge_wins"] / stats["hedges_fired"], 3) if stats["hedges_fired"] else None
+                )
+                snapshot[call_name] = entry
+        return snapshot
+
     @log_openai_call()
 
-    def generate_response(self, messages: List[Dict[str, Any]]) -> Optional[str]:
-        """Genera respuesta con manejo ultra-robusto para GPT-5-Mini"""
+    def generate_response(self, messages: List[Dict[str, Any]], route: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Genera respuesta con manejo ultra-robusto; el modelo y el tope de salida los define la ruta"""
         try:
             # Preparar mensajes
             system_message = {"role": "system", "content": self.system_prompt}
             full_messages = [system_message] + messages
             normalized_messages = self._normalize_messages(full_messages)
-            
-            # Log inicial
-            logging.info(f"?? Enviando {len(normalized_messages)} mensajes a GPT-5-Mini")
-            last_user_msg = normalized_messages[-1]['content'][:100] if normalized_messages else "N/A"
-            logging.info(f"?? Último mensaje: {last_user_msg}...")
-            
-            # Llamada a OpenAI
-            response = self.client.chat.completions.create(
-                model="gpt-5-mini",
-                messages=normalized_messages,
-                max_completion_tokens=self.max_out_tokens
-            )
-            
-            # Log detallado de la respuesta RAW
-            logging.info(f"?? Respuesta RAW recibida - tipo: {type(response)}")
-            
-            # EXTRACCIÓN ULTRA-ROBUSTA
-            extracted_text = self._extract_text_ultra_robust(response)
-            
-            if extracted_text and extracted_text.strip():
-                final_response = extracted_text.strip()
-                logging.info(f"? ÉXITO: Respuesta extraída - {len(final_response)} chars")
-                logging.info(f"?? Preview: {final_response[:150]}...")
-                return final_response
-            else:
+
+            # Si el nivel liviano falla o no devuelve texto, se reintenta una vez con el estándar
+            route = route or self.default_route()
+            routes = [route] if route["tier"] == "standard" else [route, self.default_route()]
+
+            for current in routes:
+                # Log inicial
+                logging.info(f"?? Enviando {len(normalized_messages)} mensajes a {current['model']} (nivel {current['tier']})")
+                last_user_msg = normalized_messages[-1]['content'][:100] if normalized_messages else "N/A"
+                logging.info(f"?? Último mensaje: {last_user_msg}...")
+
+                # Llamada a OpenAI (con reintentos para errores transitorios)
+                started = time.monotonic()
+                try:
+                    response = self._call_with_retry("chat", lambda: self.client.chat.completions.create(
+                        model=current["model"],
+                        messages=normalized_messages,
+                        max_completion_tokens=current["max_tokens"]
+                    ))
+                except Exception as e:
+                    if current is routes[-1]:
+                        raise
+                    logging.warning(f"?? Nivel '{current['tier']}' falló ({e}), reintentando con nivel estándar")
+                    continue
+                self._record_tier(current, response, time.monotonic() - started)
+
+                # Log detallado de la respuesta RAW
+                logging.info(f"?? Respuesta RAW recibida - tipo: {type(response)}")
+
+                # EXTRACCIÓN ULTRA-ROBUSTA
+                extracted_text = self._extract_text_ultra_robust(response)
+
+                if extracted_text and extracted_text.strip():
+                    final_response = extracted_text.strip()
+                    logging.info(f"? ÉXITO: Respuesta extraída - {len(final_response)} chars")
+                    logging.info(f"?? Preview: {final_response[:150]}...")
+                    return final_response
+
+                if current is not routes[-1]:
+                    logging.warning(f"?? Nivel '{current['tier']}' sin texto válido, reintentando con nivel estándar")
+                    continue
+
                 logging.error(f"? FALLO: No se pudo extraer texto válido")
                 logging.error(f"?? Debug - extracted_text: '{extracted_text}' (tipo: {type(extracted_text)})")
-                
+
                 # Fallback de emergencia
                 return self.safe_fallback
                 
@@ -1,15 +1,60 @@
 # services/weaviate_service.py - VERSIÓN COMPLETA FUNCIONAL
 import logging
+import os
+import re
+import threading
 import time
 import weaviate
 import weaviate.classes as wvc
 from typing import Dict, Any, Optional, List
 from config import Config
+from collection_alias import DEFAULT_ALIAS, resolve_collection
+from whx_keyword_index import load_keyword_index
+
+# Anclaje que agrega ChatbotService a los follow-ups: es la respuesta anterior, no la consulta
+_CONTEXT_BIAS = re.compile(r"\|\|\s*contexto_previo:", re.IGNORECASE)
 
 class WeaviateService:
     def __init__(self):
         self.client = None
+        # Nombre de la colección publicada; se refresca en segundo plano (sin consulta por request)
+        self.collection_name = DEFAULT_ALIAS
+        self._stop_refresh = threading.Event()
+        self.keyword_index = self._load_keyword_index()
         self._connect()
+        self._refresh_collection_name()
+        self._refresher = threading.Thread(target=self._refresh_loop, name="collection-alias", daemon=True)
+        self._refresher.start()
+
+    def _refresh_collection_name(self):
+        """Resuelve el alias 'Documento' a la colección versionada actual"""
+        if not self.client:
+            return
+        try:
+            name = resolve_collection(self.client, DEFAULT_ALIAS)
+            if name != self.collection_name:
+                logging.info(f"?? Colección publicada: {self.collection_name} -> {name}")
+                self.collection_name = name
+        except Exception as e:
+            logging.warning(f"?? No se pudo resolver el alias de colección: {e}")
+
+    def _refresh_loop(self):
+        while not self._stop_refresh.wait(Config.COLLECTION_ALIAS_REFRESH_SECONDS):
+            self._refresh_collection_name()
+
+    def _load_keyword_index(self):
+        """Índice BM25 en memoria a partir de whxdata; sin él se usa el hybrid de Weaviate"""
+        if not Config.KEYWORD_SEARCH_ENABLED:
+            return None
+        try:
+            started = time.perf_counter()
+            index = load_keyword_index(Config.WHXDATA_PATH)
+            logging.info(f"?? Índice de palabras clave: {len(index)} temas, {len(index.terms)} términos "
+                         f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+            return index
+        except Exception as e:
+            logging.warning(f"?? No se pudo cargar el índice de palabras clave de {Config.WHXDATA_PATH}: {e}")
+            return None
 
     def _connect(self):
         """Conecta a Weaviate con reintentos"""
@@ -54,21 +99,27 @@ class WeaviateService:
     ) -> Dict[str, Any]:
         """
         Busca documentos similares en Weaviate usando vector search + fallback híbrido.
+        Con el índice de palabras clave cargado, la pata léxica se resuelve en el proceso y
+        se fusiona con los candidatos vectoriales (sin el round-trip de hybrid).
         """
         try:
             if not self.client or not self.client.is_ready():
                 return {"success": False, "context": None, "error": "Weaviate no disponible"}
 
-            collection = self.client.collections.get("Documento")
+            collection = self.client.collections.get(self.collection_name)
+            keyword_query = _CONTEXT_BIAS.split(query_text)[0].strip() if query_text else ""
 
-            # 1?? Búsqueda vectorial principal
-            response = collection.query.near_vector(
-                near_vector=question_vector,
-                limit=max_results,
-                return_metadata=wvc.query.MetadataQuery(distance=True)
-            )
-
-            results = self._filter_results(response)
+            if self.keyword_index is not None and keyword_query:
+                # 1?? Vector + BM25 en el proceso (fusión RRF)
+                results = self._search_fused(collection, question_vector, keyword_query, max_results)
+            else:
+                # 1?? Búsqueda vectorial principal
+                response = collection.query.near_vector(
+                    near_vector=question_vector,
+                    limit=max_results,
+                    return_metadata=wvc.query.MetadataQuery(distance=True)
+                )
+                results = self._filter_results(response)
             
             # 2?? Si no hay suficientes resultados, usar híbrido (vector + keyword)
             if len(results) < 2 and query_text:
@@ -100,6 +151,73 @@ class WeaviateService:
             logging.error(f"Error al consultar Weaviate: {e}")
             return {"success": False, "context": None, "error": str(e)}
 
+    def _search_fused(self, collection, question_vector: List[float], query_text: str, max_results: int) -> List[str]:
+        """
+        Reciprocal Rank Fusion entre los candidatos vectoriales y el ranking BM25 de su tema.
+        Se mantiene el umbral de distancia: un candidato fuera de él entra solo si su tema está
+        en el top KEYWORD_STRONG_RANK de BM25. Los temas de ese top sin ningún candidato vectorial
+        se agregan con su chunk más cercano a la pregunta.
+        """
+        response = collection.query.near_vector(
+            near_vector=question_vector,
+            limit=max_results * max(1, Config.KEYWORD_CANDIDATE_FACTOR),
+            return_metadata=wvc.query.MetadataQuery(distance=True)
+        )
+        hits = self.keyword_index.search(query_text, limit=len(self.keyword_index))
+        # Los temas de RoboHelp se identifican por nombre de archivo (html/<tema>.htm)
+        topic_names = [os.path.basename(hit.rel_url) for hit in hits]
+        keyword_rank = {name.lower(): rank for rank, name in enumerate(topic_names, 1)}
+        strong = Config.KEYWORD_STRONG_RANK
+
+        k = Config.KEYWORD_FUSION_K
+        scored, candidate_topics = [], set()
+        for vector_rank, obj in enumerate(response.objects, 1):
+            content = obj.properties.get("contenido", '').strip()
+            if not content:
+                continue
+            topic = self._topic_of(obj)
+            candidate_topics.add(topic)
+            distance = obj.metadata.distance
+            rank = keyword_rank.get(topic)
+            within_threshold = distance is None or distance < Config.WEAVIATE_DISTANCE_THRESHOLD
+            if not within_threshold and (rank is None or rank > strong):
+                continue
+            score = 1.0 / (k + vector_rank) + (1.0 / (k + rank) if rank else 0.0)
+            scored.append((score, content))
+
+        # 2?? Temas fuertes por BM25 que la búsqueda vectorial no trajo
+        missing = [name for name in topic_names[:strong] if name.lower() not in candidate_topics]
+        # Una consulta por tema: con un límite compartido un tema con muchos chunks desplaza a los demás
+        for name in missing:
+            if "*" in name or "?" in name:
+                continue   # like() no permite escapar comodines
+            try:
+                # Anclado al separador: "*tema.htm" también traería "otrotema.htm"
+                original = wvc.query.Filter.by_property("archivo_original")
+                extra = collection.query.near_vector(
+                    near_vector=question_vector,
+                    limit=1,
+                    filters=wvc.query.Filter.any_of([original.like(f"*/{name}"), original.like(f"*\\{name}")]),
+                    return_metadata=wvc.query.MetadataQuery(distance=True)
+                )
+            except Exception as e:
+                logging.warning(f"?? No se pudo traer el tema {name} de BM25: {e}")
+                continue
+            for obj in extra.objects:
+                content = obj.properties.get("contenido", '').strip()
+                topic = self._topic_of(obj)
+                if content and topic == name.lower() and topic not in candidate_topics:
+                    candidate_topics.add(topic)   # El chunk más cercano del tema
+                    scored.append((1.0 / (k + keyword_rank[topic]), content))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [content for _, content in scored[:max_results]]
+
+    @staticmethod
+    def _topic_of(obj) -> str:
+        original = obj.properties.get("archivo_original") or obj.properties.get("ruta_archivo") or ""
+        return os.path.basename(original.replace("\\", "/")).lower()
+
     def search_similar_documents_permissive(
         self, 
         question_vector: List[float], 
@@ -111,7 +229,7 @@ class WeaviateService:
             if not self.client or not self.client.is_ready():
                 return {"success": False, "context": None, "error": "Weaviate no disponible"}
 
-            collection = self.client.collections.get("Documento")
+            collection = self.client.collections.get(self.collection_name)
             
             # Búsqueda con umbral muy alto (más permisivo)
             response = collection.query.near_vector(
@@ -167,6 +285,7 @@ class WeaviateService:
 
     def close(self):
         """Cierra la conexión a Weaviate"""
+        self._stop_refresh.set()
         if self.client:
             try:
                 self.client.close()
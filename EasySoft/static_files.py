@@ -0,0 +1,249 @@
+# static_files.py - Archivos estáticos con índice en memoria, variantes gzip, ETag y Cache-Control
+import gzip
+import hashlib
+import io
+import mimetypes
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+from flask import current_app
+from werkzeug.wsgi import wrap_file
+
+# Tipos fijos: en Windows mimetypes lee el registro y puede devolver text/plain para .js
+MIME_TYPES = {
+    ".js": "application/javascript", ".css": "text/css", ".htm": "text/html", ".html": "text/html",
+    ".svg": "image/svg+xml", ".json": "application/json", ".xml": "application/xml", ".txt": "text/plain",
+    ".md": "text/markdown", ".woff": "font/woff", ".woff2": "font/woff2", ".mp4": "video/mp4"
+}
+COMPRESSIBLE_TYPES = {"application/javascript", "application/json", "application/xml", "image/svg+xml"}
+GZIP_MIN_BYTES = 1024
+SKIP_DIRS = {"__pycache__", "node_modules"}
+
+
+def _mimetype(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    return MIME_TYPES.get(extension) or mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def _digest(chunks: Iterable[bytes]) -> str:
+    hasher = hashlib.blake2b(digest_size=16)
+    for chunk in chunks:
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _read_chunks(stream, size: int = 1024 * 1024):
+    return iter(lambda: stream.read(size), b"")
+
+
+@dataclass
+class StaticFile:
+    """Metadatos de un archivo servible (y de su variante gzip, si la hay)"""
+    path: str
+    size: int
+    mtime_ns: int
+    mimetype: str
+    etag: str
+    gzip_path: Optional[str] = None     # .gz hermano verificado contra el original
+    gzip_data: Optional[bytes] = None   # Comprimido en memoria al indexar
+    gzip_size: int = 0
+
+    @property
+    def has_gzip(self) -> bool:
+        return self.gzip_path is not None or self.gzip_data is not None
+
+
+class StaticIndex:
+    """
+    Índice {ruta relativa: StaticFile} armado al iniciar: cada request es una búsqueda en el
+    diccionario, sin stat ni exists. El ETag fuerte es el hash del contenido (igual en todas las
+    réplicas). Los .gz hermanos se usan solo si descomprimen exactamente al original; los archivos
+    de texto sin .gz válido se comprimen una vez en memoria. El índice se refresca en segundo plano
+    cada refresh_seconds (solo se vuelven a hashear los archivos con otro tamaño o fecha).
+    """
+
+    def __init__(self, base_dir: str, extensions: Iterable[str], open_dirs: Iterable[str] = (),
+                 max_age: int = 604800, refresh_seconds: float = 300, gzip_max_bytes: int = 2 * 1024 * 1024,
+                 logger=None):
+        self.base_dir = os.path.abspath(base_dir)
+        self.extensions = {e.lower() for e in extensions}
+        self.open_dirs = tuple(os.path.normcase(d) + os.sep for d in open_dirs)   # Cualquier extensión
+        self.max_age = max_age
+        self.refresh_seconds = refresh_seconds
+        self.gzip_max_bytes = gzip_max_bytes
+        self.logger = logger
+        self._files: Dict[str, StaticFile] = {}
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._next_refresh = 0.0
+        self._latencies = deque(maxlen=4096)
+        self.counters = {"requests": 0, "gzip": 0, "not_modified": 0, "not_found": 0,
+                         "bytes_sent": 0, "bytes_identity": 0}
+        self.refresh()
+
+    @staticmethod
+    def key(rel_path: str) -> str:
+        return os.path.normcase(os.path.normpath(rel_path.replace("/", os.sep)))
+
+    def _servable(self, key: str) -> bool:
+        return key.startswith(self.open_dirs) or os.path.splitext(key)[1] in self.extensions
+
+    def _build_entry(self, path: str, stat: os.stat_result, previous: Optional[StaticFile]) -> StaticFile:
+        if previous and previous.size == stat.st_size and previous.mtime_ns == stat.st_mtime_ns:
+            return previous
+        with open(path, "rb") as f:
+            content_hash = _digest(_read_chunks(f))
+        entry = StaticFile(path=path, size=stat.st_size, mtime_ns=stat.st_mtime_ns, mimetype=_mimetype(path),
+                           etag=content_hash)
+
+        gzip_path = path + ".gz"
+        if os.path.isfile(gzip_path):
+            try:
+                with gzip.open(gzip_path, "rb") as f:
+                    if _digest(_read_chunks(f)) == content_hash:
+                        entry.gzip_path, entry.gzip_size = gzip_path, os.path.getsize(gzip_path)
+            except (OSError, EOFError):
+                pass   # .gz corrupto: se ignora
+        compressible = entry.mimetype.startswith("text/") or entry.mimetype in COMPRESSIBLE_TYPES
+        if not entry.has_gzip and compressible and GZIP_MIN_BYTES <= stat.st_size <= self.gzip_max_bytes:
+            with open(path, "rb") as f:
+                data = gzip.compress(f.read(), compresslevel=9, mtime=0)
+            if len(data) < stat.st_size * 0.9:
+                entry.gzip_data, entry.gzip_size = data, len(data)
+        return entry
+
+    def refresh(self):
+        """Recorre base_dir y arma un índice nuevo (se reemplaza de una sola vez)"""
+        started = time.monotonic()
+        previous = self._files
+        files = {}
+        for root, dirs, names in os.walk(self.base_dir):
+            dirs[:] = [d for d in dirs if not d.startswith(".") and d not in SKIP_DIRS]
+            for name in names:
+                path = os.path.join(root, name)
+                key = self.key(os.path.relpath(path, self.base_dir))
+                if name.endswith(".gz") or not self._servable(key):
+                    continue
+                try:
+                    files[key] = self._build_entry(path, os.stat(path), previous.get(key))
+                except OSError as e:
+                    if self.logger:
+                        self.logger.warning(f"?? No se pudo indexar {path}: {e}")
+        self._files = files
+        self._next_refresh = time.monotonic() + self.refresh_seconds
+        if self.logger:
+            with_gzip = sum(1 for f in files.values() if f.has_gzip)
+            self.logger.info(f"?? Índice de estáticos: {len(files)} archivos ({with_gzip} con gzip) "
+                             f"en {time.monotonic() - started:.2f}s")
+
+    def _maybe_refresh(self):
+        if self.refresh_seconds <= 0 or time.monotonic() < self._next_refresh:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"?? Error refrescando el índice de estáticos: {e}")
+            finally:
+                self._refreshing = False
+        threading.Thread(target=run, name="static-index", daemon=True).start()
+
+    def lookup(self, rel_path: str) -> Optional[StaticFile]:
+        """Entrada del índice; un archivo creado después del último refresco se indexa al pedirlo"""
+        self._maybe_refresh()
+        key = self.key(rel_path)
+        if key.startswith(os.pardir) or os.path.isabs(key):
+            return None
+        entry = self._files.get(key)
+        if entry is None and self._servable(key):
+            path = os.path.join(self.base_dir, key)
+            if os.path.isfile(path):
+                entry = self._build_entry(path, os.stat(path), None)
+                self._files[key] = entry
+        return entry
+
+    def exists(self, rel_path: str) -> bool:
+        """Archivo presente aunque su extensión no se sirva (para distinguir 403 de 404)"""
+        key = self.key(rel_path)
+        return not key.startswith(os.pardir) and not os.path.isabs(key) and os.path.isfile(os.path.join(self.base_dir, key))
+
+    def _count(self, started: float, **counts):
+        with self._lock:
+            self.counters["requests"] += 1
+            for name, value in counts.items():
+                self.counters[name] += value
+            self._latencies.append(time.perf_counter() - started)
+
+    def not_found(self, started: float):
+        self._count(started, not_found=1)
+
+    def response(self, entry: StaticFile, request, started: float):
+        """
+        Respuesta con la variante negociada por Accept-Encoding (gzip si está disponible),
+        ETag fuerte por representación, Cache-Control y soporte de If-None-Match / Range.
+        """
+        use_gzip = entry.has_gzip and request.accept_encodings["gzip"] > 0 and "Range" not in request.headers
+        if use_gzip:
+            stream = io.BytesIO(entry.gzip_data) if entry.gzip_data is not None else open(entry.gzip_path, "rb")
+            size = entry.gzip_size
+        else:
+            try:
+                stream = open(entry.path, "rb")
+            except FileNotFoundError:
+                self._files.pop(self.key(os.path.relpath(entry.path, self.base_dir)), None)
+                self.not_found(started)
+                return None
+            size = entry.size
+
+        rv = current_app.response_class(wrap_file(request.environ, stream), mimetype=entry.mimetype,
+                                        direct_passthrough=True)
+        rv.content_length = size
+        rv.set_etag(entry.etag + ("-gz" if use_gzip else ""))
+        rv.last_modified = entry.mtime_ns / 1e9
+        rv.vary.add("Accept-Encoding")
+        if use_gzip:
+            rv.content_encoding = "gzip"
+        if entry.mimetype == "text/html":
+            rv.cache_control.no_cache = True   # Páginas: se revalidan siempre (304 con el ETag)
+        else:
+            rv.cache_control.public = True
+            rv.cache_control.max_age = self.max_age
+        rv = rv.make_conditional(request, accept_ranges=True, complete_length=size)
+
+        if rv.status_code == 304:
+            rv.close()
+            self._count(started, not_modified=1)
+        else:
+            self._count(started, gzip=int(use_gzip), bytes_sent=rv.content_length or 0,
+                        bytes_identity=entry.size if rv.status_code == 200 else rv.content_length or 0)
+        return rv
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+            latencies = sorted(self._latencies)
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 3) if latencies else 0.0
+
+        files = list(self._files.values())
+        return {
+            **counters,
+            "bytes_saved": counters["bytes_identity"] - counters["bytes_sent"],
+            "latency_p50_ms": percentile(0.50),
+            "latency_p99_ms": percentile(0.99),
+            "indexed_files": len(files),
+            "precompressed_files": sum(1 for f in files if f.gzip_path),
+            "memory_gzip_files": sum(1 for f in files if f.gzip_data is not None),
+            "memory_gzip_bytes": sum(len(f.gzip_data) for f in files if f.gzip_data is not None)
+        }
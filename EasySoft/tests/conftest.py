@@ -0,0 +1,96 @@
+# tests/conftest.py - Imports desde la carpeta EasySoft (módulos planos) y fakes de Weaviate
+import os
+import sys
+import types
+import uuid as uuidlib
+
+import pytest
+from weaviate.classes.config import Tokenization
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeData:
+    def __init__(self, store):
+        self.store = store
+
+    def insert(self, properties, vector=None, uuid=None):
+        self.store[str(uuid)] = dict(properties)
+
+    def insert_many(self, objects):
+        for obj in objects:
+            self.insert(obj.properties, vector=obj.vector, uuid=obj.uuid)
+        return types.SimpleNamespace(errors={})
+
+    def delete_by_id(self, uuid):
+        return self.store.pop(str(uuid), None) is not None
+
+    def delete_many(self, where):
+        # Filter.by_id().contains_any([...]) o Filter.by_property(...).equal(valor)
+        if where.target == "_id":
+            uuids = [str(uuid) for uuid in where.value]
+        else:
+            uuids = [uuid for uuid, properties in self.store.items() if properties.get(where.target) == where.value]
+        deleted = sum(self.store.pop(uuid, None) is not None for uuid in uuids)
+        return types.SimpleNamespace(successful=deleted, failed=0)
+
+
+class FakeCollection:
+    """Colección en memoria: uuid -> propiedades"""
+
+    def __init__(self):
+        self.store = {}
+        self.data = FakeData(self.store)
+        self.aggregate = types.SimpleNamespace(
+            over_all=lambda total_count=False: types.SimpleNamespace(total_count=len(self.store)))
+        # Colección creada con tokenización 'field' en archivo_original (borrado directo por ruta)
+        self.config = types.SimpleNamespace(get=lambda: types.SimpleNamespace(properties=[
+            types.SimpleNamespace(name="archivo_original", tokenization=Tokenization.FIELD)]))
+
+    def iterator(self, return_properties=None, include_vector=False):
+        for uuid, properties in list(self.store.items()):
+            yield types.SimpleNamespace(uuid=uuidlib.UUID(uuid), properties=properties)
+
+
+class FakeCollections:
+    def __init__(self):
+        self.collections = {}
+
+    def exists(self, name):
+        return name in self.collections
+
+    def get(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    def create(self, name, **kwargs):
+        self.collections[name] = FakeCollection()
+
+    def delete(self, name):
+        self.collections.pop(name, None)
+
+
+class FakeWeaviateClient:
+    def __init__(self):
+        self.collections = FakeCollections()
+
+    def is_ready(self):
+        return True
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """WeaviateManager sin red: registro y journal en tmp_path, Weaviate en memoria"""
+    from config import Config
+    import weaviate_manager
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Config, "DOCUMENT_REGISTRY_PATH", str(tmp_path / "document_registry.sqlite3"))
+    monkeypatch.setattr(Config, "EMBEDDING_CACHE_ENABLED", False)
+    instance = weaviate_manager.WeaviateManager(offline=True)
+    instance.weaviate_client = FakeWeaviateClient()
+    instance.document_registry.collection = instance.collection_name
+    yield instance
+    instance.cleanup()
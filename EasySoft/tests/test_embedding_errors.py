@@ -0,0 +1,92 @@
+# tests/test_embedding_errors.py - Qué errores de la API de embeddings dividen el lote y cuáles cortan la ingesta
+import types
+
+import httpx
+import openai
+import pytest
+
+import weaviate_manager
+from weaviate_manager import EmbeddingServiceError
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+
+
+class FakeEmbeddings:
+    def __init__(self, error_for):
+        self.error_for = error_for
+        self.calls = []
+
+    def create(self, model, input):
+        self.calls.append(list(input))
+        error = self.error_for(input)
+        if error is not None:
+            raise error
+        return types.SimpleNamespace(data=[types.SimpleNamespace(index=i, embedding=[1.0]) for i in range(len(input))])
+
+
+def _client(manager, error_for):
+    embeddings = FakeEmbeddings(error_for)
+    manager.openai_client = types.SimpleNamespace(embeddings=embeddings)
+    return embeddings
+
+
+def test_input_error_splits_batch_and_drops_only_the_bad_text(manager):
+    bad = openai.BadRequestError("maximum context length exceeded", response=httpx.Response(400, request=REQUEST), body=None)
+    embeddings = _client(manager, lambda texts: bad if "malo" in texts else None)
+
+    vectors = manager._get_embeddings_batch(["a", "b", "malo", "c"])
+
+    assert vectors == [[1.0], [1.0], None, [1.0]]
+    assert ["malo"] in embeddings.calls
+
+
+def test_connection_error_raises_without_splitting(manager, monkeypatch):
+    monkeypatch.setattr(weaviate_manager.time, "sleep", lambda seconds: None)
+    embeddings = _client(manager, lambda texts: openai.APIConnectionError(request=REQUEST))
+
+    with pytest.raises(EmbeddingServiceError):
+        manager._get_embeddings_batch(["a", "b", "c", "d"])
+
+    assert len(embeddings.calls) == manager.EMBEDDING_BATCH_RETRIES
+    assert all(len(call) == 4 for call in embeddings.calls)
+
+
+def test_rate_limit_honours_retry_after(manager, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(weaviate_manager.time, "sleep", sleeps.append)
+    response = httpx.Response(429, request=REQUEST, headers={"retry-after": "7"})
+    _client(manager, lambda texts: openai.RateLimitError("rate limited", response=response, body=None))
+
+    with pytest.raises(EmbeddingServiceError):
+        manager._get_embeddings_batch(["a", "b"])
+
+    assert sleeps and all(seconds == 7 for seconds in sleeps)
+
+
+def test_auth_error_fails_on_first_attempt(manager, monkeypatch):
+    monkeypatch.setattr(weaviate_manager.time, "sleep", lambda seconds: pytest.fail("no debe reintentar"))
+    response = httpx.Response(401, request=REQUEST)
+    embeddings = _client(manager, lambda texts: openai.AuthenticationError("bad key", response=response, body=None))
+
+    with pytest.raises(EmbeddingServiceError):
+        manager._get_embeddings_batch(["a", "b"])
+
+    assert len(embeddings.calls) == 1
+
+
+def test_update_stops_on_service_error_and_keeps_documents_pending(manager, tmp_path, monkeypatch):
+    monkeypatch.setattr(weaviate_manager.time, "sleep", lambda seconds: None)
+    embeddings = _client(manager, lambda texts: openai.APIConnectionError(request=REQUEST))
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for i in range(4):
+        (docs / f"doc{i}.txt").write_text(f"Documento {i}. " + "texto de prueba " * 50, encoding="utf-8")
+
+    result = manager.update_documents(str(docs))
+
+    assert "aborted" in result and "cancelled" not in result
+    assert result["new"] == 0 and result["errors"] == 0
+    assert len(embeddings.calls) <= 2 * manager.EMBEDDING_BATCH_RETRIES
+    assert not manager.cancel_event.is_set()
+    assert len(manager.document_registry) == 0
+    assert manager.journal.find_unfinished("update") is not None
@@ -0,0 +1,58 @@
+# tests/test_html_sections.py - División de HTML en secciones por títulos
+from html_sections import parse_html_sections, sections_text
+
+PAGE = """<html><head><title>Manual  de Ventas</title><style>p { color: red }</style></head>
+<body>
+  <p>Introducción general.</p>
+  <script>var oculto = 1;</script>
+  <h1>Facturación</h1>
+  <p>Cómo emitir una factura.</p>
+  <h2>Notas de crédito</h2>
+  <p>Anulan una factura.</p>
+  <table><tr><td>Tipo</td><td>A</td></tr><tr><td>Punto</td><td>0001</td></tr></table>
+  <h2>Remitos</h2>
+  <ul><li>Alta</li><li>Baja</li></ul>
+  <h1>Stock</h1>
+  <p>Movimientos&nbsp;de   stock.</p>
+</body></html>"""
+
+
+def test_splits_on_headings_with_heading_path():
+    sections, title = parse_html_sections(PAGE)
+    assert title == "Manual de Ventas"
+    assert [s.heading_path for s in sections] == [
+        ["Manual de Ventas"],
+        ["Facturación"],
+        ["Facturación", "Notas de crédito"],
+        ["Facturación", "Remitos"],
+        ["Stock"],
+    ]
+    assert sections[2].title == "Facturación > Notas de crédito"
+
+
+def test_section_text_starts_with_heading_and_keeps_blocks():
+    sections, _ = parse_html_sections(PAGE)
+    # Bloques separados por línea en blanco, celdas por espacio y filas/ítems por línea
+    assert sections[2].text == "Notas de crédito\n\nAnulan una factura.\n\nTipo A\nPunto 0001"
+    assert sections[3].text == "Remitos\n\nAlta\nBaja"
+    assert sections[4].text == "Stock\n\nMovimientos de stock."
+
+
+def test_skips_head_script_and_style():
+    text = sections_text(parse_html_sections(PAGE)[0])
+    assert "oculto" not in text
+    assert "color" not in text
+    assert text.startswith("Introducción general.")
+
+
+def test_empty_heading_does_not_open_a_section():
+    sections, title = parse_html_sections("<body><p>Uno</p><h2> </h2><p>Dos</p></body>")
+    assert title is None
+    assert len(sections) == 1
+    assert sections[0].heading_path == []
+    assert sections[0].text == "Uno\n\nDos"
+
+
+def test_empty_document():
+    assert parse_html_sections("") == ([], None)
+    assert parse_html_sections("   \n") == ([], None)
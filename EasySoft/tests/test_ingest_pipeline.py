@@ -0,0 +1,35 @@
+# tests/test_ingest_pipeline.py - El pipeline termina aunque falle la etapa de embeddings
+import threading
+import types
+
+import pytest
+
+
+def _fake_openai(manager):
+    def create(model, input):
+        return types.SimpleNamespace(data=[types.SimpleNamespace(index=i, embedding=[1.0]) for i in range(len(input))])
+    manager.openai_client = types.SimpleNamespace(embeddings=types.SimpleNamespace(create=create))
+
+
+@pytest.mark.parametrize("extract_workers", [0, 1])
+def test_pipeline_returns_when_embed_stage_raises(manager, tmp_path, extract_workers):
+    def broken(records):
+        raise RuntimeError("database is locked")
+
+    _fake_openai(manager)
+    manager._mark_duplicates = broken
+    manager.EXTRACT_WORKERS = extract_workers
+    manager.PIPELINE_QUEUE_SIZE = 1
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for i in range(6):
+        (docs / f"doc{i}.txt").write_text(f"Documento {i}. " + f"contenido {i} " * 80, encoding="utf-8")
+
+    result = {}
+    runner = threading.Thread(target=lambda: result.update(manager.update_documents(str(docs))), daemon=True)
+    runner.start()
+    runner.join(timeout=120)
+
+    assert not runner.is_alive(), "el pipeline quedó bloqueado"
+    assert result["errors"] == 6 and result["new"] == 0
+    assert len(manager.document_registry) == 0
@@ -0,0 +1,89 @@
+# tests/test_near_duplicates.py - Umbral de Hamming del índice SimHash
+import random
+
+import pytest
+
+from near_duplicates import SIMHASH_BITS, SimHashIndex, hamming, simhash, to_signed, to_unsigned
+
+
+def _flip(fingerprint, bits):
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+BASE = 0x0123_4567_89AB_CDEF
+
+
+@pytest.mark.parametrize("bits", [(), (0,), (5, 40), (1, 20, 63), (15, 16, 31)])
+def test_finds_within_threshold(bits):
+    index = SimHashIndex(max_distance=3)
+    index.add("canon", "a.html", BASE)
+    assert index.find(_flip(BASE, bits)) == ("canon", BASE)
+
+
+@pytest.mark.parametrize("bits", [(0, 16, 32, 48), (1, 2, 3, 4), (0, 10, 20, 30, 40)])
+def test_rejects_beyond_threshold(bits):
+    index = SimHashIndex(max_distance=3)
+    index.add("canon", "a.html", BASE)
+    assert index.find(_flip(BASE, bits)) is None
+
+
+def test_threshold_is_configurable():
+    probe = _flip(BASE, (3, 30, 50))
+    strict = SimHashIndex(max_distance=2)
+    strict.add("canon", "a.html", BASE)
+    assert strict.find(probe) is None
+    assert strict.find(_flip(BASE, (3, 50))) == ("canon", BASE)
+
+
+def test_block_index_matches_brute_force():
+    rng = random.Random(7)
+    index = SimHashIndex(max_distance=3)
+    stored = {}
+    for i in range(300):
+        fingerprint = rng.getrandbits(SIMHASH_BITS)
+        stored[f"u{i}"] = fingerprint
+        index.add(f"u{i}", "doc.html", fingerprint)
+    for uuid, fingerprint in list(stored.items())[:100]:
+        probe = _flip(fingerprint, rng.sample(range(SIMHASH_BITS), rng.randint(0, 5)))
+        expected = min((hamming(probe, f), u) for u, f in stored.items())
+        found = index.find(probe)
+        if expected[0] <= 3:
+            assert found is not None and hamming(probe, found[1]) == expected[0]
+        else:
+            assert found is None
+
+
+def test_closest_candidate_wins():
+    index = SimHashIndex(max_distance=3)
+    index.add("far", "a.html", _flip(BASE, (1, 2, 3)))
+    index.add("near", "b.html", _flip(BASE, (9,)))
+    assert index.find(BASE)[0] == "near"
+
+
+def test_remove_and_remove_documents():
+    index = SimHashIndex(max_distance=3)
+    index.add("a1", "a.html", BASE)
+    index.add("b1", "b.html", _flip(BASE, (60,)))
+    index.remove("a1")
+    assert index.find(BASE)[0] == "b1"
+    index.remove_documents(["b.html"])
+    assert index.find(BASE) is None and len(index) == 0
+
+
+def test_simhash_of_similar_text_is_close():
+    words = " ".join(f"palabra{i}" for i in range(200))
+    edited = words.replace("palabra100", "otra")
+    unrelated = " ".join(f"termino{i}" for i in range(200))
+    assert simhash("") == 0
+    assert simhash(words) == simhash(words.upper())
+    assert hamming(simhash(words), simhash(edited)) <= 3
+    assert hamming(simhash(words), simhash(unrelated)) > 3
+
+
+def test_signed_roundtrip_for_sqlite():
+    for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        signed = to_signed(value)
+        assert -(1 << 63) <= signed < (1 << 63)
+        assert to_unsigned(signed) == value
@@ -0,0 +1,87 @@
+# tests/test_rebuild_publish.py - Publicación de un rebuild con un documento parcial
+import types
+
+import httpx
+import openai
+import pytest
+
+import weaviate_manager
+from config import Config
+from weaviate_manager import ProcessingStats
+
+BAD = "FRAGMENTO_RECHAZADO"
+
+
+@pytest.fixture
+def partial(manager, tmp_path, monkeypatch):
+    """Dos documentos; un chunk del segundo siempre es rechazado por la API de embeddings"""
+    def create(model, input):
+        if any(BAD in text for text in input):
+            raise openai.BadRequestError("invalid input", response=httpx.Response(
+                400, request=httpx.Request("POST", "https://api.openai.com/v1/embeddings")), body=None)
+        return types.SimpleNamespace(data=[types.SimpleNamespace(index=i, embedding=[1.0]) for i in range(len(input))])
+
+    manager.openai_client = types.SimpleNamespace(embeddings=types.SimpleNamespace(create=create))
+    manager.EXTRACT_WORKERS = 0
+    manager.NEAR_DUPLICATE_DETECTION = False
+    manager.near_duplicates = None
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    paragraphs = [f"Párrafo {i}. " + f"contenido del documento número {i} " * 40 for i in range(6)]
+    (docs / "bueno.txt").write_text("\n\n".join(paragraphs), encoding="utf-8")
+    paragraphs[3] = f"Párrafo 3. {BAD} " + "texto " * 200
+    (docs / "parcial.txt").write_text("\n\n".join(paragraphs), encoding="utf-8")
+
+    published = []
+    monkeypatch.setattr(weaviate_manager, "swap_alias", lambda client, target, alias: published.append(target))
+    manager.collect_old_collections = lambda: None
+    manager._unstage_registry = lambda promote=False: None
+    return manager, docs, published
+
+
+def test_partial_document_counts_as_error_and_publishes_within_ratio(partial, monkeypatch):
+    manager, docs, published = partial
+    result = manager.update_documents(str(docs))
+
+    path = str(docs / "parcial.txt")
+    doc = manager.document_registry[path]
+    assert result["errors"] == 1 and result["new"] == 1
+    assert doc.failed_chunks == 1 and doc.error
+    store = manager.weaviate_client.collections.get(manager.collection_name).store
+    written = sum(1 for obj in store.values() if obj["archivo_original"] == path)
+    assert manager._expected_object_counts()[path] == written == doc.chunks_count - 1
+
+    stats = ProcessingStats(errors=result["errors"])
+    monkeypatch.setattr(Config, "REBUILD_MAX_ERROR_RATIO", 0.5)
+    assert manager._publish_rebuild(manager.collection_name, 2, stats)
+    assert published == [manager.collection_name]
+
+
+def test_partial_document_over_ratio_is_not_published_nor_requeued(partial, monkeypatch):
+    manager, docs, published = partial
+    result = manager.update_documents(str(docs))
+
+    monkeypatch.setattr(Config, "REBUILD_MAX_ERROR_RATIO", 0.2)
+    assert not manager._publish_rebuild(manager.collection_name, 2, ProcessingStats(errors=result["errors"]))
+    assert published == []
+    assert len(manager.document_registry) == 2
+
+
+def test_partial_document_is_retried_by_the_next_update(partial):
+    manager, docs, _ = partial
+    manager.update_documents(str(docs))
+
+    changes = manager.detect_changes(manager.scan_directory(str(docs)))
+    assert changes["modified"] == [str(docs / "parcial.txt")]
+    assert changes["unchanged"] == [str(docs / "bueno.txt")]
+
+
+def test_requeue_incomplete_documents_removes_every_mismatch(partial):
+    manager, docs, _ = partial
+    manager.update_documents(str(docs))
+    store = manager.weaviate_client.collections.get(manager.collection_name).store
+    for uuid in [uuid for uuid, obj in store.items() if obj["numero_chunk"] == 1]:
+        del store[uuid]
+
+    manager._requeue_incomplete_documents(manager.collection_name)
+    assert len(manager.document_registry) == 0
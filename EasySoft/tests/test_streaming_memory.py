@@ -0,0 +1,72 @@
+# tests/test_streaming_memory.py - Memoria acotada al ingerir texto plano grande por ventanas
+import os
+import random
+import time
+import tracemalloc
+
+from weaviate_manager import DocumentInfo, ProcessingStats
+
+SMALL_BYTES = 512 * 1024
+LARGE_BYTES = 3 * 1024 * 1024
+
+
+def _write_large_text(path, size):
+    rng = random.Random(48)
+    vocabulary = [f"palabra{i}" for i in range(5000)]
+    with open(path, "w", encoding="utf-8") as f:
+        written = 0
+        while written < size:
+            paragraph = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(20, 120))) + "\n\n"
+            f.write(paragraph)
+            written += len(paragraph)
+
+
+def _measure(manager, path):
+    doc_info = DocumentInfo(file_path=path, file_name=os.path.basename(path), file_hash="h",
+                            last_modified=0.0, file_size=os.path.getsize(path), content_length=0)
+    stats = ProcessingStats()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        started = time.monotonic()
+        manager._ingest_streaming("new", doc_info, stats)
+        elapsed = time.monotonic() - started
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return doc_info, peak, elapsed
+
+
+def test_streaming_peak_memory_is_bounded(manager, tmp_path):
+    windows, written = [], []
+
+    def embed(records):
+        windows.append(len(records))
+        for record in records:
+            record.vector = [0.0] * 8
+
+    def write(records):
+        written.append(len(records))
+        return {}
+
+    manager._embed_records = embed
+    manager._write_records = write
+    manager.STREAM_MIN_BYTES = SMALL_BYTES // 2
+    peaks = {}
+    for size in (SMALL_BYTES, LARGE_BYTES):
+        path = str(tmp_path / f"grande_{size}.txt")
+        _write_large_text(path, size)
+        assert manager._should_stream(DocumentInfo(path, "grande.txt", "h", 0.0, os.path.getsize(path), 0))
+        written.clear()
+        doc_info, peaks[size], elapsed = _measure(manager, path)
+
+        assert doc_info.error is None and doc_info.vectorized
+        assert doc_info.content_length == os.path.getsize(path)
+        assert sum(written) == doc_info.chunks_count > manager.EMBEDDING_BATCH_SIZE
+        assert max(windows) <= manager.EMBEDDING_BATCH_SIZE
+
+    # El pico depende de la ventana, no del archivo: 6 veces más texto casi no lo mueve,
+    # y queda por debajo del propio archivo (cargarlo entero ya ocuparía eso más los chunks)
+    detail = f"picos {peaks[SMALL_BYTES] / 1e6:.2f} / {peaks[LARGE_BYTES] / 1e6:.2f} MB"
+    assert peaks[LARGE_BYTES] < peaks[SMALL_BYTES] * 1.5, detail
+    assert peaks[LARGE_BYTES] < LARGE_BYTES, detail
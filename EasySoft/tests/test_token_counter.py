@@ -0,0 +1,66 @@
+# tests/test_token_counter.py - Conteo por caracteres cuando tiktoken o su vocabulario no están
+import pickle
+import types
+
+import pytest
+
+import token_counter
+from token_counter import CHARS_PER_TOKEN, TokenCounter
+
+
+@pytest.fixture
+def no_tiktoken(monkeypatch):
+    monkeypatch.setattr(token_counter, "tiktoken", None)
+
+
+def _failing_tiktoken(calls):
+    def get_encoding(name):
+        calls.append(name)
+        raise ConnectionError("sin red")
+    return types.SimpleNamespace(get_encoding=get_encoding)
+
+
+def test_count_without_tiktoken(no_tiktoken):
+    counter = TokenCounter()
+    assert not counter.exact
+    assert counter.count("") == 0
+    assert counter.count("a" * 35) == int(35 / CHARS_PER_TOKEN) + 1
+
+
+def test_split_truncate_and_tail_without_tiktoken(no_tiktoken):
+    counter = TokenCounter()
+    text = "".join(chr(ord("a") + i % 26) for i in range(100))
+    windows = counter.split(text, max_tokens=10, overlap=2)
+    size, stride = int(10 * CHARS_PER_TOKEN), int(8 * CHARS_PER_TOKEN)
+    assert windows == [text[start:start + size] for start in range(0, 100 - size + stride, stride)]
+    assert windows[-1].endswith(text[-1])
+    assert counter.truncate(text, 4) == text[:int(4 * CHARS_PER_TOKEN)]
+    assert counter.tail(text, 2) == text[-int(2 * CHARS_PER_TOKEN):]
+    assert counter.tail(text, 0) == ""
+    assert counter.split("", 10) == [""]
+
+
+def test_encoding_load_error_falls_back_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(token_counter, "tiktoken", _failing_tiktoken(calls))
+    counter = TokenCounter()
+    assert counter.count("hola mundo") == int(len("hola mundo") / CHARS_PER_TOKEN) + 1
+    assert not counter.exact
+    assert calls == ["cl100k_base"]   # No se reintenta la descarga en cada llamada
+
+
+def test_offline_does_not_load_uncached_vocabulary(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(token_counter, "tiktoken", _failing_tiktoken(calls))
+    monkeypatch.setenv("TIKTOKEN_CACHE_DIR", str(tmp_path))
+    counter = TokenCounter(offline=True)
+    assert not counter.exact
+    assert calls == []
+
+
+def test_pickle_keeps_offline_and_reloads(no_tiktoken):
+    counter = TokenCounter("cl100k_base", offline=True)
+    counter.count("x")
+    copy = pickle.loads(pickle.dumps(counter))
+    assert copy.offline and copy.encoding_name == "cl100k_base"
+    assert not copy._loaded
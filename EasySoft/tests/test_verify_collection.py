@@ -0,0 +1,110 @@
+# tests/test_verify_collection.py - Reconciliación de huérfanos y faltantes en verify
+import pytest
+
+from weaviate_manager import DocumentInfo
+
+
+def _register(manager, path, chunks, file_hash="h1"):
+    """Registra un documento y guarda en la colección los objetos que el registro espera"""
+    manager.document_registry[path] = DocumentInfo(
+        file_path=path, file_name=path.rsplit("/", 1)[-1], file_hash=file_hash, last_modified=0.0,
+        file_size=1, content_length=1, vectorized=True, chunked=bool(chunks), chunks_count=chunks
+    )
+    store = manager.weaviate_client.collections.get(manager.collection_name).store
+    for number in (range(1, chunks + 1) if chunks else (0,)):
+        store[manager._chunk_uuid(path, number)] = {"archivo_original": path, "hash_archivo": file_hash}
+    return store
+
+
+@pytest.fixture
+def populated(manager):
+    _register(manager, "/docs/a.html", 3)
+    _register(manager, "/docs/b.html", 0)
+    store = _register(manager, "/docs/c.html", 2)
+    return manager, store
+
+
+def test_clean_collection(populated):
+    manager, _ = populated
+    result = manager.verify_collection()
+    assert result["expected_objects"] == result["objects"] == 6
+    assert result["orphans"] == result["missing_objects"] == result["stale_documents"] == 0
+
+
+def test_reports_orphans_missing_and_stale_without_fix(populated):
+    manager, store = populated
+    orphan = "00000000-0000-0000-0000-000000000001"
+    store[orphan] = {"archivo_original": "/docs/borrado.html", "hash_archivo": "x"}
+    del store[manager._chunk_uuid("/docs/a.html", 2)]
+    store[manager._chunk_uuid("/docs/b.html", 0)]["hash_archivo"] = "viejo"
+
+    result = manager.verify_collection()
+    assert result["orphans"] == 1 and result["orphan_documents"] == 1
+    assert result["orphan_sample"] == [f"{orphan} /docs/borrado.html"]
+    assert result["missing_objects"] == 1 and result["missing_documents"] == 1
+    assert result["stale_documents"] == 1
+    # Sin fix no se toca nada
+    assert orphan in store and result["orphans_deleted"] == result["requeued_documents"] == 0
+    assert "/docs/a.html" in manager.document_registry
+
+
+def test_fix_deletes_orphans_and_requeues_incomplete(populated):
+    manager, store = populated
+    orphans = [f"00000000-0000-0000-0000-00000000000{i}" for i in range(1, 4)]
+    for uuid in orphans:
+        store[uuid] = {"archivo_original": "/docs/borrado.html", "hash_archivo": "x"}
+    del store[manager._chunk_uuid("/docs/a.html", 3)]
+    store[manager._chunk_uuid("/docs/b.html", 0)]["hash_archivo"] = "viejo"
+
+    result = manager.verify_collection(fix=True)
+    assert "error" not in result
+    assert result["orphans_deleted"] == 3 and not any(uuid in store for uuid in orphans)
+    assert result["requeued_documents"] == 2
+    assert sorted(manager.document_registry.keys()) == ["/docs/c.html"]
+    # Sus objetos se borran: el próximo update los trata como nuevos y no limpiaría los obsoletos
+    assert {obj["archivo_original"] for obj in store.values()} == {"/docs/c.html"}
+
+
+def test_batches_do_not_change_the_result(populated, monkeypatch):
+    from config import Config
+    manager, store = populated
+    store["00000000-0000-0000-0000-000000000009"] = {"archivo_original": "/x", "hash_archivo": "x"}
+    monkeypatch.setattr(Config, "VERIFY_BATCH_SIZE", 2)
+    result = manager.verify_collection(fix=True)
+    assert result["objects"] == 7 and result["orphans_deleted"] == 1 and result["missing_objects"] == 0
+
+
+def test_skipped_duplicate_chunks_are_not_missing(populated):
+    manager, store = populated
+    duplicate = manager._chunk_uuid("/docs/c.html", 2)
+    canonical = manager._chunk_uuid("/docs/a.html", 1)
+    del store[duplicate]
+    manager.document_registry.add_chunks("/docs/c.html", [], [(duplicate, canonical, 0, 10)])
+    result = manager.verify_collection()
+    assert result["expected_objects"] == 5 and result["missing_objects"] == 0
+
+
+def test_fix_refused_for_registry_of_another_collection(populated):
+    manager, store = populated
+    orphan = "00000000-0000-0000-0000-000000000001"
+    store[orphan] = {"archivo_original": "/x", "hash_archivo": "x"}
+    del store[manager._chunk_uuid("/docs/a.html", 1)]
+    manager.document_registry.collection = "Documento_v7"
+
+    result = manager.verify_collection(fix=True)
+    assert "Documento_v7" in result["error"]
+    assert result["orphans"] == 1 and result["orphans_deleted"] == 0 and orphan in store
+    assert result["requeued_documents"] == 0 and "/docs/a.html" in manager.document_registry
+
+
+def test_fix_refused_while_a_rebuild_is_unfinished(populated):
+    manager, store = populated
+    orphan = "00000000-0000-0000-0000-000000000001"
+    store[orphan] = {"archivo_original": "/x", "hash_archivo": "x"}
+    job_id = manager.journal.start("rebuild", "/docs", [])
+
+    result = manager.verify_collection(fix=True)
+    assert f"#{job_id}" in result["error"] and orphan in store
+
+    manager.journal.finish(job_id)
+    assert manager.verify_collection(fix=True)["orphans_deleted"] == 1
@@ -0,0 +1,116 @@
+# token_counter.py - Conteo de tokens con el tokenizer local del modelo de embeddings (tiktoken)
+import hashlib
+import os
+import tempfile
+from typing import List
+
+try:
+    import tiktoken
+except ImportError:   # Sin tiktoken se estima por caracteres
+    tiktoken = None
+
+CHARS_PER_TOKEN = 3.5
+
+# Vocabularios que tiktoken descarga la primera vez (para saber si ya están en su cache local)
+VOCABULARY_URLS = {
+    "cl100k_base": "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken",
+}
+
+
+def vocabulary_cached(encoding_name: str) -> bool:
+    """True si tiktoken puede cargar el encoding sin red (ya cargado o en su cache de disco)"""
+    if tiktoken is None:
+        return False
+    try:
+        from tiktoken.registry import ENCODINGS
+        if encoding_name in ENCODINGS:
+            return True
+    except ImportError:
+        pass
+    url = VOCABULARY_URLS.get(encoding_name)
+    if url is None:
+        return False
+    # Misma ubicación que tiktoken.load.read_file_cached
+    cache_dir = os.environ.get("TIKTOKEN_CACHE_DIR", os.environ.get("DATA_GYM_CACHE_DIR"))
+    if cache_dir is None:
+        cache_dir = os.path.join(tempfile.gettempdir(), "data-gym-cache")
+    return bool(cache_dir) and os.path.exists(os.path.join(cache_dir, hashlib.sha1(url.encode()).hexdigest()))
+
+
+class TokenCounter:
+    """
+    Cuenta, corta y trunca texto en tokens reales (cl100k_base: text-embedding-ada-002).
+    Si tiktoken no está instalado o no puede cargar el encoding, usa len/3.5 ('exact' = False).
+    Con offline solo usa tiktoken si el vocabulario ya está en disco: nunca lo descarga.
+    Es serializable: cada proceso del pool vuelve a cargar el encoding.
+    """
+
+    def __init__(self, encoding_name: str = "cl100k_base", offline: bool = False):
+        self.encoding_name = encoding_name
+        self.offline = offline
+        self._encoding = None
+        self._loaded = False
+
+    def __getstate__(self):
+        return {"encoding_name": self.encoding_name, "offline": self.offline}
+
+    def __setstate__(self, state):
+        self.__init__(state["encoding_name"], state.get("offline", False))
+
+    @property
+    def encoding(self):
+        if not self._loaded:
+            self._loaded = True
+            if tiktoken is not None and not (self.offline and not vocabulary_cached(self.encoding_name)):
+                try:
+                    self._encoding = tiktoken.get_encoding(self.encoding_name)
+                except Exception:
+                    self._encoding = None   # p. ej. sin red para descargar el vocabulario
+        return self._encoding
+
+    @property
+    def exact(self) -> bool:
+        return self.encoding is not None
+
+    def _encode(self, text: str) -> List[int]:
+        return self.encoding.encode(text, disallowed_special=())
+
+    def _decode(self, tokens: List[int]) -> str:
+        # Un corte puede caer en medio de un carácter multibyte: se descarta el fragmento
+        return self.encoding.decode_bytes(tokens).decode("utf-8", errors="ignore")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is None:
+            return int(len(text) / CHARS_PER_TOKEN) + 1
+        return len(self._encode(text))
+
+    def split(self, text: str, max_tokens: int, overlap: int = 0) -> List[str]:
+        """Ventanas de hasta max_tokens tokens (con overlap) para texto sin cortes naturales"""
+        max_tokens = max(1, max_tokens)
+        step = max(1, max_tokens - overlap)
+        if self.encoding is None:
+            units, size, stride = text, int(max_tokens * CHARS_PER_TOKEN), max(1, int(step * CHARS_PER_TOKEN))
+            join = lambda part: part
+        else:
+            units, size, stride = self._encode(text), max_tokens, step
+            join = self._decode
+
+        windows = []
+        for start in range(0, max(len(units), 1), stride):
+            windows.append(join(units[start:start + size]))
+            if start + size >= len(units):
+                break
+        return windows
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        return self.split(text, max_tokens)[0] if text else text
+
+    def tail(self, text: str, tokens: int) -> str:
+        """Últimos 'tokens' tokens del texto (para el overlap entre chunks)"""
+        if tokens <= 0 or not text:
+            return ""
+        if self.encoding is None:
+            return text[-int(tokens * CHARS_PER_TOKEN):]
+        return self._decode(self._encode(text)[-tokens:])
@@ -20,6 +20,7 @@ def print_help():
     print("🔧 OPCIONES:")
     print("   --reset     : Limpia completamente la base de datos antes de procesar")
     print("   --rebuild   : Reconstruye toda la base de datos desde cero")
+    print("   --paranoid  : Calcula el hash de todos los archivos (ignora tamaño/fecha)")
     print("   --stats     : Solo muestra estadísticas actuales")
     print("   --report    : Solo genera reporte detallado")
     print("   --help      : Muestra esta ayuda")
@@ -110,7 +111,8 @@ def main():
                 return 0
         
         # Ejecutar actualización
-        stats = manager.update_documents(document_path, force_rebuild=force_rebuild)
+        stats = manager.update_documents(document_path, force_rebuild=force_rebuild,
+                                         paranoid='--paranoid' in options)
         
         if "error" in stats:
             print("\n❌ ERROR DURANTE EL PROCESAMIENTO")
@@ -134,6 +136,21 @@ def main():
         print(f"📄 Archivos con chunks:    {stats.get('chunked_files', 0):,}")
         print(f"🔢 Total chunks creados:   {stats.get('total_chunks', 0):,}")
         print(f"🎯 Documentos vectorizados: {stats.get('vectorized_documents', 0):,}")
+        chunk_tokens = stats.get('chunk_tokens') or {}
+        if chunk_tokens.get('count'):
+            print(f"🔤 Tokens por chunk:       media {chunk_tokens['mean']}, p50 {chunk_tokens['p50']}, "
+                  f"p90 {chunk_tokens['p90']}, máx {chunk_tokens['max']}")
+        if stats.get('duplicate_chunks'):
+            print(f"♊ Chunks duplicados:      {stats['duplicate_chunks']:,} omitidos "
+                  f"({stats.get('duplicate_tokens', 0):,} tokens ahorrados)")
+        if stats.get('truncated_chunks'):
+            print(f"✂️ Chunks truncados:       {stats['truncated_chunks']:,}")
+        print(f"📡 Requests de embeddings: {stats.get('embedding_requests', 0):,}")
+        print(f"♻️ Cache de embeddings:    {stats.get('cache_hit_ratio', 0):.0%} aciertos "
+              f"({stats.get('requests_saved', 0):,} requests ahorrados)")
+        for stage, info in stats.get('stages', {}).items():
+            print(f"🚀 Etapa {stage:<8}         {info['items']:,} items ({info['per_second']}/s)")
+        print(f"⏱️ Tiempo total:           {stats.get('elapsed_seconds', 0):.1f}s")
         
         total_changes = stats.get('new', 0) + stats.get('modified', 0) + stats.get('deleted', 0)
         
@@ -156,6 +173,7 @@ def main():
         report_file = manager.generate_vectorization_report()
         if report_file:
             print(f"✅ Reporte completo generado: {report_file}")
+            print(f"   ⏱️ Tiempos por etapa (JSON): {os.path.splitext(report_file)[0]}.json")
         
         # Consejos finales
         print("\n💡 PRÓXIMOS PASOS:")
@@ -181,7 +199,7 @@ def main():
         print("   2. ¿Es correcto el API key de OpenAI?")
         print("      Revisa el archivo .env")
         print("   3. ¿Hay permisos de escritura?")
-        print("      ls -la document_metadata.json")
+        print("      ls -la document_registry.sqlite3")
         print("\n💡 Si persisten los errores:")
         print("   python update_documents.py --reset")
         return 1
@@ -9,13 +9,9 @@ class EmbeddingUtils:
         self.openai_service = openai_service
 
     def get_embeddings(self, text: str) -> Optional[List[float]]:
-        """Obtiene embeddings de OpenAI"""
+        """Obtiene embeddings de OpenAI (reintentos y hedging en OpenAIService)"""
         try:
-            response = self.openai_service.client.embeddings.create(
-                model="text-embedding-ada-002",
-                input=text
-            )
-            return response.data[0].embedding
+            return self.openai_service.create_embedding(text)
         except Exception as e:
             logging.error(f"Error al obtener embeddings de OpenAI: {e}")
             return None
@@ -0,0 +1,134 @@
+# vector_snapshot.py - Exportar/importar la colección con sus vectores (sin volver a vectorizar)
+import io
+import json
+import zipfile
+from datetime import date, datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import weaviate.classes as wvc
+
+SNAPSHOT_FORMAT = "easysoft-vectors"
+SNAPSHOT_VERSION = 1
+MANIFEST = "manifest.json"
+
+
+def _vector_of(obj) -> Optional[List[float]]:
+    # weaviate-client 4.5+ devuelve {"default": [...]} (vectores con nombre)
+    vector = obj.vector
+    if isinstance(vector, dict):
+        vector = vector.get("default")
+    return vector or None
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _write_part(archive: zipfile.ZipFile, index: int, uuids: List[str], vectors: List[List[float]],
+                properties: List[Dict]) -> Dict:
+    """Una parte columnar: matriz float32 (.npy) + columnas de propiedades (.json)"""
+    names = sorted({name for props in properties for name in props})
+    columns = {name: [_json_value(props.get(name)) for props in properties] for name in names}
+    vectors_name, properties_name = f"part-{index:05d}.npy", f"part-{index:05d}.json"
+
+    with archive.open(vectors_name, "w", force_zip64=True) as f:
+        np.save(f, np.asarray(vectors, dtype=np.float32), allow_pickle=False)
+    with archive.open(properties_name, "w", force_zip64=True) as f:
+        f.write(json.dumps({"uuid": uuids, "properties": columns}, ensure_ascii=False).encode("utf-8"))
+    return {"vectors": vectors_name, "properties": properties_name, "objects": len(uuids)}
+
+
+def export_collection(collection, output_path: str, part_size: int = 5000,
+                      metadata: Optional[Dict] = None, extra_files: Optional[Dict[str, object]] = None,
+                      progress: Callable[[int], None] = None) -> Dict:
+    """
+    Recorre la colección con el iterador por cursor (include_vector) y la escribe en un zip
+    comprimido por partes de part_size objetos: la memoria no depende del tamaño de la colección.
+    Los objetos sin vector se omiten. Devuelve el manifiesto.
+    """
+    parts, skipped, dimensions = [], 0, None
+    uuids, vectors, properties = [], [], []
+
+    with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        for obj in collection.iterator(include_vector=True):
+            vector = _vector_of(obj)
+            if vector is None or (dimensions is not None and len(vector) != dimensions):
+                skipped += 1
+                continue
+            dimensions = dimensions or len(vector)
+            uuids.append(str(obj.uuid))
+            vectors.append(vector)
+            properties.append(obj.properties)
+            if len(uuids) >= part_size:
+                parts.append(_write_part(archive, len(parts), uuids, vectors, properties))
+                uuids, vectors, properties = [], [], []
+                if progress:
+                    progress(sum(part["objects"] for part in parts))
+        if uuids:
+            parts.append(_write_part(archive, len(parts), uuids, vectors, properties))
+
+        for name, content in (extra_files or {}).items():
+            archive.writestr(name, json.dumps(content, ensure_ascii=False, default=str))
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "created_at": datetime.now().isoformat(),
+            "objects": sum(part["objects"] for part in parts),
+            "skipped_without_vector": skipped,
+            "dimensions": dimensions or 0,
+            "parts": parts,
+            "files": sorted(extra_files or {}),
+            **(metadata or {})
+        }
+        archive.writestr(MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=2))
+    return manifest
+
+
+def read_manifest(archive: zipfile.ZipFile) -> Dict:
+    manifest = json.loads(archive.read(MANIFEST))
+    if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("version", 0) > SNAPSHOT_VERSION:
+        raise ValueError(f"Formato de snapshot no soportado: {manifest.get('format')} v{manifest.get('version')}")
+    return manifest
+
+
+def iter_parts(archive: zipfile.ZipFile, manifest: Dict) -> Iterator[Tuple[List[str], np.ndarray, List[Dict]]]:
+    """(uuids, matriz float32, propiedades por objeto) de cada parte, una a la vez"""
+    for part in manifest["parts"]:
+        vectors = np.load(io.BytesIO(archive.read(part["vectors"])), allow_pickle=False)
+        data = json.loads(archive.read(part["properties"]))
+        columns = data["properties"]
+        properties = [
+            {name: values[i] for name, values in columns.items() if values[i] is not None}
+            for i in range(len(data["uuid"]))
+        ]
+        yield data["uuid"], vectors, properties
+
+
+def import_into(collection, archive: zipfile.ZipFile, manifest: Dict, batch_size: int = 200,
+                on_part: Callable[[List[str], np.ndarray, List[Dict]], None] = None,
+                progress: Callable[[int], None] = None) -> Tuple[int, Dict[str, str]]:
+    """Carga las partes con insert_many (mismos UUID y vectores); devuelve (insertados, errores por uuid)"""
+    inserted, errors = 0, {}
+    for uuids, vectors, properties in iter_parts(archive, manifest):
+        for start in range(0, len(uuids), batch_size):
+            objects = [
+                wvc.data.DataObject(properties=properties[i], vector=vectors[i].tolist(), uuid=uuids[i])
+                for i in range(start, min(start + batch_size, len(uuids)))
+            ]
+            try:
+                result = collection.data.insert_many(objects)
+                for idx, error in result.errors.items():
+                    errors[uuids[start + idx]] = error.message
+                inserted += len(objects) - len(result.errors)
+            except Exception as e:
+                for obj in objects:
+                    errors[str(obj.uuid)] = str(e)
+        if on_part:
+            on_part(uuids, vectors, properties)
+        if progress:
+            progress(inserted)
+    return inserted, errors
@@ -7,22 +7,54 @@ import hashlib
 import mimetypes
 import logging
 import re
-from datetime import datetime
+import time
+import queue
+import multiprocessing
+import itertools
+import threading
+import zipfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from dataclasses import dataclass, field
 import argparse
 
-from openai import OpenAI
+from openai import OpenAI, AuthenticationError, BadRequestError, NotFoundError, PermissionDeniedError
 from bs4 import BeautifulSoup
 import weaviate
-from weaviate.classes.config import Configure, Property, DataType
+from weaviate.classes.config import Configure, Property, DataType, Tokenization
+from weaviate.classes.query import Filter
 from weaviate.connect import ConnectionParams
 from weaviate.util import generate_uuid5
 import weaviate.classes as wvc
 import numpy as np
 
 from config import Config
+from embedding_cache import EmbeddingCache
+from document_registry import DocumentRegistry
+from ingest_journal import IngestJournal
+from document_watcher import DocumentWatcher
+from token_counter import TokenCounter
+from near_duplicates import SimHashIndex, simhash, to_signed, to_unsigned
+from html_sections import HtmlSection, parse_html_sections, sections_text
+from collection_alias import DEFAULT_ALIAS, resolve_collection, next_version_name, list_versions, swap_alias, collect_garbage
+import vector_snapshot
+
+# Errores del servicio de embeddings que no se arreglan reintentando (credencial, permisos, modelo)
+EMBEDDING_FATAL_ERRORS = (AuthenticationError, PermissionDeniedError, NotFoundError)
+EMBEDDING_MAX_RETRY_AFTER = 60   # Tope para el Retry-After de la API (segundos)
+
+
+class EmbeddingServiceError(RuntimeError):
+    """La API de embeddings no responde o rechaza los pedidos: la ingesta se corta en lugar de seguir lote por lote"""
+
+
+def _is_input_error(error: Exception) -> bool:
+    """Lote rechazado por su contenido (texto inválido o demasiado largo): dividirlo aísla el texto culpable"""
+    return isinstance(error, BadRequestError) or "maximum context length" in str(error).lower()
+
 
 @dataclass
 class DocumentInfo:
@@ -36,9 +68,12 @@ class DocumentInfo:
     vectorized: bool = False
     chunked: bool = False
     chunks_count: int = 0
+    failed_chunks: int = 0   # Chunks que no se pudieron escribir (documento parcial)
     error: Optional[str] = None
     created_at: str = None
     updated_at: str = None
+    mtime_ns: int = 0
+    hash_algo: str = "md5"   # Registros anteriores usaban MD5
 
     def __post_init__(self):
         if self.created_at is None:
@@ -58,166 +93,166 @@ class ProcessingStats:
     total_chunks: int = 0
     vectorized_documents: int = 0
     skipped_large: int = 0
+    embedding_requests: int = 0
+    embedding_retries: int = 0
+    embedded_chunks: int = 0
+    object_errors: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    requests_saved: int = 0
+    truncated_chunks: int = 0
+    chunk_tokens: List[int] = field(default_factory=list)
+    duplicate_chunks: int = 0
+    duplicate_tokens: int = 0
+    requeued_documents: int = 0
+    aborted: Optional[str] = None   # Motivo si la ingesta se cortó por un error del servicio de embeddings
+    stages: Dict[str, "StageStats"] = field(default_factory=dict)
 
-class WeaviateManager:
-    """Gestor completo de documentos en Weaviate con chunking inteligente optimizado"""
-    
-    def __init__(self, openai_api_key: str = None):
-        self.openai_client = OpenAI(api_key=openai_api_key or Config.OPENAI_API_KEY)
-        self.weaviate_client = None
-        self.metadata_file = "document_metadata.json"
-        self.document_registry = {}
-        
-        # Configurar logging
-        self._setup_logging()
-        
-        # Configuración de archivos
-        self.ignored_extensions = {".gz", ".skn", ".ppf", ".ejs", ".docx", ".pyc", "__pycache__"}
-        self.ignored_files = {
-            "preguntas_no_respondidas.txt",
-            "vectorizatodos.py", "weaviate_manager.py", "app.py", 
-            "config.py", "document_metadata.json", ".env", "update_documents.py"
+    def stage(self, name: str) -> "StageStats":
+        """Tiempos acumulados de una etapa (se crea al primer uso)"""
+        return self.stages.setdefault(name, StageStats())
+
+def _token_distribution(chunk_tokens: List[int]) -> Dict[str, float]:
+    """Distribución de tokens por chunk escrito (para el resumen y el reporte)"""
+    if not chunk_tokens:
+        return {"count": 0, "total": 0, "mean": 0.0, "p50": 0, "p90": 0, "p99": 0, "max": 0}
+    values = np.asarray(chunk_tokens)
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        "count": int(values.size),
+        "total": int(values.sum()),
+        "mean": round(float(values.mean()), 1),
+        "p50": int(p50),
+        "p90": int(p90),
+        "p99": int(p99),
+        "max": int(values.max())
+    }
+
+@dataclass
+class StageStats:
+    """Trabajo realizado por una etapa del pipeline de ingesta (una duración por llamada)"""
+    items: int = 0
+    busy_seconds: float = 0.0
+    nbytes: int = 0
+    tokens: int = 0
+    durations: List[float] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, items: int, seconds: float, nbytes: int = 0, tokens: int = 0):
+        with self._lock:
+            self.items += items
+            self.busy_seconds += seconds
+            self.nbytes += nbytes
+            self.tokens += tokens
+            self.durations.append(seconds)
+
+    def add_volume(self, nbytes: int = 0, tokens: int = 0):
+        """Bytes/tokens que no corresponden a una llamada medida aparte"""
+        with self._lock:
+            self.nbytes += nbytes
+            self.tokens += tokens
+
+    def summary(self, elapsed: float) -> Dict:
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 2),
+            "per_second": round(self.items / elapsed, 1) if elapsed > 0 else 0.0
         }
+
+    def timing(self) -> Dict:
+        """Tiempo acumulado, percentiles por llamada (ms) y volumen procesado"""
+        with self._lock:
+            durations = np.asarray(self.durations) * 1000
+            p50, p90, p99 = np.percentile(durations, [50, 90, 99]) if durations.size else (0.0, 0.0, 0.0)
+            return {
+                "calls": int(durations.size),
+                "items": self.items,
+                "total_seconds": round(self.busy_seconds, 3),
+                "p50_ms": round(float(p50), 2),
+                "p90_ms": round(float(p90), 2),
+                "p99_ms": round(float(p99), 2),
+                "max_ms": round(float(durations.max()), 2) if durations.size else 0.0,
+                "bytes": self.nbytes,
+                "tokens": self.tokens,
+                "items_per_busy_second": round(self.items / self.busy_seconds, 1) if self.busy_seconds > 0 else 0.0
+            }
+
+# Orden de las etapas en el reporte de tiempos
+TIMING_STAGES = ("scan", "parse", "chunk", "extract", "embed", "embedding_api", "write", "weaviate_insert")
+
+@dataclass
+class ChunkRecord:
+    """Chunk listo para vectorizar e insertar en Weaviate"""
+    doc_path: str
+    uuid: str
+    text: str
+    properties: Dict
+    vector: Optional[List[float]] = None
+    token_count: int = 0
+    truncated: bool = False
+    simhash: int = 0
+    duplicate_of: Optional[str] = None   # UUID del chunk canónico casi idéntico (no se vectoriza ni se guarda)
+    canonical_simhash: int = 0
+
+class DocumentChunker:
+    """
+    Extracción de texto y chunking, sin clientes de red.
+    Es serializable (pickle) para poder ejecutarse en un pool de procesos.
+    """
+    
+    SETTINGS = ("MAX_TOKENS", "CHUNK_TOKENS", "CHUNK_OVERLAP_TOKENS", "TOKENIZER_ENCODING",
+                "FILE_TYPE_CONFIGS", "SMART_CHUNK_EXTENSIONS", "NEAR_DUPLICATE_DETECTION",
+                "STREAM_EXTENSIONS", "STREAM_MIN_BYTES", "STREAM_READ_CHARS")
+    
+    def __init__(self, settings: Optional[Dict] = None):
+        self.logger = logging.getLogger(__name__)
         
-        # ?? CONFIGURACIÓN DE CHUNKING OPTIMIZADA
-        self.MAX_TOKENS = 4000     # Reducido para mejor precisión
-        self.MAX_CHARS = 14000     # ~3.5 chars por token
-        self.CHUNK_OVERLAP = 200   # Overlap optimizado
+        # ?? CONFIGURACIÓN DE CHUNKING (en tokens del tokenizer del modelo de embeddings)
+        self.MAX_TOKENS = Config.EMBEDDING_MAX_INPUT_TOKENS   # Límite duro de la API por texto
+        self.CHUNK_TOKENS = Config.CHUNK_MAX_TOKENS
+        self.CHUNK_OVERLAP_TOKENS = Config.CHUNK_OVERLAP_TOKENS
+        self.TOKENIZER_ENCODING = Config.TOKENIZER_ENCODING
         
-        # Tamaños específicos por tipo de archivo
+        # Tamaños específicos por tipo de archivo (el código usa menos overlap: son líneas completas)
+        text_config = {"max_tokens": self.CHUNK_TOKENS, "overlap": self.CHUNK_OVERLAP_TOKENS}
+        code_config = {"max_tokens": self.CHUNK_TOKENS, "overlap": self.CHUNK_OVERLAP_TOKENS // 2}
         self.FILE_TYPE_CONFIGS = {
-            ".html": {"max_chars": 12000, "overlap": 150},
-            ".css": {"max_chars": 8000, "overlap": 100},
-            ".js": {"max_chars": 10000, "overlap": 150},
-            ".py": {"max_chars": 10000, "overlap": 200},
-            ".txt": {"max_chars": 16000, "overlap": 250},
-            ".md": {"max_chars": 16000, "overlap": 250}
+            ".html": text_config, ".htm": text_config, ".txt": text_config, ".md": text_config,
+            ".css": code_config, ".js": code_config, ".py": code_config
         }
         
         # Extensiones que requieren chunking inteligente
         self.SMART_CHUNK_EXTENSIONS = {".html", ".htm", ".txt", ".md", ".py", ".css", ".js", ".xml"}
         
-        self._connect_weaviate()
-        self._load_metadata()
-
-    def _setup_logging(self):
-        """Configura el sistema de logging con UTF-8"""
-        log_filename = f"vectorization_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-        
-        # Configurar logging con UTF-8
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_filename, encoding='utf-8'),
-                logging.StreamHandler(sys.stdout)
-            ]
-        )
+        # Huella SimHash por chunk (se calcula en los workers de extracción)
+        self.NEAR_DUPLICATE_DETECTION = Config.NEAR_DUPLICATE_ENABLED
         
-        self.logger = logging.getLogger(__name__)
-        self.logger.info(f"?? Iniciando WeaviateManager - Log: {log_filename}")
-
-    def _connect_weaviate(self):
-        """Conecta a Weaviate"""
-        try:
-            if Config.WEAVIATE_HTTP_SECURE:
-                self.weaviate_client = weaviate.connect_to_custom(
-                    http_host=Config.WEAVIATE_HOST,
-                    http_port=Config.WEAVIATE_HTTP_PORT,
-                    http_secure=Config.WEAVIATE_HTTP_SECURE,
-                    grpc_host=Config.WEAVIATE_HOST,
-                    grpc_port=Config.WEAVIATE_GRPC_PORT,
-                    grpc_secure=Config.WEAVIATE_GRPC_SECURE
-                )
-            else:
-                self.weaviate_client = weaviate.connect_to_local(
-                    host=Config.WEAVIATE_HOST,
-                    port=Config.WEAVIATE_HTTP_PORT,
-                    grpc_port=Config.WEAVIATE_GRPC_PORT
-                )
-            
-            if self.weaviate_client.is_ready():
-                self.logger.info(f"? Conectado a Weaviate en {Config.WEAVIATE_HOST}:{Config.WEAVIATE_HTTP_PORT}")
-            else:
-                raise Exception("Weaviate no está listo")
-                
-        except Exception as e:
-            self.logger.error(f"? Error conectando a Weaviate: {e}")
-            raise
-
-    def _load_metadata(self):
-        """Carga metadatos de documentos existentes"""
-        if os.path.exists(self.metadata_file):
-            try:
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Actualizar para compatibilidad con nuevos campos
-                    for path, info in data.items():
-                        if 'chunked' not in info:
-                            info['chunked'] = False
-                        if 'chunks_count' not in info:
-                            info['chunks_count'] = 0
-                    
-                    self.document_registry = {
-                        path: DocumentInfo(**info) for path, info in data.items()
-                    }
-                self.logger.info(f"?? Cargados metadatos de {len(self.document_registry)} documentos")
-            except Exception as e:
-                self.logger.warning(f"?? Error cargando metadatos: {e}")
-                self.document_registry = {}
-        else:
-            self.logger.info("?? No se encontraron metadatos previos, iniciando registro nuevo")
-
-    def _save_metadata(self):
-        """Guarda metadatos de documentos con UTF-8"""
-        try:
-            data = {path: asdict(info) for path, info in self.document_registry.items()}
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            self.logger.info(f"?? Metadatos guardados para {len(self.document_registry)} documentos")
-        except Exception as e:
-            self.logger.error(f"? Error guardando metadatos: {e}")
-
-    def _calculate_file_hash(self, file_path: str) -> str:
-        """Calcula hash MD5 de un archivo"""
-        hash_md5 = hashlib.md5()
-        try:
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
-        except Exception as e:
-            self.logger.warning(f"?? Error calculando hash de {file_path}: {e}")
-            return ""
-
-    def _should_ignore_file(self, file_path: str) -> bool:
-        """Determina si un archivo debe ser ignorado"""
-        file_name = os.path.basename(file_path)
-        file_ext = os.path.splitext(file_path)[1].lower()
+        # Texto plano grande: lectura, chunking, embeddings e inserción por ventanas (memoria acotada)
+        self.STREAM_EXTENSIONS = {".txt", ".css", ".js", ".py"}
+        self.STREAM_MIN_BYTES = Config.STREAM_CHUNKING_MIN_BYTES
+        self.STREAM_READ_CHARS = max(1024, Config.STREAM_READ_CHARS)
         
-        if file_ext in self.ignored_extensions:
-            return True
-        if file_name in self.ignored_files:
-            return True
-        if not file_ext:
-            return True
-            
-        return False
+        for name, value in (settings or {}).items():
+            setattr(self, name, value)
+        
+        self.tokens = TokenCounter(self.TOKENIZER_ENCODING)
+
+    def get_settings(self) -> Dict:
+        """Configuración de chunking para reconstruir el chunker en otro proceso"""
+        return {name: getattr(self, name) for name in self.SETTINGS}
 
     def _extract_text(self, file_path: str) -> Tuple[str, Optional[str]]:
         """Extrae texto de un archivo con manejo UTF-8"""
         try:
             extension = os.path.splitext(file_path)[1].lower()
             
-            if extension in (".html", ".htm", ".css", ".js", ".txt", ".py"):
+            if extension in (".html", ".htm"):
+                sections, error = self._extract_html_sections(file_path)
+                return sections_text(sections), error
+            
+            if extension in (".css", ".js", ".txt", ".py"):
                 with open(file_path, "r", encoding="utf-8", errors='ignore') as file:
-                    content = file.read()
-                    if extension in (".html", ".htm"):
-                        soup = BeautifulSoup(content, "html.parser")
-                        text = soup.get_text()
-                    else:
-                        text = content
-                    return text, None
+                    return file.read(), None
                     
             elif extension == ".xml":
                 with open(file_path, "r", encoding="utf-8", errors='ignore') as file:
@@ -235,112 +270,151 @@ class WeaviateManager:
         except Exception as e:
             return "", f"Error extrayendo texto: {e}"
 
-    def _get_embeddings(self, text: str) -> Optional[List[float]]:
-        """Obtiene embeddings de OpenAI"""
-        if not text or text.strip() == "":
-            return None
-            
+    def _extract_html_sections(self, file_path: str) -> Tuple[List[HtmlSection], Optional[str]]:
+        """Un único parseo lxml del HTML: secciones delimitadas por h1-h6 con su ruta de títulos"""
         try:
-            response = self.openai_client.embeddings.create(
-                model="text-embedding-ada-002",
-                input=text
-            )
-            return response.data[0].embedding
+            with open(file_path, "r", encoding="utf-8", errors='ignore') as file:
+                sections, _ = parse_html_sections(file.read())
+            return sections, None
         except Exception as e:
-            self.logger.error(f"? Error obteniendo embeddings: {e}")
-            return None
+            return [], f"Error extrayendo texto: {e}"
 
     def _get_file_config(self, file_path: str) -> Dict[str, int]:
         """Obtiene configuración específica por tipo de archivo"""
         extension = os.path.splitext(file_path)[1].lower()
         return self.FILE_TYPE_CONFIGS.get(extension, {
-            "max_chars": self.MAX_CHARS,
-            "overlap": self.CHUNK_OVERLAP
+            "max_tokens": self.CHUNK_TOKENS,
+            "overlap": self.CHUNK_OVERLAP_TOKENS
         })
 
     def _validate_chunk_size(self, text: str) -> bool:
-        """Valida que el chunk no exceda límites de tokens"""
-        estimated_tokens = len(text) / 3.5
-        return estimated_tokens <= self.MAX_TOKENS
+        """Valida que el chunk no exceda el límite de tokens del modelo de embeddings"""
+        return self.tokens.count(text) <= self.MAX_TOKENS
 
-    def _create_intelligent_chunks(self, text: str, file_path: str) -> List[str]:
-        """Versión optimizada del chunking inteligente"""
+    def _create_intelligent_chunks(self, text: str, file_path: str,
+                                   sections: Optional[List[HtmlSection]] = None) -> List[Tuple[str, str]]:
+        """Versión optimizada del chunking inteligente; devuelve (chunk, sección) por chunk"""
         config = self._get_file_config(file_path)
-        max_chars = config["max_chars"]
+        max_tokens = config["max_tokens"]
         overlap = config["overlap"]
         
-        if len(text) <= max_chars:
-            return [text]
+        if self.tokens.count(text) <= max_tokens:
+            return [(text, sections[0].title if sections else "")]
         
         extension = os.path.splitext(file_path)[1].lower()
         
         # Estrategia de chunking por tipo de archivo
-        if extension in (".html", ".htm"):
-            chunks = self._chunk_html_optimized(text, max_chars, overlap)
+        if sections:
+            chunks = self._chunk_html_sections(sections, max_tokens, overlap)
         elif extension in (".js", ".py", ".css"):
-            chunks = self._chunk_code_optimized(text, max_chars, overlap)
-        elif extension in (".txt", ".md"):
-            chunks = self._chunk_text_optimized(text, max_chars, overlap)
+            chunks = [(chunk, "") for chunk in self._chunk_code_optimized(text, max_tokens, overlap)]
+        elif extension in (".txt", ".md", ".html", ".htm"):
+            chunks = [(chunk, "") for chunk in self._chunk_text_optimized(text, max_tokens, overlap)]
         else:
-            chunks = self._chunk_generic_optimized(text, max_chars, overlap)
+            chunks = [(chunk, "") for chunk in self._chunk_generic_optimized(text, max_tokens, overlap)]
         
-        # Validar y limpiar chunks
-        validated_chunks = []
-        for chunk in chunks:
+        validated_chunks = list(self._iter_validated_chunks(chunks, max_tokens))
+        self.logger.info(f"?? {os.path.basename(file_path)}: {len(validated_chunks)} chunks optimizados")
+        return validated_chunks
+
+    def _iter_validated_chunks(self, chunks: Iterable[Tuple[str, str]], max_tokens: int) -> Iterator[Tuple[str, str]]:
+        """Validar y limpiar chunks (chunk, sección)"""
+        for chunk, section in chunks:
             # Remover chunks muy pequeños
             if len(chunk.strip()) < 100:
                 continue
             
-            # Asegurar que no exceden límites
-            if len(chunk) > max_chars * 1.2:  # 20% de tolerancia
-                sub_chunks = self._force_split_chunk(chunk, max_chars)
-                validated_chunks.extend(sub_chunks)
+            # Asegurar que no exceden límites (los separadores y el overlap suman algunos tokens)
+            if self.tokens.count(chunk) > max_tokens * 1.2:  # 20% de tolerancia
+                yield from ((sub_chunk, section) for sub_chunk in self._force_split_chunk(chunk, max_tokens))
             else:
-                validated_chunks.append(chunk)
+                yield chunk, section
+
+    def _should_stream(self, doc_info: DocumentInfo) -> bool:
+        """Archivos de texto plano grandes: se leen y dividen por bloques en lugar de cargarlos enteros"""
+        extension = os.path.splitext(doc_info.file_path)[1].lower()
+        return extension in self.STREAM_EXTENSIONS and doc_info.file_size >= self.STREAM_MIN_BYTES
+
+    def _iter_text_units(self, doc_info: DocumentInfo, separator: str) -> Iterator[str]:
+        """
+        Párrafos (o líneas) del archivo leídos por bloques de STREAM_READ_CHARS caracteres.
+        Un tramo sin separador más largo que dos bloques se corta en un espacio para acotar la memoria.
+        """
+        limit = self.STREAM_READ_CHARS * 2
+        buffer = ""
+        doc_info.content_length = 0
+        with open(doc_info.file_path, "r", encoding="utf-8", errors='ignore') as file:
+            for block in iter(lambda: file.read(self.STREAM_READ_CHARS), ""):
+                doc_info.content_length += len(block)
+                parts = (buffer + block).split(separator)
+                buffer = parts.pop()
+                yield from parts
+                while len(buffer) > limit:
+                    cut = buffer.rfind(" ", 0, limit)
+                    cut = cut if cut > 0 else limit
+                    yield buffer[:cut]
+                    buffer = buffer[cut:]
+        yield buffer
+
+    def _iter_document_records(self, doc_info: DocumentInfo) -> Iterator[ChunkRecord]:
+        """
+        Versión por streaming de _prepare_document para archivos de texto plano: los chunks se
+        producen a medida que se lee el archivo (misma división y overlap que en memoria).
+        La cantidad total de chunks no se conoce hasta el final, así que el nombre lleva solo el número.
+        """
+        config = self._get_file_config(doc_info.file_path)
+        max_tokens, overlap = config["max_tokens"], config["overlap"]
+        extension = os.path.splitext(doc_info.file_path)[1].lower()
         
-        self.logger.info(f"?? {os.path.basename(file_path)}: {len(validated_chunks)} chunks optimizados")
-        return validated_chunks
+        if extension in (".js", ".py", ".css"):
+            chunks = self._iter_overlap(self._iter_code_chunks(self._iter_text_units(doc_info, '\n'), max_tokens),
+                                        overlap, separator='\n')
+        else:
+            chunks = self._iter_overlap(self._iter_text_chunks(self._iter_text_units(doc_info, '\n\n'),
+                                                               max(1, max_tokens - overlap)), overlap)
+        
+        for number, (chunk, _) in enumerate(self._iter_validated_chunks(((c, "") for c in chunks), max_tokens), 1):
+            yield self._make_record(doc_info, chunk, chunk_number=number, chunks_total=0)
 
-    def _chunk_html_optimized(self, text: str, max_chars: int, overlap: int) -> List[str]:
-        """Chunking optimizado para HTML"""
-        try:
-            soup = BeautifulSoup(text, 'html.parser')
-            
-            # Estrategia 1: Por secciones semánticas
-            sections = soup.find_all(['section', 'article', 'div'], class_=True)
-            if not sections:
-                sections = soup.find_all(['h1', 'h2', 'h3', 'h4'])
-            
-            if sections:
-                chunks = []
-                current_chunk = ""
-                
-                for section in sections:
-                    section_text = section.get_text(strip=True)
-                    
-                    if len(current_chunk) + len(section_text) > max_chars:
-                        if current_chunk:
-                            chunks.append(current_chunk)
-                        current_chunk = section_text
-                    else:
-                        current_chunk += "\n\n" + section_text
-                
-                if current_chunk:
-                    chunks.append(current_chunk)
-                
-                return self._add_overlap(chunks, overlap)
+    def _chunk_html_sections(self, sections: List[HtmlSection], max_tokens: int, overlap: int) -> List[Tuple[str, str]]:
+        """
+        Agrupa secciones completas hasta max_tokens, cortando siempre en un título.
+        Una sección más larga que max_tokens se divide por párrafos (con overlap) y
+        todas sus partes conservan la ruta de títulos.
+        """
+        chunks = []
+        current, current_section, current_tokens = "", "", 0
+        
+        for section in sections:
+            section_tokens = self.tokens.count(section.text)
+            if section_tokens > max_tokens:
+                if current:
+                    chunks.append((current, current_section))
+                    current, current_section, current_tokens = "", "", 0
+                chunks.extend((part, section.title) for part in self._chunk_text_optimized(section.text, max_tokens, overlap))
+                continue
             
-            # Fallback: chunking por párrafos
-            return self._chunk_text_optimized(soup.get_text(), max_chars, overlap)
+            if current and current_tokens + section_tokens + 1 > max_tokens:
+                chunks.append((current, current_section))
+                current, current_section, current_tokens = "", "", 0
             
-        except Exception as e:
-            self.logger.warning(f"?? Error en chunking HTML: {e}")
-            return self._chunk_text_optimized(text, max_chars, overlap)
+            if current:
+                current += "\n\n" + section.text
+                current_tokens += section_tokens + 1
+            else:
+                current, current_section, current_tokens = section.text, section.title, section_tokens
+        
+        if current:
+            chunks.append((current, current_section))
+        
+        return chunks
 
-    def _chunk_code_optimized(self, text: str, max_chars: int, overlap: int) -> List[str]:
+    def _chunk_code_optimized(self, text: str, max_tokens: int, overlap: int) -> List[str]:
         """Chunking optimizado para código"""
-        lines = text.split('\n')
-        chunks = []
+        return list(self._iter_overlap(self._iter_code_chunks(text.split('\n'), max_tokens), overlap, separator='\n'))
+
+    def _iter_code_chunks(self, lines: Iterable[str], max_tokens: int) -> Iterator[str]:
+        """Agrupa líneas de código hasta max_tokens, cortando preferentemente al inicio de funciones (sin overlap)"""
         current_chunk = []
         current_size = 0
         
@@ -351,68 +425,72 @@ class WeaviateManager:
         ]
         
         for line in lines:
-            line_size = len(line) + 1
+            line_size = self.tokens.count(line) + 1
             
             # Si es inicio de función y el chunk actual es grande, cortarlo
             is_function_start = any(line.strip().startswith(pattern) for pattern in function_patterns)
             
-            if is_function_start and current_size > max_chars * 0.7:
+            if is_function_start and current_size > max_tokens * 0.7:
                 if current_chunk:
-                    chunks.append('\n'.join(current_chunk))
+                    yield '\n'.join(current_chunk)
                     current_chunk = [line]
                     current_size = line_size
                 else:
                     current_chunk.append(line)
                     current_size += line_size
-            elif current_size + line_size > max_chars:
+            elif current_size + line_size > max_tokens:
                 if current_chunk:
-                    chunks.append('\n'.join(current_chunk))
+                    yield '\n'.join(current_chunk)
                     current_chunk = [line]
                     current_size = line_size
                 else:
                     # Línea muy larga, dividir
-                    chunks.extend(self._split_long_line(line, max_chars))
+                    yield from self._split_long_line(line, max_tokens)
             else:
                 current_chunk.append(line)
                 current_size += line_size
         
         if current_chunk:
-            chunks.append('\n'.join(current_chunk))
-        
-        return self._add_overlap(chunks, overlap, separator='\n')
+            yield '\n'.join(current_chunk)
 
-    def _chunk_text_optimized(self, text: str, max_chars: int, overlap: int) -> List[str]:
+    def _chunk_text_optimized(self, text: str, max_tokens: int, overlap: int) -> List[str]:
         """Chunking optimizado para texto"""
-        # Estrategia 1: Por párrafos dobles
-        paragraphs = text.split('\n\n')
-        chunks = []
+        # El overlap se antepone después: se reserva su espacio para no pasar de max_tokens
+        chunks = self._iter_text_chunks(text.split('\n\n'), max(1, max_tokens - overlap))
+        return list(self._iter_overlap(chunks, overlap))
+
+    def _iter_text_chunks(self, paragraphs: Iterable[str], max_tokens: int) -> Iterator[str]:
+        """Agrupa párrafos hasta max_tokens (por oraciones si un párrafo no entra), sin overlap"""
         current_chunk = ""
+        current_tokens = 0
         
         for para in paragraphs:
-            if len(current_chunk) + len(para) > max_chars:
+            para_tokens = self.tokens.count(para)
+            if current_tokens + para_tokens > max_tokens:
                 if current_chunk:
-                    chunks.append(current_chunk.strip())
-                    current_chunk = para
+                    yield current_chunk.strip()
+                    current_chunk, current_tokens = para, para_tokens
                 else:
                     # Párrafo muy largo, dividir por oraciones
                     sentences = self._split_into_sentences(para)
                     for sentence in sentences:
-                        if len(current_chunk) + len(sentence) > max_chars:
+                        sentence_tokens = self.tokens.count(sentence)
+                        if current_tokens + sentence_tokens > max_tokens:
                             if current_chunk:
-                                chunks.append(current_chunk.strip())
-                                current_chunk = sentence
+                                yield current_chunk.strip()
+                                current_chunk, current_tokens = sentence, sentence_tokens
                             else:
                                 # Oración muy larga, división forzada
-                                chunks.extend(self._force_split_chunk(sentence, max_chars))
+                                yield from self._force_split_chunk(sentence, max_tokens)
                         else:
                             current_chunk += " " + sentence
+                            current_tokens += sentence_tokens + 1
             else:
                 current_chunk += "\n\n" + para
+                current_tokens += para_tokens + 1
         
         if current_chunk.strip():
-            chunks.append(current_chunk.strip())
-        
-        return self._add_overlap(chunks, overlap)
+            yield current_chunk.strip()
 
     def _split_into_sentences(self, text: str) -> List[str]:
         """Divide texto en oraciones"""
@@ -421,210 +499,716 @@ class WeaviateManager:
         sentences = re.split(pattern, text)
         return [s.strip() for s in sentences if s.strip()]
 
-    def _split_long_line(self, line: str, max_chars: int) -> List[str]:
+    def _split_long_line(self, line: str, max_tokens: int) -> List[str]:
         """Divide una línea muy larga"""
-        chunks = []
-        for i in range(0, len(line), max_chars):
-            chunks.append(line[i:i + max_chars])
-        return chunks
+        return self.tokens.split(line, max_tokens)
 
     def _add_overlap(self, chunks: List[str], overlap: int, separator: str = ' ') -> List[str]:
-        """Añade overlap entre chunks consecutivos"""
-        if len(chunks) <= 1:
-            return chunks
-        
-        overlapped_chunks = [chunks[0]]
-        
-        for i in range(1, len(chunks)):
-            prev_chunk = chunks[i-1]
-            current_chunk = chunks[i]
-            
+        """Añade overlap (en tokens) entre chunks consecutivos"""
+        return list(self._iter_overlap(chunks, overlap, separator))
+
+    def _iter_overlap(self, chunks: Iterable[str], overlap: int, separator: str = ' ') -> Iterator[str]:
+        """Antepone a cada chunk el final del anterior; solo retiene el chunk previo"""
+        previous = None
+        for current_chunk in chunks:
             # Extraer overlap del chunk anterior
-            if len(prev_chunk) > overlap:
-                overlap_text = prev_chunk[-overlap:]
+            if previous is not None and overlap > 0 and self.tokens.count(previous) > overlap:
+                overlap_text = self.tokens.tail(previous, overlap)
                 # Buscar punto de corte natural (espacio, salto de línea)
                 for char in ['\n', '. ', ' ']:
                     pos = overlap_text.find(char)
-                    if pos > overlap // 2:  # Al menos la mitad del overlap
+                    if 0 <= pos < len(overlap_text) // 2:  # Conservar al menos la mitad del overlap
                         overlap_text = overlap_text[pos+len(char):]
                         break
-                
-                combined_chunk = overlap_text + separator + current_chunk
-                overlapped_chunks.append(combined_chunk)
+                yield overlap_text + separator + current_chunk
             else:
-                overlapped_chunks.append(current_chunk)
-        
-        return overlapped_chunks
+                yield current_chunk
+            previous = current_chunk
 
-    def _chunk_generic_optimized(self, text: str, max_chars: int, overlap: int) -> List[str]:
-        """Chunking genérico optimizado"""
-        chunks = []
-        for i in range(0, len(text), max_chars - overlap):
-            chunk = text[i:i + max_chars]
-            
-            # Buscar punto de corte natural cerca del final
-            if i + max_chars < len(text):  # No es el último chunk
-                cutoff_search = chunk[-200:]  # Buscar en los últimos 200 chars
-                
-                for delimiter in ['\n\n', '\n', '. ', ', ', ' ']:
-                    pos = cutoff_search.rfind(delimiter)
-                    if pos > 100:  # Encontrar corte natural
-                        chunk = chunk[:len(chunk) - len(cutoff_search) + pos + len(delimiter)]
-                        break
-            
-            if chunk.strip():
-                chunks.append(chunk.strip())
-        
-        return chunks
+    def _chunk_generic_optimized(self, text: str, max_tokens: int, overlap: int) -> List[str]:
+        """Chunking genérico optimizado: ventanas de tokens con overlap"""
+        return [chunk.strip() for chunk in self.tokens.split(text, max_tokens, overlap) if chunk.strip()]
 
-    def _force_split_chunk(self, text: str, max_size: int) -> List[str]:
+    def _force_split_chunk(self, text: str, max_tokens: int) -> List[str]:
         """Fuerza división de chunk muy grande en pedazos más pequeños"""
-        chunks = []
-        for i in range(0, len(text), max_size):
-            chunks.append(text[i:i+max_size])
-        return chunks
+        return self.tokens.split(text, max_tokens)
 
-    def _process_large_document(self, doc_info: DocumentInfo, text: str) -> bool:
-        """Procesa documentos usando chunking inteligente"""
-        if len(text) <= self.MAX_CHARS:
+    def _build_chunk_records(self, doc_info: DocumentInfo, text: str,
+                             sections: Optional[List[HtmlSection]] = None) -> List[ChunkRecord]:
+        """Divide el documento (si hace falta) y arma los registros a vectorizar"""
+        if self.tokens.count(text) <= self._get_file_config(doc_info.file_path)["max_tokens"]:
             # Archivo normal
-            return self._add_single_document(doc_info, text, is_chunk=False)
+            doc_info.chunked = False
+            doc_info.chunks_count = 0
+            return [self._make_record(doc_info, text, section=sections[0].title if sections else "")]
         
         extension = os.path.splitext(doc_info.file_path)[1].lower()
         
         # Usar chunking inteligente para archivos importantes
         if extension in self.SMART_CHUNK_EXTENSIONS:
-            chunks = self._create_intelligent_chunks(text, doc_info.file_path)
+            chunks = self._create_intelligent_chunks(text, doc_info.file_path, sections)
             self.logger.info(f"?? {doc_info.file_name}: dividido en {len(chunks)} chunks inteligentes")
         else:
             # Solo truncar para archivos menos importantes
-            self.logger.info(f"?? {doc_info.file_name}: archivo largo ({len(text)} chars), truncando...")
-            chunks = [text[:self.MAX_CHARS]]
-        
-        success_count = 0
-        
-        # Procesar cada chunk
-        for idx, chunk in enumerate(chunks, 1):
-            chunk_doc_info = DocumentInfo(
-                file_path=f"{doc_info.file_path}_chunk_{idx}",
-                file_name=f"{doc_info.file_name} (parte {idx}/{len(chunks)})",
-                file_hash=f"{doc_info.file_hash}_chunk_{idx}",
-                last_modified=doc_info.last_modified,
-                file_size=len(chunk),
-                content_length=len(chunk),
-                chunked=True,
-                chunks_count=len(chunks)
-            )
-            
-            if self._add_single_document(chunk_doc_info, chunk, is_chunk=True):
-                success_count += 1
+            self.logger.info(f"?? {doc_info.file_name}: archivo largo ({self.tokens.count(text)} tokens), truncando...")
+            chunks = [(self.tokens.truncate(text, self.CHUNK_TOKENS), "")]
+        
+        records = [
+            self._make_record(doc_info, chunk, chunk_number=idx, chunks_total=len(chunks), section=section)
+            for idx, (chunk, section) in enumerate(chunks, 1)
+        ]
         
-        # Actualizar info del documento original
-        doc_info.vectorized = success_count > 0
         doc_info.chunked = len(chunks) > 1
         doc_info.chunks_count = len(chunks)
-        doc_info.error = None if success_count == len(chunks) else f"Solo {success_count}/{len(chunks)} chunks procesados"
+        return records
+
+    def _chunk_uuid(self, original_path: str, chunk_number: int) -> str:
+        """UUID determinístico por (archivo, número de chunk): reinsertar sobreescribe sin borrar antes"""
+        return generate_uuid5(f"{original_path}_chunk_{chunk_number}")
+
+    def _make_record(self, doc_info: DocumentInfo, text: str, chunk_number: int = 0, chunks_total: int = 1,
+                     section: str = "") -> ChunkRecord:
+        """Prepara propiedades y UUID de un documento completo (chunk 0) o de uno de sus chunks"""
+        is_chunk = chunk_number > 0
+        file_name = doc_info.file_name
+        if is_chunk:
+            file_name += f" (parte {chunk_number}/{chunks_total})" if chunks_total else f" (parte {chunk_number})"
         
-        # Log detallado
-        self.logger.info(f"? {doc_info.file_name}: {success_count}/{len(chunks)} chunks vectorizados")
+        # Validación previa de tamaño contra el límite del modelo (no debería ocurrir tras el chunking)
+        token_count = self.tokens.count(text)
+        truncated = token_count > self.MAX_TOKENS
+        if truncated:
+            self.logger.warning(f"?? Chunk de {token_count} tokens para {file_name}, truncando a {self.MAX_TOKENS}...")
+            text = self.tokens.truncate(text, self.MAX_TOKENS)
+            token_count = self.tokens.count(text)
         
-        return success_count > 0
+        properties = {
+            "contenido": text,
+            "nombre_archivo": file_name,
+            "seccion": section,
+            "ruta_archivo": f"{doc_info.file_path}_chunk_{chunk_number}" if is_chunk else doc_info.file_path,
+            "archivo_original": doc_info.file_path,
+            "es_chunk": is_chunk,
+            "numero_chunk": chunk_number,
+            "tipo_archivo": mimetypes.guess_type(doc_info.file_path)[0] or "desconocido",
+            "hash_archivo": doc_info.file_hash,
+            "fecha_modificacion": datetime.fromtimestamp(doc_info.last_modified).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            "tamano_archivo": len(text) if is_chunk else doc_info.file_size
+        }
+        
+        return ChunkRecord(
+            doc_path=doc_info.file_path,
+            uuid=self._chunk_uuid(doc_info.file_path, chunk_number),
+            text=text,
+            properties=properties,
+            token_count=token_count,
+            truncated=truncated,
+            simhash=simhash(text) if self.NEAR_DUPLICATE_DETECTION else 0
+        )
 
-    def _add_single_document(self, doc_info: DocumentInfo, text: str, is_chunk: bool = False) -> bool:
-        """Agrega un documento individual (chunk o completo)"""
+    def _prepare_document(self, doc_info: DocumentInfo, timings: Optional[Dict] = None) -> Optional[List[ChunkRecord]]:
+        """
+        Extrae el texto y arma los registros; None si el documento no se puede procesar.
+        Si se pasa 'timings' se completa con la duración de parseo y chunking, bytes y tokens.
+        """
+        timings = timings if timings is not None else {}
         try:
-            # Validación previa de tamaño
-            if not self._validate_chunk_size(text):
-                self.logger.warning(f"?? Chunk muy grande para {doc_info.file_name}, truncando...")
-                text = text[:self.MAX_CHARS]
-            
-            # Obtener embeddings
-            vector = self._get_embeddings(text)
-            if vector is None and text.strip():
-                self.logger.warning(f"?? No se pudieron obtener embeddings para {doc_info.file_name}")
-                return False
-            
-            # Preparar propiedades
-            original_path = doc_info.file_path.split('_chunk_')[0] if is_chunk else doc_info.file_path
-            properties = {
-                "contenido": text,
-                "nombre_archivo": doc_info.file_name,
-                "ruta_archivo": doc_info.file_path,
-                "archivo_original": original_path,
-                "es_chunk": is_chunk,
-                "numero_chunk": int(doc_info.file_path.split('_chunk_')[-1]) if is_chunk else 0,
-                "tipo_archivo": mimetypes.guess_type(original_path)[0] or "desconocido",
-                "hash_archivo": doc_info.file_hash,
-                "fecha_modificacion": datetime.fromtimestamp(doc_info.last_modified).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
-                "tamano_archivo": doc_info.file_size
-            }
-            
-            # Generar UUID único
-            unique_id = generate_uuid5(f"{doc_info.file_path}_{doc_info.file_hash}")
-            
-            # Insertar en Weaviate
-            collection = self.weaviate_client.collections.get("Documento")
-            
-            # Eliminar si existe (para evitar duplicados)
+            # Única extracción del documento: el escaneo ya no parsea los archivos
+            started = time.perf_counter()
+            sections = None
+            if os.path.splitext(doc_info.file_path)[1].lower() in (".html", ".htm"):
+                sections, error = self._extract_html_sections(doc_info.file_path)
+                text = sections_text(sections)
+            else:
+                text, error = self._extract_text(doc_info.file_path)
+            timings["parse"] = time.perf_counter() - started
+            timings["bytes"] = doc_info.file_size
+            if error:
+                doc_info.error = error
+                self.logger.warning(f"?? Error en {doc_info.file_name}: {error}")
+                return None
+            doc_info.content_length = len(text)
+            started = time.perf_counter()
+            records = self._build_chunk_records(doc_info, text, sections)
+            timings["chunk"] = time.perf_counter() - started
+            timings["tokens"] = sum(r.token_count for r in records)
+            return records
+        except Exception as e:
+            doc_info.error = str(e)
+            self.logger.error(f"? Error procesando {doc_info.file_name}: {e}")
+            return None
+
+_worker_chunker = None
+
+def _prepare_in_worker(settings: Dict, doc_info: DocumentInfo) -> Tuple[DocumentInfo, Optional[List[ChunkRecord]], Dict]:
+    """Extracción + chunking en un proceso del pool; devuelve el DocumentInfo actualizado y los tiempos"""
+    global _worker_chunker
+    if _worker_chunker is None or _worker_chunker.get_settings() != settings:
+        _worker_chunker = DocumentChunker(settings)
+    timings = {}
+    records = _worker_chunker._prepare_document(doc_info, timings)
+    return doc_info, records, timings
+
+_log_filename = None   # Archivo de log del proceso (se crea una sola vez)
+
+class WeaviateManager(DocumentChunker):
+    """Gestor completo de documentos en Weaviate con chunking inteligente optimizado"""
+    
+    def __init__(self, openai_api_key: str = None, offline: bool = False):
+        super().__init__()
+        # offline: sin clientes de OpenAI ni Weaviate (estimate solo usa archivos y bases locales)
+        self.openai_client = None if offline else OpenAI(api_key=openai_api_key or Config.OPENAI_API_KEY)
+        self.weaviate_client = None
+        self.metadata_file = "document_metadata.json"   # Formato anterior, solo para migrar
+        self.registry_file = Config.DOCUMENT_REGISTRY_PATH
+        self.document_registry = {}
+        self._live_registry = None   # Registro publicado mientras un rebuild escribe en staging
+        
+        # Configurar logging
+        self._setup_logging()
+        
+        # Configuración de archivos
+        self.ignored_extensions = {".gz", ".skn", ".ppf", ".ejs", ".docx", ".pyc", "__pycache__"}
+        self.ignored_files = {
+            "preguntas_no_respondidas.txt",
+            "vectorizatodos.py", "weaviate_manager.py", "app.py", 
+            "config.py", "document_metadata.json", ".env", "update_documents.py",
+            os.path.basename(Config.DOCUMENT_REGISTRY_PATH), os.path.basename(Config.EMBEDDING_CACHE_PATH)
+        }
+        
+        # Embeddings por lotes: límite de items y de tokens estimados por request
+        self.EMBEDDING_BATCH_SIZE = Config.EMBEDDING_BATCH_SIZE
+        self.EMBEDDING_BATCH_MAX_TOKENS = Config.EMBEDDING_BATCH_MAX_TOKENS
+        self.EMBEDDING_BATCH_RETRIES = Config.EMBEDDING_BATCH_RETRIES
+        self.INSERT_BATCH_SIZE = max(1, Config.WEAVIATE_INSERT_BATCH_SIZE)
+        self.EMBEDDING_MODEL = "text-embedding-ada-002"
+        self.run_stats = ProcessingStats()
+        self.scan_seconds = 0.0
+        self.scan_hashed_bytes = 0
+        self.last_run: Optional[Dict] = None   # Resultado de la última actualización (para el reporte)
+        
+        # Detección de cambios
+        self.HASH_ALGO = "blake2b"
+        self.HASH_READ_SIZE = 1024 * 1024
+        self.HASH_WORKERS = max(1, Config.SCAN_HASH_WORKERS)
+        self._stats_lock = threading.Lock()
+        
+        # Pipeline de ingesta (0 workers = etapa ejecutada sin pool)
+        self.EXTRACT_WORKERS = max(0, Config.INGEST_EXTRACT_WORKERS)
+        self.EMBED_WORKERS = max(0, Config.INGEST_EMBED_WORKERS)
+        self.PIPELINE_QUEUE_SIZE = max(1, Config.INGEST_QUEUE_SIZE)
+        self._exact_path_filter = None
+        
+        # Modo watch: archivos por tanda incremental
+        self.WATCH_BATCH_SIZE = max(1, Config.WATCH_BATCH_SIZE)
+        
+        # Chunks casi duplicados: se guarda un canónico y las rutas alternativas en el registro
+        self.NEAR_DUPLICATE_MAX_DISTANCE = Config.NEAR_DUPLICATE_MAX_DISTANCE
+        self.near_duplicates = None
+        
+        self.embedding_cache = None
+        if Config.EMBEDDING_CACHE_ENABLED:
             try:
-                collection.data.delete_by_id(unique_id)
-            except:
-                pass
-            
-            collection.data.insert(
-                properties=properties,
-                vector=vector,
-                uuid=unique_id
+                self.embedding_cache = EmbeddingCache(Config.EMBEDDING_CACHE_PATH)
+            except Exception as e:
+                self.logger.warning(f"?? Cache de embeddings deshabilitado: {e}")
+        
+        # Journal de trabajos (checkpoints por archivo) en la misma base que el registro
+        self.journal = IngestJournal(self.registry_file)
+        self.current_job_id = None
+        self.last_job_id = None   # Último trabajo del journal (para consultar su avance al terminar)
+        
+        # Cancelación cooperativa (trabajos en segundo plano del panel de administración)
+        self.cancel_event = threading.Event()
+        
+        if offline:
+            self.collection_name = DEFAULT_ALIAS
+        else:
+            self._connect_weaviate()
+            self.collection_name = self._resolve_live_collection()
+        self._load_metadata()
+        if not offline:
+            self._reconcile_registry()
+
+    def _setup_logging(self):
+        """
+        Configura el sistema de logging con UTF-8 una sola vez por proceso. Si la aplicación
+        ya configuró el logging (p. ej. app.py) se usa el suyo y no se crea archivo propio.
+        """
+        global _log_filename
+        self.logger = logging.getLogger(__name__)
+        
+        if _log_filename is None and not logging.getLogger().handlers:
+            _log_filename = f"vectorization_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+            logging.basicConfig(
+                level=logging.INFO,
+                format='%(asctime)s - %(levelname)s - %(message)s',
+                handlers=[
+                    logging.FileHandler(_log_filename, encoding='utf-8'),
+                    logging.StreamHandler(sys.stdout)
+                ]
             )
+        
+        self.logger.info(f"?? Iniciando WeaviateManager - Log: {_log_filename or 'logging de la aplicación'}")
+
+    def _connect_weaviate(self):
+        """Conecta a Weaviate"""
+        try:
+            if Config.WEAVIATE_HTTP_SECURE:
+                self.weaviate_client = weaviate.connect_to_custom(
+                    http_host=Config.WEAVIATE_HOST,
+                    http_port=Config.WEAVIATE_HTTP_PORT,
+                    http_secure=Config.WEAVIATE_HTTP_SECURE,
+                    grpc_host=Config.WEAVIATE_HOST,
+                    grpc_port=Config.WEAVIATE_GRPC_PORT,
+                    grpc_secure=Config.WEAVIATE_GRPC_SECURE
+                )
+            else:
+                self.weaviate_client = weaviate.connect_to_local(
+                    host=Config.WEAVIATE_HOST,
+                    port=Config.WEAVIATE_HTTP_PORT,
+                    grpc_port=Config.WEAVIATE_GRPC_PORT
+                )
             
-            # Marcar como vectorizado
-            if not is_chunk:
-                doc_info.vectorized = True
-            
-            # Log específico
-            chunk_info = f" (chunk)" if is_chunk else ""
-            self.logger.info(f"? VECTORIZADO: {doc_info.file_name}{chunk_info} - {len(text)} chars")
-            
+            if self.weaviate_client.is_ready():
+                self.logger.info(f"? Conectado a Weaviate en {Config.WEAVIATE_HOST}:{Config.WEAVIATE_HTTP_PORT}")
+            else:
+                raise Exception("Weaviate no está listo")
+                
+        except Exception as e:
+            self.logger.error(f"? Error conectando a Weaviate: {e}")
+            raise
+
+    def _resolve_live_collection(self) -> str:
+        """Colección publicada (a la que apunta el alias 'Documento')"""
+        try:
+            return resolve_collection(self.weaviate_client, DEFAULT_ALIAS)
+        except Exception as e:
+            self.logger.warning(f"?? No se pudo leer el alias de colección, usando '{DEFAULT_ALIAS}': {e}")
+            return DEFAULT_ALIAS
+
+    def _use_collection(self, name: str):
+        """Cambia la colección sobre la que escribe el manager"""
+        self.collection_name = name
+        self._exact_path_filter = None
+
+    def _load_metadata(self):
+        """Abre el registro de documentos (migra document_metadata.json la primera vez)"""
+        self.document_registry = DocumentRegistry(
+            self.registry_file,
+            DocumentInfo,
+            legacy_json_path=self.metadata_file,
+            logger=self.logger
+        )
+        self.logger.info(f"?? Cargados metadatos de {len(self.document_registry)} documentos")
+
+    def _staging_registry(self) -> DocumentRegistry:
+        return DocumentRegistry(self.registry_file, DocumentInfo, logger=self.logger, staging=True)
+
+    def _staged_collection(self) -> Optional[str]:
+        """Colección para la que hay un registro de rebuild en staging"""
+        staging = self._staging_registry()
+        try:
+            return staging.collection
+        finally:
+            staging.close()
+
+    def _reconcile_registry(self):
+        """
+        Asocia el registro a la colección publicada. Si un rebuild alcanzó a mover el alias pero
+        no a promover su registro (proceso cortado entre ambos pasos), se promueve ahora.
+        """
+        registry = self.document_registry
+        if registry.collection == self.collection_name:
+            return
+        if self._staged_collection() == self.collection_name:
+            staging = self._staging_registry()
+            try:
+                staging.promote()
+            finally:
+                staging.close()
+            self.logger.info(f"?? Registro del rebuild de '{self.collection_name}' promovido")
+        elif registry.collection is None:
+            registry.collection = self.collection_name   # Base anterior a registry_meta
+        else:
+            self.logger.warning(f"?? El registro corresponde a '{registry.collection}' y la colección publicada "
+                                f"es '{self.collection_name}'; verify --fix no se ejecutará hasta reconciliarlos")
+
+    def _stage_registry(self, target: str):
+        """
+        El rebuild escribe su registro en las tablas de staging; el publicado sigue describiendo
+        la colección viva (update, watch y el panel lo siguen usando sin cambios).
+        """
+        staging = self._staging_registry()
+        if staging.collection != target:
+            staging.clear()
+            staging.collection = target
+        self._live_registry, self.document_registry = self.document_registry, staging
+
+    def _unstage_registry(self, promote: bool = False):
+        """Vuelve al registro publicado; con promote, el de staging lo reemplaza (tras mover el alias)"""
+        if self._live_registry is None:
+            return
+        staging = self.document_registry
+        if promote:
+            staging.promote()
+        staging.close()
+        self.document_registry, self._live_registry = self._live_registry, None
+
+    def _new_hasher(self, algo: str):
+        """Crea el objeto hash para el algoritmo registrado"""
+        if algo == "blake2b":
+            return hashlib.blake2b(digest_size=16)
+        return hashlib.new(algo)
+
+    def _calculate_file_hash(self, file_path: str, algos: Tuple[str, ...] = None) -> Dict[str, str]:
+        """
+        Calcula el hash de un archivo con lecturas de 1 MiB (BLAKE2b por defecto).
+        Puede calcular varios algoritmos en una sola pasada (migración desde MD5).
+        """
+        hashers = {algo: self._new_hasher(algo) for algo in (algos or (self.HASH_ALGO,))}
+        try:
+            with open(file_path, "rb") as f:
+                for chunk in iter(lambda: f.read(self.HASH_READ_SIZE), b""):
+                    for hasher in hashers.values():
+                        hasher.update(chunk)
+            return {algo: hasher.hexdigest() for algo, hasher in hashers.items()}
+        except Exception as e:
+            self.logger.warning(f"?? Error calculando hash de {file_path}: {e}")
+            return {algo: "" for algo in hashers}
+
+    def _stat_matches(self, registered: DocumentInfo, stat: os.stat_result) -> bool:
+        """Pre-chequeo barato: mismo tamaño y misma fecha de modificación que el registro"""
+        if registered.file_size != stat.st_size:
+            return False
+        if registered.mtime_ns:
+            return registered.mtime_ns == stat.st_mtime_ns
+        return registered.last_modified == stat.st_mtime   # Registros sin mtime_ns
+
+    def _should_ignore_file(self, file_path: str) -> bool:
+        """Determina si un archivo debe ser ignorado"""
+        file_name = os.path.basename(file_path)
+        file_ext = os.path.splitext(file_path)[1].lower()
+        
+        if file_ext in self.ignored_extensions:
+            return True
+        if file_name in self.ignored_files:
+            return True
+        if not file_ext:
             return True
             
+        return False
+
+    def _get_embeddings(self, text: str) -> Optional[List[float]]:
+        """Obtiene embeddings de OpenAI para un único texto"""
+        if not text or text.strip() == "":
+            return None
+
+        vectors = self._get_embeddings_batch([text])
+        return vectors[0]
+
+    def _estimate_tokens(self, text: str) -> int:
+        """Tokens del texto usados para dimensionar lotes"""
+        return self.tokens.count(text)
+
+    @staticmethod
+    def _retry_delay(attempt: int, error: Exception) -> float:
+        """Espera antes de reintentar: Retry-After si la API lo indica, si no backoff exponencial"""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), EMBEDDING_MAX_RETRY_AFTER)
+            except ValueError:
+                pass
+        return min(2 ** attempt, 10)
+
+    def _get_embeddings_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Obtiene embeddings de varios textos en un solo request, con reintentos.
+        Un lote rechazado por su contenido se divide en mitades para aislar el texto problemático.
+        Si el servicio no responde (red, 429, 5xx) tras los reintentos, o rechaza la credencial,
+        se lanza EmbeddingServiceError: dividir no ayuda y cada sublote volvería a esperar.
+        """
+        for attempt in range(1, self.EMBEDDING_BATCH_RETRIES + 1):
+            begin = time.monotonic()
+            try:
+                with self._stats_lock:
+                    self.run_stats.embedding_requests += 1
+                try:
+                    response = self.openai_client.embeddings.create(
+                        model=self.EMBEDDING_MODEL,
+                        input=texts
+                    )
+                finally:
+                    self.run_stats.stage("embedding_api").add(len(texts), time.monotonic() - begin)
+                vectors = [None] * len(texts)
+                for item in response.data:
+                    vectors[item.index] = item.embedding
+                return vectors
+            except Exception as e:
+                if _is_input_error(e):
+                    self.logger.warning(f"?? Lote de {len(texts)} embeddings rechazado por su contenido: {e}")
+                    break
+                if isinstance(e, EMBEDDING_FATAL_ERRORS):
+                    raise EmbeddingServiceError(f"La API de embeddings rechazó el pedido: {e}") from e
+                self.logger.warning(f"?? Lote de {len(texts)} embeddings falló (intento {attempt}/{self.EMBEDDING_BATCH_RETRIES}): {e}")
+                if attempt == self.EMBEDDING_BATCH_RETRIES:
+                    raise EmbeddingServiceError(f"La API de embeddings no respondió tras {attempt} intentos: {e}") from e
+                with self._stats_lock:
+                    self.run_stats.embedding_retries += 1
+                time.sleep(self._retry_delay(attempt, e))
+
+        if len(texts) == 1:
+            self.logger.error("? Error obteniendo embeddings: texto rechazado por la API, se descarta")
+            return [None]
+
+        middle = len(texts) // 2
+        return self._get_embeddings_batch(texts[:middle]) + self._get_embeddings_batch(texts[middle:])
+
+    def _iter_embedding_batches(self, records: List[ChunkRecord]):
+        """Agrupa registros en lotes acotados por cantidad de items y tokens estimados"""
+        batch, batch_tokens = [], 0
+        for record in records:
+            tokens = record.token_count or self._estimate_tokens(record.text)
+            if batch and (len(batch) >= self.EMBEDDING_BATCH_SIZE or batch_tokens + tokens > self.EMBEDDING_BATCH_MAX_TOKENS):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(record)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def _embed_records(self, records: List[ChunkRecord]) -> None:
+        """Completa el vector de cada registro: primero desde el cache local, el resto por lotes a la API"""
+        to_embed = [r for r in records if r.text.strip() and not r.duplicate_of]
+        
+        if self.embedding_cache is not None and to_embed:
+            try:
+                cached = self.embedding_cache.get_many((r.text for r in to_embed), self.EMBEDDING_MODEL)
+            except Exception as e:
+                self.logger.warning(f"?? Error leyendo cache de embeddings: {e}")
+                cached = {}
+            misses = []
+            for record in to_embed:
+                vector = cached.get(EmbeddingCache.text_key(record.text))
+                if vector is not None:
+                    record.vector = vector
+                else:
+                    misses.append(record)
+            saved = self._count_batches(to_embed) - self._count_batches(misses)
+            with self._stats_lock:
+                self.run_stats.cache_hits += len(to_embed) - len(misses)
+                self.run_stats.cache_misses += len(misses)
+                self.run_stats.requests_saved += saved
+            to_embed = misses
+        
+        for batch in self._iter_embedding_batches(to_embed):
+            self.run_stats.stage("embedding_api").add_volume(tokens=sum(r.token_count for r in batch))
+            vectors = self._get_embeddings_batch([r.text for r in batch])
+            for record, vector in zip(batch, vectors):
+                record.vector = vector
+            with self._stats_lock:
+                self.run_stats.embedded_chunks += sum(1 for v in vectors if v is not None)
+            if self.embedding_cache is not None:
+                try:
+                    self.embedding_cache.put_many(((r.text, v) for r, v in zip(batch, vectors)), self.EMBEDDING_MODEL)
+                except Exception as e:
+                    self.logger.warning(f"?? Error guardando en cache de embeddings: {e}")
+
+    def _count_batches(self, records: List[ChunkRecord]) -> int:
+        """Cantidad de requests que harían falta para vectorizar estos registros"""
+        return sum(1 for _ in self._iter_embedding_batches(records))
+
+    def _write_records(self, records: List[ChunkRecord]) -> Dict[str, str]:
+        """
+        Inserta (upsert) registros vectorizados con insert_many.
+        Los UUID son determinísticos, así que no hace falta borrar antes.
+        Devuelve los errores por objeto: {uuid: mensaje}.
+        """
+        errors = {}
+        writable = []
+        for record in records:
+            if record.duplicate_of:
+                continue   # Lo representa su chunk canónico
+            if record.vector is None and record.text.strip():
+                errors[record.uuid] = "No se pudieron obtener embeddings"
+                self.logger.warning(f"?? No se pudieron obtener embeddings para {record.properties['nombre_archivo']}")
+            else:
+                writable.append(record)
+        
+        collection = self.weaviate_client.collections.get(self.collection_name)
+        for start in range(0, len(writable), self.INSERT_BATCH_SIZE):
+            batch = writable[start:start + self.INSERT_BATCH_SIZE]
+            objects = [
+                wvc.data.DataObject(properties=r.properties, vector=r.vector, uuid=r.uuid)
+                for r in batch
+            ]
+            begin = time.monotonic()
+            try:
+                try:
+                    result = collection.data.insert_many(objects)
+                finally:
+                    self.run_stats.stage("weaviate_insert").add(
+                        len(batch), time.monotonic() - begin,
+                        nbytes=sum(len(r.text.encode("utf-8")) for r in batch),
+                        tokens=sum(r.token_count for r in batch))
+                for idx, error in result.errors.items():
+                    errors[batch[idx].uuid] = error.message
+                    self.logger.error(f"? Error agregando {batch[idx].properties['nombre_archivo']}: {error.message}")
+            except Exception as e:
+                self.logger.error(f"? Error en inserción por lotes ({len(batch)} objetos): {e}")
+                for r in batch:
+                    errors[r.uuid] = str(e)
+        
+        inserted = len(writable) - sum(1 for r in writable if r.uuid in errors)
+        self.logger.info(f"? VECTORIZADOS: {inserted} objetos insertados por lotes ({len(errors)} con error)")
+        return errors
+
+    def _has_exact_path_filter(self) -> bool:
+        """True si archivo_original usa tokenización 'field' (igualdad exacta en filtros)"""
+        if self._exact_path_filter is None:
+            try:
+                config = self.weaviate_client.collections.get(self.collection_name).config.get()
+                prop = next((p for p in config.properties if p.name == "archivo_original"), None)
+                self._exact_path_filter = bool(prop and prop.tokenization == Tokenization.FIELD)
+            except Exception as e:
+                self.logger.warning(f"?? No se pudo leer la configuración de la colección: {e}")
+                return False
+        return self._exact_path_filter
+
+    def _delete_document_objects(self, file_path: str, extra_filter=None) -> int:
+        """
+        Borra con delete_many los objetos de un archivo (opcionalmente acotados por extra_filter).
+        En colecciones creadas con tokenización 'word' el filtro por ruta puede coincidir
+        con otras rutas, así que primero se confirma la coincidencia exacta.
+        """
+        collection = self.weaviate_client.collections.get(self.collection_name)
+        where = Filter.by_property("archivo_original").equal(file_path)
+        if extra_filter is not None:
+            where = where & extra_filter
+        
+        if not self._has_exact_path_filter():
+            response = collection.query.fetch_objects(
+                filters=where,
+                limit=10000,
+                return_properties=["archivo_original"]
+            )
+            ids = [obj.uuid for obj in response.objects if obj.properties.get("archivo_original") == file_path]
+            if not ids:
+                return 0
+            where = Filter.by_id().contains_any(ids)
+        
+        result = collection.data.delete_many(where=where)
+        if result.failed:
+            self.logger.warning(f"?? {result.failed} objetos no se pudieron eliminar de {os.path.basename(file_path)}")
+        return result.successful
+
+    def _delete_stale_objects(self, doc_info: DocumentInfo, first: int, last: int) -> int:
+        """Elimina objetos de versiones anteriores del archivo (otro hash o chunks fuera de first..last)"""
+        stale = (
+            Filter.by_property("hash_archivo").not_equal(doc_info.file_hash)
+            | Filter.by_property("numero_chunk").greater_than(last)
+            | Filter.by_property("numero_chunk").less_than(first)
+        )
+        try:
+            removed = self._delete_document_objects(doc_info.file_path, stale)
+            if removed:
+                self.logger.info(f"??? {removed} objetos obsoletos eliminados de: {doc_info.file_name}")
+            return removed
         except Exception as e:
-            self.logger.error(f"? Error agregando {doc_info.file_name}: {e}")
-            return False
+            self.logger.warning(f"?? Error eliminando objetos obsoletos de {doc_info.file_name}: {e}")
+            return 0
+
+    def _finalize_document(self, doc_info: DocumentInfo, records: List[ChunkRecord],
+                           errors: Dict[str, str], replace_existing: bool = False) -> bool:
+        """Actualiza el estado del documento según los errores por objeto del lote"""
+        failed = [r for r in records if r.uuid in errors]
+        success_count = len(records) - len(failed)
+        
+        doc_info.vectorized = success_count > 0
+        doc_info.failed_chunks = len(failed)
+        if not failed:
+            doc_info.error = None
+        else:
+            doc_info.error = f"Solo {success_count}/{len(records)} chunks procesados: {errors[failed[0].uuid]}"
+        
+        if doc_info.chunked:
+            self.logger.info(f"? {doc_info.file_name}: {success_count}/{len(records)} chunks vectorizados")
+        
+        # Los chunks de la versión anterior con el mismo número ya fueron sobreescritos;
+        # solo quedan por borrar los de otro hash o los sobrantes
+        if replace_existing and success_count > 0:
+            numbers = [r.properties["numero_chunk"] for r in records]
+            self._delete_stale_objects(doc_info, min(numbers), max(numbers))
+            self._delete_duplicate_copies(doc_info, records)
+        
+        return success_count > 0
+
+    def _delete_duplicate_copies(self, doc_info: DocumentInfo, records: List[ChunkRecord]):
+        """Un chunk que ahora es duplicado puede seguir guardado de una versión anterior con el mismo hash"""
+        duplicate_ids = [r.uuid for r in records if r.duplicate_of]
+        if duplicate_ids:
+            try:
+                collection = self.weaviate_client.collections.get(self.collection_name)
+                collection.data.delete_many(where=Filter.by_id().contains_any(duplicate_ids))
+            except Exception as e:
+                self.logger.warning(f"?? Error eliminando chunks duplicados de {doc_info.file_name}: {e}")
 
-    def _ensure_collection_exists(self):
-        """Asegura que la colección Documento existe con nuevos campos"""
+    def _ensure_collection_exists(self, name: str = None):
+        """Asegura que la colección de documentos (la actual o 'name') existe con nuevos campos"""
+        name = name or self.collection_name
         try:
-            if self.weaviate_client.collections.exists("Documento"):
-                self.logger.info("? Colección 'Documento' existe")
+            if self.weaviate_client.collections.exists(name):
+                self.logger.info(f"? Colección '{name}' existe")
+                self._ensure_section_property(name)
                 return True
                 
             # Crear la colección con campos adicionales para chunking
             self.weaviate_client.collections.create(
-                name="Documento",
+                name=name,
                 properties=[
                     Property(name="contenido", data_type=DataType.TEXT),
                     Property(name="nombre_archivo", data_type=DataType.TEXT),
-                    Property(name="ruta_archivo", data_type=DataType.TEXT),
-                    Property(name="archivo_original", data_type=DataType.TEXT),
+                    Property(name="seccion", data_type=DataType.TEXT),   # Ruta de títulos (h1 > h2 > ...)
+                    # Tokenización 'field': los filtros por ruta/hash comparan el valor completo
+                    Property(name="ruta_archivo", data_type=DataType.TEXT, tokenization=Tokenization.FIELD),
+                    Property(name="archivo_original", data_type=DataType.TEXT, tokenization=Tokenization.FIELD),
                     Property(name="es_chunk", data_type=DataType.BOOL),
                     Property(name="numero_chunk", data_type=DataType.INT),
                     Property(name="tipo_archivo", data_type=DataType.TEXT),
-                    Property(name="hash_archivo", data_type=DataType.TEXT),
+                    Property(name="hash_archivo", data_type=DataType.TEXT, tokenization=Tokenization.FIELD),
                     Property(name="fecha_modificacion", data_type=DataType.DATE),
                     Property(name="tamano_archivo", data_type=DataType.INT),
                 ],
                 vectorizer_config=Configure.Vectorizer.none()
             )
-            self.logger.info("? Colección 'Documento' creada con campos de chunking")
+            self.logger.info(f"? Colección '{name}' creada con campos de chunking")
             return True
             
         except Exception as e:
             self.logger.error(f"? Error creando colección: {e}")
             return False
 
-    def scan_directory(self, root_path: str) -> Dict[str, DocumentInfo]:
-        """Escanea un directorio y devuelve información de archivos"""
+    def _ensure_section_property(self, name: str):
+        """Agrega 'seccion' a colecciones creadas antes del chunking por secciones"""
+        try:
+            collection = self.weaviate_client.collections.get(name)
+            if not any(prop.name == "seccion" for prop in collection.config.get().properties):
+                collection.config.add_property(Property(name="seccion", data_type=DataType.TEXT))
+                self.logger.info(f"? Propiedad 'seccion' agregada a '{name}'")
+        except Exception as e:
+            self.logger.warning(f"?? No se pudo agregar la propiedad 'seccion' a '{name}': {e}")
+
+    def scan_directory(self, root_path: str, paranoid: bool = False, refresh_registry: bool = True) -> Dict[str, DocumentInfo]:
+        """
+        Escanea un directorio (sin extraer texto) y devuelve información de archivos.
+        Solo se hashean los candidatos: archivos nuevos o con tamaño/mtime distinto al registro
+        (todos en modo paranoid). Con refresh_registry=False no migra hashes en el registro.
+        """
         found_files = {}
+        candidates = []
+        started = time.monotonic()
         
         self.logger.info(f"?? Escaneando directorio: {root_path}")
         
@@ -636,32 +1220,60 @@ class WeaviateManager:
                     continue
                 
                 try:
-                    stat = os.stat(file_path)
-                    file_hash = self._calculate_file_hash(file_path)
-                    
-                    text, error = self._extract_text(file_path)
-                    content_length = len(text) if text else 0
-                    
-                    doc_info = DocumentInfo(
-                        file_path=file_path,
-                        file_name=file_name,
-                        file_hash=file_hash,
-                        last_modified=stat.st_mtime,
-                        file_size=stat.st_size,
-                        content_length=content_length,
-                        error=error
-                    )
-                    
+                    doc_info, needs_hash = self._stat_document(file_path, paranoid)
                     found_files[file_path] = doc_info
+                    if needs_hash:
+                        candidates.append(doc_info)
                     
                 except Exception as e:
                     self.logger.warning(f"?? Error procesando {file_path}: {e}")
-                    
-        self.logger.info(f"?? Encontrados {len(found_files)} archivos")
+        
+        if candidates:
+            with ThreadPoolExecutor(max_workers=self.HASH_WORKERS, thread_name_prefix="hash") as pool:
+                list(pool.map(lambda doc_info: self._hash_candidate(doc_info, refresh_registry), candidates))
+        
+        self.scan_seconds = time.monotonic() - started
+        self.scan_hashed_bytes = sum(doc_info.file_size for doc_info in candidates)
+        self.logger.info(f"?? Encontrados {len(found_files)} archivos en {self.scan_seconds:.2f}s ({len(candidates)} hasheados)")
         return found_files
 
-    def detect_changes(self, found_files: Dict[str, DocumentInfo]) -> Dict[str, List[str]]:
-        """Detecta cambios entre archivos encontrados y registrados"""
+    def _stat_document(self, file_path: str, paranoid: bool = False) -> Tuple[DocumentInfo, bool]:
+        """DocumentInfo a partir del stat del archivo y si hace falta hashearlo"""
+        stat = os.stat(file_path)
+        registered = self.document_registry.get(file_path)
+        
+        # content_length se completa al extraer el texto (solo archivos nuevos o modificados)
+        doc_info = DocumentInfo(
+            file_path=file_path,
+            file_name=os.path.basename(file_path),
+            file_hash=registered.file_hash if registered else "",
+            last_modified=stat.st_mtime,
+            file_size=stat.st_size,
+            content_length=0,
+            mtime_ns=stat.st_mtime_ns,
+            hash_algo=registered.hash_algo if registered else self.HASH_ALGO
+        )
+        return doc_info, paranoid or not registered or not self._stat_matches(registered, stat)
+
+    def _hash_candidate(self, doc_info: DocumentInfo, refresh_registry: bool = True):
+        """Hashea un candidato; si el registro usa otro algoritmo, lo calcula en la misma pasada para comparar"""
+        registered = self.document_registry.get(doc_info.file_path)
+        algos = (self.HASH_ALGO,)
+        if registered and registered.hash_algo != self.HASH_ALGO:
+            algos += (registered.hash_algo,)
+        
+        digests = self._calculate_file_hash(doc_info.file_path, algos)
+        doc_info.file_hash = digests[self.HASH_ALGO]
+        doc_info.hash_algo = self.HASH_ALGO
+        
+        # Mismo contenido con el hash anterior: migrar el registro al nuevo algoritmo
+        if refresh_registry and len(algos) > 1 and digests[registered.hash_algo] == registered.file_hash:
+            registered.file_hash = doc_info.file_hash
+            registered.hash_algo = self.HASH_ALGO
+            self.document_registry[doc_info.file_path] = registered
+
+    def detect_changes(self, found_files: Dict[str, DocumentInfo], refresh_registry: bool = True) -> Dict[str, List[str]]:
+        """Detecta cambios entre archivos encontrados y registrados (refresh_registry: ver _classify_change)"""
         changes = {
             "new": [],
             "modified": [],
@@ -670,15 +1282,7 @@ class WeaviateManager:
         }
         
         for file_path, found_info in found_files.items():
-            if file_path not in self.document_registry:
-                changes["new"].append(file_path)
-            else:
-                registered_info = self.document_registry[file_path]
-                if (found_info.file_hash != registered_info.file_hash or 
-                    found_info.last_modified != registered_info.last_modified):
-                    changes["modified"].append(file_path)
-                else:
-                    changes["unchanged"].append(file_path)
+            changes[self._classify_change(found_info, refresh_registry)].append(file_path)
         
         for file_path in self.document_registry:
             if file_path not in found_files:
@@ -686,30 +1290,694 @@ class WeaviateManager:
         
         return changes
 
-    def add_document_to_weaviate(self, doc_info: DocumentInfo) -> bool:
-        """Agrega un documento a Weaviate con chunking inteligente"""
+    def _classify_change(self, found_info: DocumentInfo, refresh_registry: bool = True) -> str:
+        """'new', 'modified' o 'unchanged' comparando el hash con el registro"""
+        registered_info = self.document_registry.get(found_info.file_path)
+        if registered_info is None:
+            return "new"
+        if found_info.file_hash != registered_info.file_hash:
+            return "modified"
+        if registered_info.failed_chunks:
+            return "modified"   # Documento parcial: se reintenta completo
+        # Solo cambió la fecha (touch/copia): actualizar el registro para no volver a hashear
+        if refresh_registry and (registered_info.mtime_ns != found_info.mtime_ns or
+                                 registered_info.file_size != found_info.file_size):
+            registered_info.last_modified = found_info.last_modified
+            registered_info.mtime_ns = found_info.mtime_ns
+            registered_info.file_size = found_info.file_size
+            self.document_registry[found_info.file_path] = registered_info
+        return "unchanged"
+
+    def add_document_to_weaviate(self, doc_info: DocumentInfo, replace_existing: bool = False) -> bool:
+        """Agrega (o reemplaza) un documento en Weaviate con chunking inteligente"""
+        records = self._prepare_document(doc_info)
+        if records is None:
+            return False
+        
+        self._embed_records(records)
+        errors = self._write_records(records)
+        self.run_stats.object_errors += len(errors)
+        return self._finalize_document(doc_info, records, errors, replace_existing)
+
+    def _checkpoint(self, method: str, *args):
+        """Registra el avance del trabajo actual; un fallo del journal no interrumpe la ingesta"""
+        if self.current_job_id is None:
+            return
         try:
-            text, error = self._extract_text(doc_info.file_path)
-            if error:
-                doc_info.error = error
-                self.logger.warning(f"?? Error en {doc_info.file_name}: {error}")
-                return False
-            
-            # Decidir estrategia y marcar como vectorizado
-            if len(text) <= self.MAX_CHARS:
-                # Archivo normal - procesamiento directo
-                success = self._add_single_document(doc_info, text, is_chunk=False)
-                if success:
-                    doc_info.vectorized = True
-                return success
+            getattr(self.journal, method)(self.current_job_id, *args)
+        except Exception as e:
+            self.logger.warning(f"?? Error actualizando journal de ingesta: {e}")
+
+    def _load_near_duplicate_index(self, reprocessed: Iterable[str]):
+        """Huellas de los chunks canónicos ya guardados, sin las de los documentos que se van a reescribir"""
+        if not self.NEAR_DUPLICATE_DETECTION:
+            self.near_duplicates = None
+            return
+        reprocessed = set(reprocessed)
+        self.near_duplicates = SimHashIndex(self.NEAR_DUPLICATE_MAX_DISTANCE)
+        for uuid, doc_path, fingerprint in self.document_registry.fingerprints():
+            if doc_path not in reprocessed:
+                self.near_duplicates.add(uuid, doc_path, to_unsigned(fingerprint))
+
+    def _mark_duplicates(self, records: List[ChunkRecord]):
+        """Marca los chunks casi idénticos a un canónico ya visto; el resto pasa a ser canónico"""
+        if self.near_duplicates is None:
+            return
+        for record in records:
+            if not record.simhash:
+                continue
+            match = self.near_duplicates.find(record.simhash)
+            if match:
+                record.duplicate_of, record.canonical_simhash = match
             else:
-                # Archivo grande - usar chunking
-                return self._process_large_document(doc_info, text)
-            
+                self.near_duplicates.add(record.uuid, record.doc_path, record.simhash)
+
+    def _save_chunk_fingerprints(self, doc_info: DocumentInfo, records: List[ChunkRecord], errors: Dict[str, str],
+                                 append: bool = False):
+        """Registra las huellas de los canónicos escritos y las rutas alternativas de los omitidos"""
+        canonical = [(r.uuid, to_signed(r.simhash), r.token_count) for r in records
+                     if r.simhash and not r.duplicate_of and r.uuid not in errors and r.vector is not None]
+        duplicates = [(r.uuid, r.duplicate_of, to_signed(r.canonical_simhash), r.token_count)
+                      for r in records if r.duplicate_of]
+        if append:
+            self.document_registry.add_chunks(doc_info.file_path, canonical, duplicates)
+        else:
+            self.document_registry.replace_chunks(doc_info.file_path, canonical, duplicates)
+
+    def _abort_run(self, stats: ProcessingStats, error: Exception):
+        """Corta la ingesta por un error del servicio de embeddings; lo pendiente queda en el journal para reanudar"""
+        if stats.aborted is None:
+            stats.aborted = str(error)
+            self.logger.error(f"? Ingesta detenida: {error}")
+        self.cancel_event.set()
+
+    def _requeue_orphaned_duplicates(self, stats: ProcessingStats):
+        """Reprocesa los documentos cuyos chunks omitidos perdieron su canónico (borrado, modificado o con error)"""
+        if not self.NEAR_DUPLICATE_DETECTION or self.cancel_event.is_set():
+            return
+        orphaned = self.document_registry.orphaned_duplicates()
+        if not orphaned:
+            return
+        self.logger.info(f"?? {len(orphaned)} documentos con chunks duplicados sin canónico, reprocesando...")
+        self._run_ingest_pipeline([("requeued", self.document_registry[p]) for p in orphaned], stats)
+
+    def _write_pending(self, pending: List[Tuple[str, DocumentInfo, List[ChunkRecord]]], stats: ProcessingStats):
+        """Inserta los chunks ya vectorizados de varios documentos y actualiza el registro"""
+        all_records = [record for _, _, records in pending for record in records]
+        errors = self._write_records(all_records)
+        stats.object_errors += len(errors)
+        
+        for change_type, doc_info, records in pending:
+            if self._finalize_document(doc_info, records, errors, replace_existing=(change_type != "new")):
+                self._count_written_chunks(records, errors, stats)
+                self._save_chunk_fingerprints(doc_info, records, errors)
+                self._complete_document(change_type, doc_info, sum(1 for r in records if r.uuid not in errors), stats)
+            else:
+                stats.errors += 1
+                self._checkpoint("mark_error", doc_info.file_path, doc_info.error)
+
+    def _count_written_chunks(self, records: List[ChunkRecord], errors: Dict[str, str], stats: ProcessingStats):
+        written = [r for r in records if r.uuid not in errors and r.vector is not None]
+        stats.chunk_tokens.extend(r.token_count for r in written)
+        stats.truncated_chunks += sum(1 for r in written if r.truncated)
+        duplicates = [r for r in records if r.duplicate_of]
+        stats.duplicate_chunks += len(duplicates)
+        stats.duplicate_tokens += sum(r.token_count for r in duplicates)
+
+    def _complete_document(self, change_type: str, doc_info: DocumentInfo, chunks_done: int, stats: ProcessingStats):
+        """Registra el documento terminado y lo cuenta en las estadísticas"""
+        self.document_registry[doc_info.file_path] = doc_info
+        if doc_info.failed_chunks:
+            # Queda registrado con lo escrito (la validación del rebuild lo compara así),
+            # pero cuenta como error: REBUILD_MAX_ERROR_RATIO decide y el próximo update lo reintenta
+            stats.errors += 1
+            self._checkpoint("mark_error", doc_info.file_path, doc_info.error)
+        else:
+            self._checkpoint("mark_done", doc_info.file_path, chunks_done)
+            if change_type == "new":
+                stats.new += 1
+            elif change_type == "modified":
+                stats.modified += 1
+            else:
+                stats.requeued_documents += 1
+        if doc_info.vectorized:
+            stats.vectorized_documents += 1
+        if doc_info.chunked:
+            stats.chunked_files += 1
+            stats.total_chunks += doc_info.chunks_count
+
+    def _ingest_streaming(self, change_type: str, doc_info: DocumentInfo, stats: ProcessingStats):
+        """
+        Documento grande por ventanas de EMBEDDING_BATCH_SIZE chunks: cada ventana se vectoriza e
+        inserta antes de seguir leyendo, así que la memoria depende del tamaño de la ventana y no
+        del archivo. Un documento cancelado a mitad queda pendiente y se reprocesa completo.
+        """
+        replace_existing = change_type != "new"
+        records = self._iter_document_records(doc_info)
+        total = failed = tokens = 0
+        first_error = None
+        prepare_seconds = 0.0
+        self.logger.info(f"?? {doc_info.file_name}: {doc_info.file_size / (1024 * 1024):.1f} MB, procesando por streaming")
+        self.document_registry.replace_chunks(doc_info.file_path, [], [])
+        
+        try:
+            while True:
+                if self.cancel_event.is_set():
+                    return
+                begin = time.monotonic()
+                window = list(itertools.islice(records, self.EMBEDDING_BATCH_SIZE))
+                prepare_seconds += time.monotonic() - begin
+                if not window:
+                    break
+                total += len(window)
+                tokens += sum(r.token_count for r in window)
+                self._mark_duplicates(window)
+                
+                begin = time.monotonic()
+                self._embed_records(window)
+                stats.stage("embed").add(len(window), time.monotonic() - begin)
+                begin = time.monotonic()
+                errors = self._write_records(window)
+                stats.stage("write").add(len(window), time.monotonic() - begin)
+                
+                stats.object_errors += len(errors)
+                failed += sum(1 for r in window if r.uuid in errors)
+                first_error = first_error or next(iter(errors.values()), None)
+                self._count_written_chunks(window, errors, stats)
+                self._save_chunk_fingerprints(doc_info, window, errors, append=True)
+                if replace_existing:
+                    self._delete_duplicate_copies(doc_info, window)
+        except EmbeddingServiceError as e:
+            self._abort_run(stats, e)
+            return
         except Exception as e:
-            doc_info.error = str(e)
+            doc_info.error = f"Error extrayendo texto: {e}"
             self.logger.error(f"? Error procesando {doc_info.file_name}: {e}")
+            stats.errors += 1
+            self._checkpoint("mark_error", doc_info.file_path, doc_info.error)
+            return
+        finally:
+            records.close()
+        
+        # Lectura + chunking (intercalados con la escritura)
+        stats.stage("extract").add(1, prepare_seconds)
+        stats.stage("chunk").add(total, prepare_seconds, nbytes=doc_info.file_size, tokens=tokens)
+        self._checkpoint("mark_prepared", doc_info.file_path, total)
+        
+        success_count = total - failed
+        doc_info.chunks_count = total
+        doc_info.chunked = total > 1
+        doc_info.vectorized = success_count > 0
+        doc_info.failed_chunks = failed
+        doc_info.error = f"Solo {success_count}/{total} chunks procesados: {first_error}" if failed else None
+        self.logger.info(f"? {doc_info.file_name}: {success_count}/{total} chunks vectorizados")
+        
+        if success_count > 0:
+            if replace_existing:
+                self._delete_stale_objects(doc_info, 1, total)
+            self._complete_document(change_type, doc_info, success_count, stats)
+        else:
+            doc_info.error = doc_info.error or "Sin chunks para vectorizar"
+            stats.errors += 1
+            self._checkpoint("mark_error", doc_info.file_path, doc_info.error)
+
+    def _run_ingest_pipeline(self, to_process: List[Tuple[str, DocumentInfo]], stats: ProcessingStats) -> Dict[str, Dict]:
+        """
+        Pipeline por etapas con colas acotadas (back-pressure):
+        extracción/chunking en procesos -> embeddings por lotes en hilos -> escritura por lotes en Weaviate.
+        Devuelve el throughput de cada etapa.
+        """
+        stages = {name: stats.stage(name) for name in ("extract", "embed", "write")}
+        before = {name: (stage.items, stage.busy_seconds) for name, stage in stages.items()}
+        prepared_q = queue.Queue(maxsize=self.PIPELINE_QUEUE_SIZE)
+        embedded_q = queue.Queue(maxsize=self.PIPELINE_QUEUE_SIZE)
+        done = object()
+        started = time.monotonic()
+        self._load_near_duplicate_index(doc_info.file_path for _, doc_info in to_process)
+        # Los archivos de texto grandes no pasan por las colas: se procesan al final por streaming
+        streamed = [(change_type, doc_info) for change_type, doc_info in to_process if self._should_stream(doc_info)]
+        if streamed:
+            to_process = [(change_type, doc_info) for change_type, doc_info in to_process if not self._should_stream(doc_info)]
+        
+        def extract_stage():
+            # Limita los documentos en vuelo para no adelantarse a las etapas siguientes
+            window = threading.BoundedSemaphore(max(1, self.EXTRACT_WORKERS) * 2)
+            pool = None
+            if self.EXTRACT_WORKERS:
+                try:
+                    # spawn: un fork copiaría hilos, locks, sqlite y conexiones gRPC/HTTP del proceso padre
+                    pool = ProcessPoolExecutor(max_workers=self.EXTRACT_WORKERS,
+                                               mp_context=multiprocessing.get_context("spawn"))
+                except Exception as e:
+                    self.logger.warning(f"?? No se pudo crear el pool de procesos ({e}), extrayendo en este proceso")
+            settings = self.get_settings()
+            
+            def submit(change_type, doc_info):
+                window.acquire()
+                submitted = time.monotonic()
+                if pool is None:
+                    timings = {}
+                    records = self._prepare_document(doc_info, timings)
+                    deliver(change_type, doc_info, records, submitted, timings)
+                    return
+                future = pool.submit(_prepare_in_worker, settings, doc_info)
+                future.add_done_callback(lambda f: on_done(f, change_type, doc_info, submitted))
+            
+            def on_done(future, change_type, doc_info, submitted):
+                try:
+                    doc_info, records, timings = future.result()
+                except Exception as e:
+                    self.logger.warning(f"?? Worker de extracción falló para {doc_info.file_name} ({e}), procesando localmente")
+                    timings = {}
+                    records = self._prepare_document(doc_info, timings)
+                deliver(change_type, doc_info, records, submitted, timings)
+            
+            def deliver(change_type, doc_info, records, submitted, timings):
+                stages["extract"].add(1, time.monotonic() - submitted)
+                if "parse" in timings:
+                    stats.stage("parse").add(1, timings["parse"], nbytes=timings.get("bytes", 0))
+                if "chunk" in timings:
+                    stats.stage("chunk").add(len(records), timings["chunk"], tokens=timings.get("tokens", 0))
+                if records is not None:
+                    self._checkpoint("mark_prepared", doc_info.file_path, len(records))
+                prepared_q.put((change_type, doc_info, records))
+                window.release()
+            
+            try:
+                for change_type, doc_info in to_process:
+                    # Al cancelar no se toman documentos nuevos; los que están en vuelo terminan
+                    if self.cancel_event.is_set():
+                        break
+                    submit(change_type, doc_info)
+            finally:
+                if pool is not None:
+                    pool.shutdown(wait=True)
+                prepared_q.put(done)
+        
+        def embed_group(group):
+            records = [record for _, _, recs in group for record in recs]
+            begin = time.monotonic()
+            try:
+                if not stats.aborted:   # Lotes en cola tras el corte: no se vuelve a esperar a la API
+                    self._embed_records(records)
+            except EmbeddingServiceError as e:
+                self._abort_run(stats, e)
+            except Exception as e:
+                # Los registros sin vector se reportan como error al escribir
+                self.logger.error(f"? Error vectorizando lote de {len(records)} chunks: {e}")
+            finally:
+                stages["embed"].add(len(records), time.monotonic() - begin)
+                embedded_q.put(group)
+        
+        def embed_stage():
+            # Agrupa documentos hasta completar un lote de embeddings
+            pool = ThreadPoolExecutor(max_workers=self.EMBED_WORKERS, thread_name_prefix="embed") if self.EMBED_WORKERS else None
+            window = threading.BoundedSemaphore(max(1, self.EMBED_WORKERS) * 2)
+            
+            def dispatch(group):
+                if pool is None:
+                    embed_group(group)
+                    return
+                window.acquire()
+                try:
+                    future = pool.submit(embed_group, group)
+                except BaseException:
+                    window.release()
+                    raise
+                future.add_done_callback(lambda f: window.release())
+            
+            def fail(items, error):
+                # El escritor los cuenta como error y los marca en el journal
+                self.logger.error(f"? Error preparando embeddings de {len(items)} documentos: {error}")
+                for _, doc_info, _ in items:
+                    doc_info.error = f"Error preparando embeddings: {error}"
+                embedded_q.put([(change_type, doc_info, None) for change_type, doc_info, _ in items])
+            
+            group, group_chunks = [], 0
+            try:
+                while True:
+                    item = prepared_q.get()
+                    if item is done:
+                        break
+                    change_type, doc_info, records = item
+                    if self.cancel_event.is_set():
+                        # Se descarta sin vectorizar; queda pendiente en el journal
+                        continue
+                    if records is None:
+                        embedded_q.put([item])
+                        continue
+                    # Un error de un documento no corta el bucle: si esta etapa deja de leer
+                    # prepared_q, la extracción queda bloqueada en put() y el pipeline no termina
+                    try:
+                        # Un solo hilo decide qué chunk es canónico: el primero que llega
+                        self._mark_duplicates(records)
+                    except Exception as e:
+                        fail([item], e)
+                        continue
+                    group.append(item)
+                    group_chunks += len(records)
+                    if group_chunks >= self.EMBEDDING_BATCH_SIZE:
+                        try:
+                            dispatch(group)
+                        except Exception as e:
+                            fail(group, e)
+                        group, group_chunks = [], 0
+                if group:
+                    try:
+                        dispatch(group)
+                    except Exception as e:
+                        fail(group, e)
+            finally:
+                if pool is not None:
+                    pool.shutdown(wait=True)
+                embedded_q.put(done)
+        
+        extractor = threading.Thread(target=extract_stage, name="ingest-extract", daemon=True)
+        embedder = threading.Thread(target=embed_stage, name="ingest-embed", daemon=True)
+        extractor.start()
+        embedder.start()
+        
+        # Escritor: un único hilo (este) inserta en Weaviate y actualiza registro/estadísticas
+        while True:
+            group = embedded_q.get()
+            if group is done:
+                break
+            if stats.aborted:
+                continue   # Sin embeddings: los documentos quedan pendientes en el journal
+            failed = [doc_info for _, doc_info, records in group if records is None]
+            if failed:
+                stats.errors += len(failed)
+                for doc_info in failed:
+                    self._checkpoint("mark_error", doc_info.file_path, doc_info.error)
+                continue
+            begin = time.monotonic()
+            try:
+                self._write_pending(group, stats)
+            except Exception as e:
+                self.logger.error(f"? Error escribiendo lote de {len(group)} documentos: {e}")
+                stats.errors += len(group)
+            stages["write"].add(sum(len(records) for _, _, records in group), time.monotonic() - begin)
+        
+        extractor.join()
+        embedder.join()
+        
+        for change_type, doc_info in streamed:
+            if self.cancel_event.is_set():
+                break
+            self._ingest_streaming(change_type, doc_info, stats)
+        
+        # Throughput de esta pasada (las etapas acumulan toda la ejecución)
+        elapsed = time.monotonic() - started
+        return {
+            name: StageStats(stage.items - before[name][0], stage.busy_seconds - before[name][1]).summary(elapsed)
+            for name, stage in stages.items()
+        }
+
+    def _pending_rebuild_collection(self) -> Optional[str]:
+        """Colección versionada más nueva que todavía no fue publicada (rebuild interrumpido)"""
+        try:
+            versions = list_versions(self.weaviate_client, DEFAULT_ALIAS)
+        except Exception as e:
+            self.logger.warning(f"?? No se pudieron listar las colecciones: {e}")
+            return None
+        if versions and versions[-1] != self.collection_name:
+            return versions[-1]
+        return None
+
+    def _publish_rebuild(self, target: str, files_total: int, stats: ProcessingStats) -> bool:
+        """Valida la colección reconstruida y, si está completa, cambia el alias hacia ella"""
+        try:
+            count = self.weaviate_client.collections.get(target).aggregate.over_all(total_count=True).total_count
+        except Exception as e:
+            self.logger.error(f"? No se pudo validar '{target}': {e}")
+            return False
+        
+        expected = sum(self._expected_object_counts().values())
+        error_ratio = stats.errors / files_total if files_total else 0.0
+        self.logger.info(f"?? Validación de '{target}': {count} objetos (esperados {expected}), "
+                         f"{stats.errors} archivos con error ({error_ratio:.1%})")
+        
+        if files_total and count == 0:
+            self.logger.error(f"? '{target}' quedó vacía, no se publica")
             return False
+        if count != expected:
+            self.logger.error(f"? '{target}' tiene {count} objetos y el registro espera {expected}, no se publica")
+            self._requeue_incomplete_documents(target)
+            return False
+        if error_ratio > Config.REBUILD_MAX_ERROR_RATIO:
+            self.logger.error(f"? Demasiados archivos con error ({error_ratio:.1%} > {Config.REBUILD_MAX_ERROR_RATIO:.1%}), no se publica")
+            return False
+        
+        previous = swap_alias(self.weaviate_client, target, DEFAULT_ALIAS)
+        # Si el proceso se corta antes de promover, _reconcile_registry lo completa al iniciar
+        self._unstage_registry(promote=True)
+        self._use_collection(target)
+        self.logger.info(f"? Alias '{DEFAULT_ALIAS}' -> '{target}'" + (f" (retirada: '{previous}')" if previous else ""))
+        self.collect_old_collections()
+        return True
+
+    def _requeue_incomplete_documents(self, target: str):
+        """Marca para reprocesar los documentos cuyos objetos en 'target' no coinciden con el registro"""
+        try:
+            counts = {}
+            for obj in self.weaviate_client.collections.get(target).iterator(return_properties=["archivo_original"]):
+                path = obj.properties.get("archivo_original")
+                counts[path] = counts.get(path, 0) + 1
+        except Exception as e:
+            self.logger.warning(f"?? No se pudieron contar objetos por documento en '{target}': {e}")
+            return
+        
+        expected_counts = self._expected_object_counts()
+        # Primero se juntan las rutas: no se borran filas del registro mientras se lo recorre
+        incomplete = [(path, doc.file_name) for path, doc in self.document_registry.items()
+                      if counts.get(path, 0) != expected_counts[path]]
+        for path, file_name in incomplete:
+            expected = expected_counts[path]
+            del self.document_registry[path]
+            self._checkpoint("mark_error", path, f"{counts.get(path, 0)}/{expected} objetos en la validación")
+            self.logger.warning(f"?? {file_name}: {counts.get(path, 0)}/{expected} objetos, se reprocesará")
+
+    def _expected_object_counts(self) -> Dict[str, int]:
+        """Objetos que cada documento del registro debería tener en Weaviate (sin sus chunks duplicados ni fallidos)"""
+        duplicates = self.document_registry.duplicate_counts()
+        return {path: (doc.chunks_count if doc.chunked else 1) - duplicates.get(path, 0) - doc.failed_chunks
+                for path, doc in self.document_registry.items()}
+
+    @staticmethod
+    def _uuid_key(uuid) -> int:
+        """Primeros 64 bits del UUID (clave del conjunto de verify: 8 bytes por objeto)"""
+        return int(str(uuid).replace("-", "")[:16], 16)
+
+    def verify_collection(self, fix: bool = False) -> Dict:
+        """
+        Recorre la colección con el cursor y la compara con el registro. Los UUID esperados
+        (determinísticos por archivo y número de chunk) se guardan como un array ordenado de
+        claves de 64 bits, así que la memoria depende del registro y no de la colección.
+        Huérfanos: objetos que el registro no espera. Faltantes: chunks esperados que no están.
+        Obsoletos: objetos esperados con otro hash de archivo. Con fix se borran los huérfanos
+        y se quitan del registro los documentos incompletos (el próximo update los reprocesa).
+        Si el registro no describe la colección publicada, fix se rechaza y solo se informa.
+        """
+        started = time.monotonic()
+        self.logger.info(f"?? Verificando '{self.collection_name}' contra el registro...")
+        refused = self._verify_fix_blocker() if fix else None
+        if refused:
+            self.logger.error(f"? verify --fix rechazado: {refused}")
+            fix = False
+        
+        paths, keys, owners = [], array("Q"), array("q")
+        for path, doc in self.document_registry.items():
+            if not (doc.vectorized or doc.error):
+                continue
+            owner = len(paths)
+            paths.append(path)
+            for number in (range(1, doc.chunks_count + 1) if doc.chunks_count else (0,)):
+                keys.append(self._uuid_key(self._chunk_uuid(path, number)))
+                owners.append(owner)
+        keys, owners = np.array(keys, dtype=np.uint64), np.array(owners, dtype=np.int64)
+        
+        duplicates = np.fromiter((self._uuid_key(uuid) for uuid in self.document_registry.duplicate_uuids()), dtype=np.uint64)
+        if duplicates.size:
+            stored = ~np.isin(keys, duplicates)
+            keys, owners = keys[stored], owners[stored]
+        order = np.argsort(keys, kind="stable")
+        keys, owners = keys[order], owners[order]
+        seen = np.zeros(keys.size, dtype=bool)
+        
+        collection = self.weaviate_client.collections.get(self.collection_name)
+        batch_size = max(1, Config.VERIFY_BATCH_SIZE)
+        result = {"collection": self.collection_name, "expected_objects": int(keys.size), "objects": 0,
+                  "orphans": 0, "orphans_deleted": 0, "missing_objects": 0, "requeued_documents": 0,
+                  "orphan_sample": []}
+        if refused:
+            result["error"] = refused
+        orphan_paths, stale_paths = set(), set()
+        batch = []
+        
+        def flush():
+            batch_keys = np.fromiter((self._uuid_key(uuid) for uuid, _, _ in batch), dtype=np.uint64, count=len(batch))
+            positions = np.minimum(np.searchsorted(keys, batch_keys), max(keys.size - 1, 0))
+            found = (keys[positions] == batch_keys) if keys.size else np.zeros(len(batch), dtype=bool)
+            seen[positions[found]] = True
+            
+            orphans = []
+            for i, (uuid, path, file_hash) in enumerate(batch):
+                if not found[i]:
+                    orphans.append(uuid)
+                    orphan_paths.add(path)
+                    if len(result["orphan_sample"]) < 20:
+                        result["orphan_sample"].append(f"{uuid} {path}")
+                else:
+                    doc = self.document_registry.get(path)
+                    if doc is not None and file_hash != doc.file_hash:
+                        stale_paths.add(path)
+            result["orphans"] += len(orphans)
+            if fix and orphans:
+                deleted = collection.data.delete_many(where=Filter.by_id().contains_any(orphans))
+                result["orphans_deleted"] += deleted.successful
+            batch.clear()
+        
+        for obj in collection.iterator(return_properties=["archivo_original", "hash_archivo"]):
+            batch.append((str(obj.uuid), obj.properties.get("archivo_original"), obj.properties.get("hash_archivo")))
+            result["objects"] += 1
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        
+        missing_paths = {paths[owner] for owner in np.unique(owners[~seen])}
+        result["missing_objects"] = int((~seen).sum())
+        result["orphan_documents"] = len(orphan_paths)
+        result["missing_documents"] = len(missing_paths)
+        result["stale_documents"] = len(stale_paths)
+        
+        requeue = sorted(missing_paths | stale_paths)
+        for path in requeue[:10]:
+            self.logger.warning(f"?? Incompleto u obsoleto: {path}")
+        if fix:
+            for path in requeue:
+                # Se borran también sus objetos: sin fila en el registro el próximo update lo trata
+                # como nuevo y no limpiaría los chunks obsoletos que quedan en la colección
+                if self.remove_document_from_weaviate(path):
+                    del self.document_registry[path]
+                    result["requeued_documents"] += 1
+        result["seconds"] = round(time.monotonic() - started, 2)
+        
+        self.logger.info(f"? Verificación: {result['objects']} objetos, {result['orphans']} huérfanos "
+                         f"({result['orphans_deleted']} eliminados), {result['missing_objects']} faltantes en "
+                         f"{len(missing_paths)} documentos, {len(stale_paths)} obsoletos ({result['seconds']:.1f}s)")
+        return result
+
+    def _verify_fix_blocker(self) -> Optional[str]:
+        """
+        Motivo para no corregir: con un rebuild abierto o un registro de otra versión, los objetos
+        que el registro no espera no son huérfanos y borrarlos vaciaría la colección publicada.
+        """
+        job_id = self.journal.find_unfinished("rebuild")
+        if job_id is not None:
+            return f"hay una reconstrucción sin terminar (trabajo #{job_id})"
+        if self._live_registry is not None:
+            return "hay una reconstrucción en curso"
+        live = self._resolve_live_collection()
+        if live != self.collection_name or self.document_registry.collection != live:
+            return (f"el registro corresponde a '{self.document_registry.collection}' y la colección "
+                    f"publicada es '{live}'")
+        return None
+
+    def collect_old_collections(self, grace_hours: float = None) -> List[str]:
+        """Borra las versiones retiradas hace más que el período de gracia"""
+        grace = timedelta(hours=Config.COLLECTION_GC_GRACE_HOURS if grace_hours is None else grace_hours)
+        try:
+            deleted = collect_garbage(self.weaviate_client, grace, DEFAULT_ALIAS)
+            for name in deleted:
+                self.logger.info(f"??? Colección retirada eliminada: {name}")
+            return deleted
+        except Exception as e:
+            self.logger.warning(f"?? Error eliminando colecciones retiradas: {e}")
+            return []
+
+    def export_snapshot(self, output_path: str) -> Dict:
+        """
+        Exporta la colección publicada con sus vectores (y el registro de documentos) a un zip
+        por partes: matrices float32 + propiedades en columnas. Se recorre con el cursor.
+        """
+        started = time.monotonic()
+        self.logger.info(f"?? Exportando '{self.collection_name}' a {output_path}...")
+        collection = self.weaviate_client.collections.get(self.collection_name)
+        manifest = vector_snapshot.export_collection(
+            collection,
+            output_path,
+            part_size=max(1, Config.SNAPSHOT_PART_SIZE),
+            metadata={"collection": self.collection_name, "embedding_model": self.EMBEDDING_MODEL},
+            extra_files={"registry.json": self.document_registry.snapshot()},
+            progress=lambda count: self.logger.info(f"?? {count} objetos exportados...")
+        )
+        elapsed = time.monotonic() - started
+        self.logger.info(f"? Exportados {manifest['objects']} objetos ({manifest['dimensions']} dimensiones) en "
+                         f"{elapsed:.1f}s, {os.path.getsize(output_path) / (1024 * 1024):.1f} MB"
+                         + (f"; {manifest['skipped_without_vector']} sin vector omitidos" if manifest['skipped_without_vector'] else ""))
+        return manifest
+
+    def import_snapshot(self, input_path: str) -> Dict:
+        """
+        Carga un export en una colección versionada nueva, con los mismos UUID y vectores (sin
+        llamar a la API de embeddings). Si la cantidad coincide con el manifiesto se publica con
+        el alias, se restaura el registro de documentos y se alimenta el cache de embeddings.
+        """
+        started = time.monotonic()
+        with zipfile.ZipFile(input_path) as archive:
+            manifest = vector_snapshot.read_manifest(archive)
+            if manifest.get("embedding_model") != self.EMBEDDING_MODEL:
+                raise ValueError(f"El export usa el modelo {manifest.get('embedding_model')} y el actual es {self.EMBEDDING_MODEL}")
+            
+            target = next_version_name(self.weaviate_client, DEFAULT_ALIAS)
+            self.logger.info(f"?? Importando {manifest['objects']} objetos de '{manifest.get('collection')}' en '{target}'...")
+            if not self._ensure_collection_exists(target):
+                return {"error": 1}
+            
+            def seed_cache(uuids, vectors, properties):
+                if self.embedding_cache is not None:
+                    self.embedding_cache.put_many(
+                        ((props.get("contenido"), vectors[i].tolist()) for i, props in enumerate(properties) if props.get("contenido")),
+                        self.EMBEDDING_MODEL
+                    )
+            
+            inserted, errors = vector_snapshot.import_into(
+                self.weaviate_client.collections.get(target),
+                archive,
+                manifest,
+                batch_size=self.INSERT_BATCH_SIZE,
+                on_part=seed_cache,
+                progress=lambda count: self.logger.info(f"?? {count} objetos importados...")
+            )
+            registry = json.loads(archive.read("registry.json")) if "registry.json" in manifest.get("files", []) else None
+        
+        for uuid, error in list(errors.items())[:5]:
+            self.logger.error(f"? {uuid}: {error}")
+        try:
+            count = self.weaviate_client.collections.get(target).aggregate.over_all(total_count=True).total_count
+        except Exception as e:
+            self.logger.error(f"? No se pudo validar '{target}': {e}")
+            count = None
+        
+        result = {"collection": target, "objects": manifest["objects"], "inserted": inserted,
+                  "errors": len(errors), "seconds": round(time.monotonic() - started, 2)}
+        if errors or count != manifest["objects"]:
+            self.logger.error(f"? '{target}' tiene {count} objetos de {manifest['objects']} ({len(errors)} errores), no se publica")
+            self.weaviate_client.collections.delete(target)
+            result["error"] = 1
+            return result
+        
+        previous = swap_alias(self.weaviate_client, target, DEFAULT_ALIAS)
+        self._use_collection(target)
+        self.logger.info(f"? Alias '{DEFAULT_ALIAS}' -> '{target}'" + (f" (retirada: '{previous}')" if previous else ""))
+        if registry is not None:
+            self.document_registry.restore(registry)
+            self.document_registry.collection = target
+            self.journal.abandon_unfinished()
+            self.logger.info(f"?? Registro restaurado: {len(self.document_registry)} documentos")
+        self.logger.info(f"? Importación completada en {result['seconds']:.1f}s")
+        return result
 
     def remove_document_from_weaviate(self, file_path: str) -> bool:
         """Elimina un documento y todos sus chunks de Weaviate"""
@@ -718,54 +1986,174 @@ class WeaviateManager:
             if not doc_info:
                 return True
             
-            collection = self.weaviate_client.collections.get("Documento")
-            removed_count = 0
-            
-            # Si tiene chunks, eliminar todos
-            if doc_info.chunked and doc_info.chunks_count > 1:
-                for chunk_idx in range(1, doc_info.chunks_count + 1):
-                    chunk_id = generate_uuid5(f"{file_path}_chunk_{chunk_idx}_{doc_info.file_hash}_chunk_{chunk_idx}")
-                    try:
-                        collection.data.delete_by_id(chunk_id)
-                        removed_count += 1
-                    except:
-                        pass
-                self.logger.info(f"??? {removed_count} chunks eliminados de: {os.path.basename(file_path)}")
-            else:
-                # Documento individual
-                unique_id = generate_uuid5(f"{file_path}_{doc_info.file_hash}")
-                collection.data.delete_by_id(unique_id)
-                removed_count = 1
-                self.logger.info(f"??? Documento eliminado: {os.path.basename(file_path)}")
-            
-            return removed_count > 0
+            # Un solo delete_many por archivo (documento completo y todos sus chunks)
+            removed_count = self._delete_document_objects(file_path)
+            self.logger.info(f"??? {removed_count} objetos eliminados de: {os.path.basename(file_path)}")
+            return True
             
         except Exception as e:
             self.logger.error(f"? Error eliminando documento {file_path}: {e}")
             return False
 
-    def update_documents(self, root_path: str, force_rebuild: bool = False) -> Dict[str, int]:
+    def estimate_update(self, root_path: str, force_rebuild: bool = False, paranoid: bool = False) -> Dict:
+        """
+        Proyecta un update (o rebuild) sin llamadas de red: escaneo, detección de cambios,
+        extracción y chunking locales, tokens del tokenizer local y aciertos del cache de
+        embeddings. Requests, costo y duración salen de los límites configurados.
+        No escribe en el registro, y tiktoken solo se usa si su vocabulario ya está en disco
+        (si no, los tokens se estiman por caracteres y exact_tokens es False).
+        """
+        tokens, self.tokens = self.tokens, TokenCounter(self.TOKENIZER_ENCODING, offline=True)
+        try:
+            return self._estimate_update(root_path, force_rebuild, paranoid)
+        finally:
+            self.tokens = tokens
+
+    def _estimate_update(self, root_path: str, force_rebuild: bool, paranoid: bool) -> Dict:
+        found_files = self.scan_directory(root_path, paranoid=paranoid, refresh_registry=False)
+        changes = self.detect_changes(found_files, refresh_registry=False)
+        if force_rebuild:
+            paths = list(found_files)
+            self._load_near_duplicate_index(self.document_registry.keys())   # La reconstrucción parte de cero
+        else:
+            paths = changes["new"] + changes["modified"]
+            self._load_near_duplicate_index(paths)
+        
+        result = {"files": len(found_files), "to_process": len(paths),
+                  "deleted": 0 if force_rebuild else len(changes["deleted"]), "errors": 0,
+                  "chunks": 0, "chunk_tokens": 0, "duplicate_chunks": 0, "cached_chunks": 0,
+                  "embed_chunks": 0, "embed_tokens": 0, "prepare_seconds": 0.0}
+        
+        def document_windows(doc_info):
+            """Registros del documento: completos, o por ventanas si se procesa por streaming"""
+            begin = time.perf_counter()
+            if not self._should_stream(doc_info):
+                timings = {}
+                records = self._prepare_document(doc_info, timings)
+                result["prepare_seconds"] += timings.get("parse", 0.0) + timings.get("chunk", 0.0)
+                if records is None:
+                    result["errors"] += 1
+                else:
+                    yield records
+                return
+            records = self._iter_document_records(doc_info)
+            try:
+                while True:
+                    window = list(itertools.islice(records, self.EMBEDDING_BATCH_SIZE))
+                    result["prepare_seconds"] += time.perf_counter() - begin
+                    if not window:
+                        return
+                    yield window
+                    begin = time.perf_counter()
+            except Exception as e:
+                self.logger.error(f"? Error procesando {doc_info.file_name}: {e}")
+                result["errors"] += 1
+        
+        def pending_records():
+            """Chunks que irían a la API, documento por documento (o ventana por ventana)"""
+            for records in (window for path in paths for window in document_windows(found_files[path])):
+                self._mark_duplicates(records)
+                result["chunks"] += len(records)
+                result["chunk_tokens"] += sum(r.token_count for r in records)
+                result["duplicate_chunks"] += sum(1 for r in records if r.duplicate_of)
+                
+                to_embed = [r for r in records if r.text.strip() and not r.duplicate_of]
+                if self.embedding_cache is not None and to_embed:
+                    cached = self.embedding_cache.get_many((r.text for r in to_embed), self.EMBEDDING_MODEL)
+                    result["cached_chunks"] += len(cached)
+                    to_embed = [r for r in to_embed if EmbeddingCache.text_key(r.text) not in cached]
+                result["embed_chunks"] += len(to_embed)
+                result["embed_tokens"] += sum(r.token_count for r in to_embed)
+                yield from to_embed
+        
+        # Mismos lotes (items y tokens por request) que la ingesta real
+        requests = sum(1 for _ in self._iter_embedding_batches(pending_records()))
+        
+        api_seconds = 60 * max(result["embed_tokens"] / max(1, Config.EMBEDDING_TOKENS_PER_MINUTE),
+                               requests / max(1, Config.EMBEDDING_REQUESTS_PER_MINUTE))
+        prepare_seconds = result["prepare_seconds"] / max(1, self.EXTRACT_WORKERS)
+        insert_seconds = (result["chunks"] - result["duplicate_chunks"]) / max(1e-9, Config.WEAVIATE_INSERT_OBJECTS_PER_SECOND)
+        result.update({
+            "embedding_requests": requests,
+            "cost_usd": round(result["embed_tokens"] / 1e6 * Config.EMBEDDING_PRICE_PER_MILLION, 4),
+            "exact_tokens": self.tokens.exact,
+            "scan_seconds": round(self.scan_seconds, 2),
+            "prepare_seconds": round(prepare_seconds, 2),
+            "embedding_api_seconds": round(api_seconds, 2),
+            "insert_seconds": round(insert_seconds, 2),
+            # Las etapas del pipeline se solapan: la duración la marca la más lenta
+            "estimated_seconds": round(self.scan_seconds + max(prepare_seconds, api_seconds, insert_seconds), 2)
+        })
+        self.logger.info(f"?? Estimación: {result['embed_chunks']} chunks a vectorizar ({result['embed_tokens']:,} tokens) "
+                         f"en {requests} requests, US$ {result['cost_usd']:.4f}, ~{result['estimated_seconds'] / 60:.1f} min")
+        return result
+
+    def update_documents(self, root_path: str, force_rebuild: bool = False, paranoid: bool = False) -> Dict[str, int]:
         """Actualiza documentos en Weaviate"""
         stats = ProcessingStats()
+        self.run_stats = stats
+        started = time.monotonic()
         
         if not self._ensure_collection_exists():
             return {"error": 1}
         
-        found_files = self.scan_directory(root_path)
+        kind = "rebuild" if force_rebuild else "update"
+        resume_job = self.journal.find_resumable(kind, root_path)
         
-        if force_rebuild:
-            self.logger.info("?? Forzando reconstrucción completa...")
+        # En una reconstrucción nueva se hashea todo: no se confía en el registro que se va a descartar
+        found_files = self.scan_directory(root_path, paranoid=paranoid or (force_rebuild and not resume_job))
+        stats.stage("scan").add(len(found_files), self.scan_seconds, nbytes=self.scan_hashed_bytes)
+        
+        # La reconstrucción escribe en una colección versionada nueva; la publicada sigue
+        # respondiendo consultas hasta que se valida la nueva y se cambia el alias
+        live_collection = self.collection_name
+        rebuild_target = self._pending_rebuild_collection() if (force_rebuild and resume_job) else None
+        if rebuild_target and self._staged_collection() != rebuild_target:
+            # Sin registro de staging para esa colección no se sabe qué completó: se empieza de nuevo
+            self.logger.warning(f"?? No hay registro de staging para '{rebuild_target}', el rebuild no se reanuda")
+            rebuild_target = None
+        
+        if force_rebuild and rebuild_target:
+            # Reanudar: la colección nueva y el registro de staging ya contienen lo completado
+            self.logger.info(f"?? Reanudando reconstrucción interrumpida (trabajo #{resume_job}) en '{rebuild_target}'...")
+            self._use_collection(rebuild_target)
+            self._stage_registry(rebuild_target)
+            changes = {"new": list(found_files.keys()), "modified": [], "deleted": [], "unchanged": []}
+        elif force_rebuild:
             try:
-                self.weaviate_client.collections.delete("Documento")
-                self._ensure_collection_exists()
+                rebuild_target = next_version_name(self.weaviate_client, DEFAULT_ALIAS)
+                self.logger.info(f"?? Forzando reconstrucción completa en '{rebuild_target}' (publicada: '{live_collection}')...")
+                if not self._ensure_collection_exists(rebuild_target):
+                    return {"error": 1}
+                self._use_collection(rebuild_target)
                 changes = {"new": list(found_files.keys()), "modified": [], "deleted": [], "unchanged": []}
-                self.document_registry.clear()
+                self._stage_registry(rebuild_target)
+                if resume_job:
+                    # Se interrumpió antes de crear su colección: no hay nada que reanudar
+                    self.journal.finish(resume_job, "abandoned")
+                    resume_job = None
             except Exception as e:
                 self.logger.error(f"? Error en reconstrucción: {e}")
+                self._use_collection(live_collection)
+                self._unstage_registry()
                 return {"error": 1}
         else:
             changes = self.detect_changes(found_files)
         
+        # Journal: los archivos ya completados en un intento anterior se saltean
+        job_files = [("new", p) for p in changes["new"]] + [("modified", p) for p in changes["modified"]]
+        if resume_job:
+            completed = self.journal.resume(resume_job, job_files)
+            self.current_job_id = resume_job
+            if completed:
+                self.logger.info(f"?? {len(completed)} archivos ya completados en el intento anterior")
+            for change_type in ("new", "modified"):
+                changes["unchanged"] += [p for p in changes[change_type] if p in completed]
+                changes[change_type] = [p for p in changes[change_type] if p not in completed]
+        elif job_files:
+            self.current_job_id = self.journal.start(kind, root_path, job_files)
+        self.last_job_id = self.current_job_id
+        
         stats.unchanged = len(changes["unchanged"])
         
         self.logger.info(f"?? Resumen de cambios:")
@@ -782,37 +2170,49 @@ class WeaviateManager:
             else:
                 stats.errors += 1
         
-        # Procesar nuevos
-        for file_path in changes["new"]:
-            doc_info = found_files[file_path]
-            if self.add_document_to_weaviate(doc_info):
-                self.document_registry[file_path] = doc_info
-                stats.new += 1
-                if doc_info.vectorized:
-                    stats.vectorized_documents += 1
-                if doc_info.chunked:
-                    stats.chunked_files += 1
-                    stats.total_chunks += doc_info.chunks_count
-            else:
-                stats.errors += 1
+        # Procesar nuevos y modificados: extracción, embeddings y escritura en paralelo por etapas;
+        # los chunks se acumulan entre documentos y se vectorizan por lotes
+        to_process = [("new", found_files[p]) for p in changes["new"]] + \
+                     [("modified", found_files[p]) for p in changes["modified"]]
+        try:
+            stage_stats = self._run_ingest_pipeline(to_process, stats)
+        except BaseException:
+            self._checkpoint("finish", "interrupted")
+            self.current_job_id = None
+            self._use_collection(live_collection)
+            self._unstage_registry()
+            raise
         
-        # Procesar modificados
-        for file_path in changes["modified"]:
-            self.remove_document_from_weaviate(file_path)
-            
-            doc_info = found_files[file_path]
-            if self.add_document_to_weaviate(doc_info):
-                self.document_registry[file_path] = doc_info
-                stats.modified += 1
-                if doc_info.vectorized:
-                    stats.vectorized_documents += 1
-                if doc_info.chunked:
-                    stats.chunked_files += 1
-                    stats.total_chunks += doc_info.chunks_count
-            else:
-                stats.errors += 1
+        if self.cancel_event.is_set():
+            # Queda interrumpido: el próximo update/rebuild lo reanuda desde el journal
+            self.logger.info(f"?? Ingesta {'detenida' if stats.aborted else 'cancelada'} "
+                             f"({stats.new + stats.modified} documentos completados)")
+            self._checkpoint("finish", "interrupted")
+            self.current_job_id = None
+            self._use_collection(live_collection)
+            self._unstage_registry()
+            if stats.aborted:
+                self.cancel_event.clear()
+                return {"error": 1, "aborted": stats.aborted, "new": stats.new, "modified": stats.modified,
+                        "deleted": stats.deleted, "errors": stats.errors}
+            return {"error": 1, "cancelled": 1, "new": stats.new, "modified": stats.modified,
+                    "deleted": stats.deleted, "errors": stats.errors}
         
-        self._save_metadata()
+        self._requeue_orphaned_duplicates(stats)
+        
+        if force_rebuild and not self._publish_rebuild(rebuild_target, len(found_files), stats):
+            # Queda pendiente: el próximo rebuild reanuda sobre la misma colección
+            self._checkpoint("finish", "interrupted")
+            self.current_job_id = None
+            self._use_collection(live_collection)
+            self._unstage_registry()
+            return {"error": 1, "rebuild_collection": rebuild_target, "errors": stats.errors}
+        
+        self._checkpoint("finish", "completed")
+        self.current_job_id = None
+        
+        # El registro ya se confirmó documento por documento durante el pipeline
+        elapsed = time.monotonic() - started
         
         # Log final con estadísticas detalladas
         self.logger.info("="*60)
@@ -826,8 +2226,32 @@ class WeaviateManager:
         self.logger.info(f"?? Archivos con chunking: {stats.chunked_files}")
         self.logger.info(f"?? Total de chunks: {stats.total_chunks}")
         self.logger.info(f"?? Documentos vectorizados: {stats.vectorized_documents}")
+        chunk_tokens = _token_distribution(stats.chunk_tokens)
+        if chunk_tokens["count"]:
+            self.logger.info(f"?? Tokens por chunk: media {chunk_tokens['mean']}, p50 {chunk_tokens['p50']}, "
+                             f"p90 {chunk_tokens['p90']}, p99 {chunk_tokens['p99']}, máx {chunk_tokens['max']} "
+                             f"({chunk_tokens['total']} en total, tokenizer {'exacto' if self.tokens.exact else 'estimado'})")
+        if stats.truncated_chunks:
+            self.logger.warning(f"?? Chunks truncados al límite del modelo: {stats.truncated_chunks}")
+        if stats.duplicate_chunks:
+            self.logger.info(f"?? Chunks casi duplicados omitidos: {stats.duplicate_chunks} "
+                             f"({stats.duplicate_chunks} embeddings y {stats.duplicate_tokens} tokens de contexto ahorrados)")
+        if stats.requeued_documents:
+            self.logger.info(f"?? Documentos reprocesados por duplicados sin canónico: {stats.requeued_documents}")
+        self.logger.info(f"?? Requests de embeddings: {stats.embedding_requests} ({stats.embedding_retries} reintentos) para {stats.embedded_chunks} chunks")
+        cache_lookups = stats.cache_hits + stats.cache_misses
+        if self.embedding_cache is not None and cache_lookups:
+            self.logger.info(f"?? Cache de embeddings: {stats.cache_hits}/{cache_lookups} aciertos "
+                             f"({stats.cache_hits / cache_lookups:.0%}), {stats.requests_saved} requests ahorrados")
+        for name, stage in stage_stats.items():
+            self.logger.info(f"?? Etapa {name}: {stage['items']} items, {stage['per_second']}/s ({stage['busy_seconds']}s de trabajo)")
+        timings = {name: stats.stages[name].timing() for name in TIMING_STAGES if name in stats.stages}
+        for name, timing in timings.items():
+            self.logger.info(f"?? Tiempo {name}: {timing['total_seconds']}s en {timing['calls']} llamadas "
+                             f"(p50 {timing['p50_ms']} ms, p99 {timing['p99_ms']} ms)")
+        self.logger.info(f"?? Tiempo total: {elapsed:.1f}s")
         
-        return {
+        self.last_run = {
             "new": stats.new,
             "modified": stats.modified,
             "deleted": stats.deleted,
@@ -835,13 +2259,167 @@ class WeaviateManager:
             "errors": stats.errors,
             "chunked_files": stats.chunked_files,
             "total_chunks": stats.total_chunks,
-            "vectorized_documents": stats.vectorized_documents
+            "vectorized_documents": stats.vectorized_documents,
+            "embedding_requests": stats.embedding_requests,
+            "embedding_retries": stats.embedding_retries,
+            "embedded_chunks": stats.embedded_chunks,
+            "object_errors": stats.object_errors,
+            "cache_hits": stats.cache_hits,
+            "cache_misses": stats.cache_misses,
+            "cache_hit_ratio": round(stats.cache_hits / cache_lookups, 3) if cache_lookups else 0.0,
+            "requests_saved": stats.requests_saved,
+            "chunk_tokens": chunk_tokens,
+            "truncated_chunks": stats.truncated_chunks,
+            "duplicate_chunks": stats.duplicate_chunks,
+            "duplicate_tokens": stats.duplicate_tokens,
+            "requeued_documents": stats.requeued_documents,
+            "stages": stage_stats,
+            "timings": timings,
+            "scan_seconds": round(self.scan_seconds, 2),
+            "elapsed_seconds": round(elapsed, 2)
+        }
+        return self.last_run
+
+    def update_paths(self, paths: Iterable[str], root_path: str = "") -> Dict[str, int]:
+        """
+        Actualización incremental de rutas puntuales (modo watch) sin recorrer todo el árbol.
+        Una ruta que ya no existe se trata como archivo o directorio eliminado; un directorio
+        existente se recorre. Se procesa en tandas de WATCH_BATCH_SIZE archivos.
+        """
+        stats = ProcessingStats()
+        self.run_stats = stats
+        
+        # Un rebuild en otro proceso puede haber movido el alias desde la última tanda
+        self._use_collection(self._resolve_live_collection())
+        if not self._ensure_collection_exists():
+            return {"error": 1}
+        
+        batch = []
+        for file_path in self._expand_paths(paths):
+            batch.append(file_path)
+            if len(batch) >= self.WATCH_BATCH_SIZE:
+                self._update_batch(batch, root_path, stats)
+                batch = []
+        if batch:
+            self._update_batch(batch, root_path, stats)
+        
+        if stats.new or stats.modified or stats.deleted or stats.errors:
+            self.logger.info(f"?? Watch: {stats.new} nuevos, {stats.modified} modificados, "
+                             f"{stats.deleted} eliminados, {stats.errors} errores")
+        
+        return {
+            "new": stats.new,
+            "modified": stats.modified,
+            "deleted": stats.deleted,
+            "unchanged": stats.unchanged,
+            "errors": stats.errors,
+            "total_chunks": stats.total_chunks
         }
 
+    def _expand_paths(self, paths: Iterable[str]):
+        """Archivos a revisar por cada ruta tocada (incluye los registrados que ya no existen)"""
+        for path in paths:
+            if os.path.isfile(path) or path in self.document_registry:
+                yield path
+                continue
+            if os.path.isdir(path):
+                for root, dirs, files in os.walk(path):
+                    for file_name in files:
+                        yield os.path.join(root, file_name)
+            # Documentos registrados bajo el directorio que ya no están (borrado o movido)
+            prefix = path.rstrip(os.sep) + os.sep
+            for file_path in self.document_registry:
+                if file_path.startswith(prefix) and not os.path.exists(file_path):
+                    yield file_path
+
+    def _update_batch(self, file_paths: List[str], root_path: str, stats: ProcessingStats):
+        """Detecta y procesa los cambios de una tanda de archivos"""
+        found_files = {}
+        candidates = []
+        deleted = []
+        
+        for file_path in dict.fromkeys(file_paths):
+            try:
+                if not self._should_ignore_file(file_path):
+                    doc_info, needs_hash = self._stat_document(file_path)
+                    found_files[file_path] = doc_info
+                    if needs_hash:
+                        candidates.append(doc_info)
+            except FileNotFoundError:
+                if file_path in self.document_registry:
+                    deleted.append(file_path)
+            except Exception as e:
+                self.logger.warning(f"?? Error procesando {file_path}: {e}")
+        
+        if candidates:
+            with ThreadPoolExecutor(max_workers=self.HASH_WORKERS, thread_name_prefix="hash") as pool:
+                list(pool.map(self._hash_candidate, candidates))
+        
+        changes = {"new": [], "modified": [], "unchanged": []}
+        for file_path, doc_info in found_files.items():
+            changes[self._classify_change(doc_info)].append(file_path)
+        stats.unchanged += len(changes["unchanged"])
+        
+        for file_path in deleted:
+            if self.remove_document_from_weaviate(file_path):
+                del self.document_registry[file_path]
+                stats.deleted += 1
+            else:
+                stats.errors += 1
+        
+        to_process = [("new", found_files[p]) for p in changes["new"]] + \
+                     [("modified", found_files[p]) for p in changes["modified"]]
+        if not to_process:
+            # Un borrado puede dejar chunks duplicados de otros documentos sin su canónico
+            self._requeue_orphaned_duplicates(stats)
+            return
+        
+        self.current_job_id = self.journal.start("watch", root_path, [(t, d.file_path) for t, d in to_process])
+        try:
+            self._run_ingest_pipeline(to_process, stats)
+            self._requeue_orphaned_duplicates(stats)
+        except BaseException:
+            self._checkpoint("finish", "interrupted")
+            self.current_job_id = None
+            raise
+        if stats.aborted:
+            # La próxima tanda (o el próximo update) reintenta lo pendiente
+            self.cancel_event.clear()
+            self._checkpoint("finish", "interrupted")
+            self.current_job_id = None
+            return
+        self._checkpoint("finish", "completed")
+        self.current_job_id = None
+
+    def watch(self, root_path: str, polling: bool = False):
+        """Vigila el directorio y aplica los cambios de forma incremental hasta Ctrl+C"""
+        # Puesta al día de lo ocurrido con el watch detenido (barata gracias al pre-chequeo de stat)
+        self.update_documents(root_path)
+        
+        watcher = DocumentWatcher(
+            root_path,
+            on_batch=lambda paths: self.update_paths(paths, root_path),
+            registered_paths=self.document_registry.keys,
+            debounce=Config.WATCH_DEBOUNCE_SECONDS,
+            max_delay=Config.WATCH_MAX_DELAY_SECONDS,
+            max_paths=self.WATCH_BATCH_SIZE,
+            poll_interval=Config.WATCH_POLL_SECONDS,
+            polling=polling,
+            logger=self.logger
+        )
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            self.logger.info("?? Watch detenido")
+
+    def cancel(self):
+        """Pide detener la ingesta en curso (los documentos en vuelo se terminan de escribir)"""
+        self.cancel_event.set()
+
     def get_statistics(self) -> Dict:
         """Obtiene estadísticas detalladas de la base de datos"""
         try:
-            collection = self.weaviate_client.collections.get("Documento")
+            collection = self.weaviate_client.collections.get(self.collection_name)
             response = collection.aggregate.over_all(total_count=True)
             
             total_docs = response.total_count
@@ -851,13 +2429,16 @@ class WeaviateManager:
             total_chunks = sum(doc.chunks_count for doc in self.document_registry.values() if doc.chunks_count > 0)
             
             return {
+                "collection": self.collection_name,
                 "total_documents_weaviate": total_docs,
                 "total_documents_registry": len(self.document_registry),
                 "vectorized_documents": vectorized_docs,
                 "documents_with_errors": docs_with_errors,
                 "chunked_documents": chunked_docs,
                 "total_chunks_created": total_chunks,
-                "registry_file_exists": os.path.exists(self.metadata_file)
+                "registry_file_exists": os.path.exists(self.registry_file),
+                "registry_status": self.document_registry.status_counts(),
+                **self.document_registry.duplicate_stats()
             }
         except Exception as e:
             self.logger.error(f"? Error obteniendo estadísticas: {e}")
@@ -881,6 +2462,8 @@ class WeaviateManager:
                 f.write(f"Documentos con chunking: {stats.get('chunked_documents', 0)}\n")
                 f.write(f"Total chunks creados: {stats.get('total_chunks_created', 0)}\n")
                 f.write(f"Documentos con errores: {stats.get('documents_with_errors', 0)}\n")
+                f.write(f"Chunks casi duplicados omitidos: {stats.get('duplicate_chunks', 0)} "
+                        f"({stats.get('duplicate_tokens', 0):,} tokens, {stats.get('canonical_with_duplicates', 0)} canónicos con rutas alternativas)\n")
                 f.write("\n" + "="*80 + "\n")
                 f.write("DETALLE POR ARCHIVO\n")
                 f.write("="*80 + "\n")
@@ -938,41 +2521,81 @@ class WeaviateManager:
                 f.write("\n" + "="*80 + "\n")
                 f.write("CONFIGURACIÓN DE CHUNKING UTILIZADA\n")
                 f.write("="*80 + "\n")
-                f.write(f"MAX_TOKENS: {self.MAX_TOKENS}\n")
-                f.write(f"MAX_CHARS: {self.MAX_CHARS}\n")
-                f.write(f"CHUNK_OVERLAP: {self.CHUNK_OVERLAP}\n")
+                f.write(f"TOKENIZER: {self.TOKENIZER_ENCODING} ({'tiktoken' if self.tokens.exact else 'estimado len/3.5'})\n")
+                f.write(f"MAX_TOKENS (límite del modelo): {self.MAX_TOKENS}\n")
+                f.write(f"CHUNK_TOKENS: {self.CHUNK_TOKENS}\n")
+                f.write(f"CHUNK_OVERLAP_TOKENS: {self.CHUNK_OVERLAP_TOKENS}\n")
                 f.write("\nConfiguración por tipo de archivo:\n")
                 for ext, config in self.FILE_TYPE_CONFIGS.items():
-                    f.write(f"  {ext}: max_chars={config['max_chars']}, overlap={config['overlap']}\n")
+                    f.write(f"  {ext}: max_tokens={config['max_tokens']}, overlap={config['overlap']}\n")
+                
+                if self.last_run:
+                    self._write_timings_section(f, self.last_run)
+            
+            # Versión para máquinas junto al .txt (mismo nombre, extensión .json)
+            json_filename = os.path.splitext(report_filename)[0] + ".json"
+            with open(json_filename, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "generated_at": datetime.now().isoformat(),
+                    "collection": self.collection_name,
+                    "statistics": stats,
+                    "last_run": self.last_run
+                }, f, ensure_ascii=False, indent=2, default=str)
             
-            self.logger.info(f"?? Reporte generado: {report_filename}")
+            self.logger.info(f"?? Reporte generado: {report_filename} (+ {json_filename})")
             return report_filename
             
         except Exception as e:
             self.logger.error(f"? Error generando reporte: {e}")
             return ""
 
+    def _write_timings_section(self, f, run: Dict):
+        """Tiempos por etapa de la última actualización: acumulado, percentiles y volumen"""
+        f.write("\n" + "="*80 + "\n")
+        f.write("TIEMPOS POR ETAPA (última actualización)\n")
+        f.write("="*80 + "\n")
+        f.write(f"Tiempo total: {run.get('elapsed_seconds', 0)}s (escaneo {run.get('scan_seconds', 0)}s)\n")
+        f.write(f"Requests de embeddings: {run.get('embedding_requests', 0)} ({run.get('embedding_retries', 0)} reintentos), "
+                f"cache {run.get('cache_hits', 0)} aciertos / {run.get('cache_misses', 0)} fallos\n\n")
+        f.write(f"{'Etapa':<16}{'Llamadas':>9}{'Items':>8}{'Total s':>10}{'p50 ms':>9}{'p90 ms':>9}"
+                f"{'p99 ms':>9}{'Máx ms':>9}{'MB':>8}{'Tokens':>10}\n")
+        f.write("-" * 97 + "\n")
+        for name, timing in run.get("timings", {}).items():
+            f.write(f"{name:<16}{timing['calls']:>9}{timing['items']:>8}{timing['total_seconds']:>10.2f}"
+                    f"{timing['p50_ms']:>9.1f}{timing['p90_ms']:>9.1f}{timing['p99_ms']:>9.1f}{timing['max_ms']:>9.1f}"
+                    f"{timing['bytes'] / (1024 * 1024):>8.2f}{timing['tokens']:>10}\n")
+
     def cleanup(self):
         """Limpia recursos"""
+        self._unstage_registry()
+        if isinstance(self.document_registry, DocumentRegistry):
+            self.document_registry.close()
+        self.journal.close()
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
+            self.embedding_cache = None
         if self.weaviate_client:
             self.weaviate_client.close()
             self.logger.info("?? Conexión a Weaviate cerrada")
 
     def reset_database(self):
-        """Limpia completamente la base de datos"""
+        """Limpia completamente la base de datos (publica una versión vacía; la anterior se retira)"""
         try:
             self.logger.info("?? Limpiando base de datos completamente...")
             
-            if self.weaviate_client.collections.exists("Documento"):
-                self.weaviate_client.collections.delete("Documento")
-                self.logger.info("? Colección eliminada")
+            target = next_version_name(self.weaviate_client, DEFAULT_ALIAS)
+            if not self._ensure_collection_exists(target):
+                return
+            previous = swap_alias(self.weaviate_client, target, DEFAULT_ALIAS)
+            self._use_collection(target)
+            self.logger.info(f"? Alias '{DEFAULT_ALIAS}' -> '{target}'" + (f" (retirada: '{previous}')" if previous else ""))
             
             self.document_registry.clear()
-            if os.path.exists(self.metadata_file):
-                os.remove(self.metadata_file)
-                self.logger.info("? Metadatos eliminados")
+            self.document_registry.collection = target
+            self.journal.abandon_unfinished()
+            self.logger.info("? Metadatos eliminados")
             
-            self._ensure_collection_exists()
+            self.collect_old_collections()
             self.logger.info("? Base de datos limpia y lista")
             
         except Exception as e:
@@ -999,43 +2622,180 @@ class WeaviateManager:
                     # Re-procesar con nueva configuración
                     self.logger.info(f"?? Optimizando: {doc_info.file_name}")
                     
-                    # Eliminar chunks anteriores
-                    self.remove_document_from_weaviate(doc_info.file_path)
-                    
-                    # Re-procesar con nueva configuración
-                    if self.add_document_to_weaviate(doc_info):
+                    # Re-procesar con nueva configuración (upsert + limpieza de chunks sobrantes)
+                    if self.add_document_to_weaviate(doc_info, replace_existing=True):
                         self.document_registry[doc_info.file_path] = doc_info
                         optimized_count += 1
                         self.logger.info(f"? Optimizado: {doc_info.file_name}")
                     else:
                         self.logger.error(f"? Error optimizando: {doc_info.file_name}")
                         
+                except EmbeddingServiceError as e:
+                    self.logger.error(f"? Optimización detenida: {e}")
+                    break
                 except Exception as e:
                     self.logger.error(f"? Error procesando {doc_info.file_name}: {e}")
-                    
-            self._save_metadata()
             
             self.logger.info(f"?? Optimización completada: {optimized_count}/{len(chunked_docs)} documentos optimizados")
             
         except Exception as e:
             self.logger.error(f"? Error en optimización: {e}")
 
+def print_job_status() -> int:
+    """Muestra el avance del último trabajo de ingesta (no requiere conexión a Weaviate)"""
+    journal = IngestJournal(Config.DOCUMENT_REGISTRY_PATH)
+    try:
+        progress = journal.progress()
+    finally:
+        journal.close()
+    
+    if not progress:
+        print("?? No hay trabajos de ingesta registrados")
+        return 0
+    
+    def fmt(seconds):
+        return "-" if seconds is None else time.strftime("%H:%M:%S", time.gmtime(seconds))
+    
+    print(f"\n?? Trabajo #{progress['job_id']} ({progress['kind']}) - {progress['status']}")
+    print(f"   Ruta: {progress['root_path']}")
+    print(f"   Archivos: {progress['files_done']}/{progress['files_total']} ({progress['percent']}%), "
+          f"{progress['files_error']} con error, {progress['files_remaining']} pendientes")
+    print(f"   Chunks escritos: {progress['chunks_done']} de {progress['chunks_total']} preparados")
+    print(f"   Velocidad: {progress['files_per_minute']} archivos/min")
+    print(f"   Tiempo transcurrido: {fmt(progress['elapsed_seconds'])} - ETA: {fmt(progress['eta_seconds'])}")
+    if progress['status'] in IngestJournal.RESUMABLE:
+        print("   ?? Si el proceso se interrumpió, volver a ejecutar el mismo comando lo reanuda")
+    return 0
+
+def benchmark_html_parsing(root_path: str, repeat: int = 3) -> int:
+    """Compara el tiempo de parseo por MB: BeautifulSoup html.parser (anterior) vs lxml por secciones"""
+    contents = []
+    for root, dirs, files in os.walk(root_path):
+        for file_name in files:
+            if os.path.splitext(file_name)[1].lower() in (".html", ".htm"):
+                with open(os.path.join(root, file_name), "r", encoding="utf-8", errors="ignore") as f:
+                    contents.append(f.read())
+    if not contents:
+        print(f"?? No hay archivos HTML en {root_path}")
+        return 1
+    
+    megabytes = sum(len(c.encode("utf-8")) for c in contents) / (1024 * 1024)
+    max_chars = 12000   # Umbral en caracteres del chunker HTML anterior
+    
+    def previous(content):
+        text = BeautifulSoup(content, "html.parser").get_text()
+        if len(text) > max_chars:
+            BeautifulSoup(text, "html.parser")   # El chunker HTML anterior volvía a parsear el texto
+        return text
+    
+    def sections(content):
+        return parse_html_sections(content)
+    
+    print(f"\n?? {len(contents)} archivos HTML, {megabytes:.2f} MB ({repeat} repeticiones)")
+    for name, parse in (("BeautifulSoup html.parser", previous), ("lxml por secciones", sections)):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for content in contents:
+                parse(content)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"   {name:<26} {best * 1000 / megabytes:8.1f} ms/MB  ({megabytes / best:6.2f} MB/s)")
+    return 0
+
+def benchmark_chunking_memory(size_mb: int = 64) -> int:
+    """Pico de memoria (tracemalloc) al dividir un .txt sintético: en memoria vs streaming por ventanas"""
+    import random
+    import tempfile
+    import tracemalloc
+    
+    rng = random.Random(42)
+    words = ["factura", "cliente", "stock", "artículo", "depósito", "remito", "proveedor", "asiento",
+             "cuenta", "saldo", "importe", "fecha", "sucursal", "comprobante", "impuesto", "listado"]
+    chunker = DocumentChunker()
+    window_size = Config.EMBEDDING_BATCH_SIZE
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        file_path = os.path.join(tmpdir, "sintetico.txt")
+        with open(file_path, "w", encoding="utf-8") as f:
+            while f.tell() < size_mb * 1024 * 1024:
+                sentences = (" ".join(rng.choice(words) for _ in range(rng.randint(8, 20))).capitalize() + "."
+                             for _ in range(rng.randint(2, 8)))
+                f.write(" ".join(sentences) + "\n\n")
+        stat = os.stat(file_path)
+        
+        def doc_info():
+            return DocumentInfo(file_path=file_path, file_name="sintetico.txt", file_hash="", last_modified=stat.st_mtime,
+                                file_size=stat.st_size, content_length=0)
+        
+        def in_memory():
+            records = chunker._prepare_document(doc_info())
+            return len(records or [])
+        
+        def streaming():
+            count = 0
+            records = chunker._iter_document_records(doc_info())
+            while True:
+                window = list(itertools.islice(records, window_size))
+                if not window:
+                    return count
+                count += len(window)
+        
+        print(f"\n?? Archivo sintético de {stat.st_size / (1024 * 1024):.1f} MB (ventanas de {window_size} chunks)")
+        for name, run in (("en memoria", in_memory), ("streaming", streaming)):
+            tracemalloc.start()
+            started = time.perf_counter()
+            chunks = run()
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"   {name:<12} {chunks:>8} chunks  pico {peak / (1024 * 1024):8.1f} MB  "
+                  f"({peak / stat.st_size:5.2f}x el archivo)  {elapsed:6.1f}s")
+    return 0
+
 def main():
     parser = argparse.ArgumentParser(description="Gestor de documentos Weaviate con chunking inteligente optimizado")
-    parser.add_argument("command", choices=["update", "rebuild", "stats", "scan", "reset", "report", "optimize"], 
+    parser.add_argument("command", choices=["update", "rebuild", "stats", "scan", "reset", "report", "optimize", "status", "gc", "watch", "bench-parse", "export", "import", "verify", "estimate", "bench-memory"], 
                        help="Comando a ejecutar")
     parser.add_argument("--path", "-p", default="c:\\Local\\easysoft\\html", 
                        help="Ruta del directorio a procesar")
     parser.add_argument("--api-key", help="API key de OpenAI")
+    parser.add_argument("--extract-workers", type=int, help="Procesos de extracción/chunking (0 = en este proceso)")
+    parser.add_argument("--embed-workers", type=int, help="Hilos de embeddings (0 = sin pool)")
+    parser.add_argument("--force", action="store_true",
+                       help="gc: eliminar colecciones retiradas sin esperar el período de gracia")
+    parser.add_argument("--paranoid", action="store_true",
+                       help="Hashea todos los archivos en lugar de confiar en tamaño/fecha")
+    parser.add_argument("--polling", action="store_true",
+                       help="watch: sondear el árbol en lugar de usar eventos del sistema de archivos")
+    parser.add_argument("--rebuild", action="store_true",
+                       help="estimate: proyectar una reconstrucción completa en lugar de un update")
+    parser.add_argument("--fix", action="store_true",
+                       help="verify: eliminar huérfanos y reencolar documentos incompletos")
+    parser.add_argument("--size-mb", type=int, default=64,
+                       help="bench-memory: tamaño del archivo sintético")
+    parser.add_argument("--file", "-f",
+                       help="export/import: archivo .zip con la colección y sus vectores")
     
     args = parser.parse_args()
     
+    if args.command == "status":
+        return print_job_status()
+    if args.command == "bench-parse":
+        return benchmark_html_parsing(args.path)
+    if args.command == "bench-memory":
+        return benchmark_chunking_memory(args.size_mb)
+    
     try:
-        manager = WeaviateManager(args.api_key)
+        manager = WeaviateManager(args.api_key, offline=args.command == "estimate")
+        if args.extract_workers is not None:
+            manager.EXTRACT_WORKERS = max(0, args.extract_workers)
+        if args.embed_workers is not None:
+            manager.EMBED_WORKERS = max(0, args.embed_workers)
         
         if args.command == "update":
             print("?? Actualizando documentos con chunking inteligente optimizado...")
-            stats = manager.update_documents(args.path)
+            stats = manager.update_documents(args.path, paranoid=args.paranoid)
             
             if "error" not in stats:
                 # Generar reporte automáticamente
@@ -1050,10 +2810,56 @@ def main():
                 report_file = manager.generate_vectorization_report()
                 print(f"\n?? Reporte generado: {report_file}")
                 
+        elif args.command == "watch":
+            print("?? Vigilando cambios (Ctrl+C para salir)...")
+            manager.watch(args.path, polling=args.polling)
+            
         elif args.command == "reset":
             print("??? Reseteando base de datos...")
             manager.reset_database()
             
+        elif args.command == "gc":
+            print("??? Eliminando colecciones retiradas...")
+            deleted = manager.collect_old_collections(grace_hours=0 if args.force else None)
+            print(f"? {len(deleted)} colecciones eliminadas: {', '.join(deleted) if deleted else '-'}")
+            
+        elif args.command == "export":
+            output_path = args.file or f"documento_vectores_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+            manifest = manager.export_snapshot(output_path)
+            print(f"? {manifest['objects']} objetos exportados a {output_path}")
+            
+        elif args.command == "import":
+            if not args.file:
+                print("? Indicar el archivo a importar con --file")
+                return 1
+            result = manager.import_snapshot(args.file)
+            if "error" in result:
+                print(f"? Importación no publicada: {result['inserted']}/{result['objects']} objetos, {result['errors']} errores")
+                return 1
+            print(f"? {result['inserted']} objetos importados en '{result['collection']}' ({result['seconds']}s)")
+            
+        elif args.command == "estimate":
+            print(f"?? Estimando {'reconstrucción' if args.rebuild else 'actualización'} sin llamadas de red...")
+            result = manager.estimate_update(args.path, force_rebuild=args.rebuild, paranoid=args.paranoid)
+            for key, value in result.items():
+                print(f"   {key}: {value}")
+            if not result["exact_tokens"]:
+                print("?? tiktoken o su vocabulario en disco no disponible: tokens estimados por caracteres")
+            
+        elif args.command == "verify":
+            print("?? Comparando la colección con el registro...")
+            result = manager.verify_collection(fix=args.fix)
+            for key, value in result.items():
+                if key != "orphan_sample":
+                    print(f"   {key}: {value}")
+            for line in result["orphan_sample"]:
+                print(f"      - {line}")
+            if "error" in result:
+                print(f"? No se corrigió nada: {result['error']}")
+                return 1
+            if args.fix and result["requeued_documents"]:
+                print(f"?? {result['requeued_documents']} documentos se reprocesarán en el próximo update")
+            
         elif args.command == "optimize":
             print("?? Optimizando chunks existentes...")
             manager.optimize_existing_chunks()
@@ -1076,10 +2882,10 @@ def main():
                 
         elif args.command == "scan":
             print("?? Escaneando directorio...")
-            found_files = manager.scan_directory(args.path)
+            found_files = manager.scan_directory(args.path, paranoid=args.paranoid)
             changes = manager.detect_changes(found_files)
             
-            print(f"\n?? Análisis de cambios:")
+            print(f"\n?? Análisis de cambios ({len(found_files)} archivos escaneados en {manager.scan_seconds:.2f}s):")
             for change_type, files in changes.items():
                 print(f"   {change_type}: {len(files)} archivos")
                 if len(files) <= 10:
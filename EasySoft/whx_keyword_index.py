@@ -0,0 +1,172 @@
+# whx_keyword_index.py - BM25 en memoria sobre el índice de búsqueda de RoboHelp (whxdata)
+import json
+import os
+import re
+import unicodedata
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import snowballstemmer
+except ImportError:   # Sin stemmer se busca el término del índice que sea prefijo más largo
+    snowballstemmer = None
+
+# Campos del índice lunr de RoboHelp: "0" es el título del tema, el resto cuerpo/metadatos
+FIELD_BOOSTS = {"0": 2.0}
+_TOKEN_SPLIT = re.compile(r"[\s\-]+")
+_TRIM = re.compile(r"^\W+|\W+$")
+
+
+@dataclass
+class KeywordHit:
+    """Tema de la ayuda encontrado por palabras clave"""
+    rel_url: str
+    title: str
+    score: float
+
+
+def _read_exports(path: str):
+    """Contenido de un archivo 'rh._.exports(...)' de whxdata"""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    data = json.loads(content[content.index("(") + 1:content.rindex(")")])
+    return json.loads(data) if isinstance(data, str) else data
+
+
+def _strip_accents(text: str) -> str:
+    # Igual que el stemmer español: quita tildes y diéresis pero conserva la ñ
+    text = unicodedata.normalize("NFD", text.replace("ñ", "\0"))
+    return "".join(c for c in text if unicodedata.category(c) != "Mn").replace("\0", "ñ")
+
+
+class KeywordIndex:
+    """
+    Postings compactos (formato CSR: términos -> tramos de arrays numpy de temas y frecuencias)
+    cargados del índice invertido que RoboHelp ya genera, con ranking BM25 en el proceso.
+    Los términos del índice están "stemmeados" con Snowball español (pipeline de lunr), así que
+    la consulta pasa por el mismo análisis: tokens, stopwords.xml y stemmer.
+    """
+
+    def __init__(self, terms: Dict[str, int], offsets: np.ndarray, doc_ids: np.ndarray, freqs: np.ndarray,
+                 doc_lengths: np.ndarray, topics: List[Dict], stopwords: set, k1: float = 1.2, b: float = 0.75):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.freqs = freqs
+        self.doc_lengths = doc_lengths
+        self.topics = topics
+        self.stopwords = stopwords
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(doc_lengths.mean()) if doc_lengths.size else 0.0
+        document_freqs = np.diff(offsets)
+        n = len(topics)
+        self.idf = np.log(1 + (n - document_freqs + 0.5) / (document_freqs + 0.5))
+        # Parte del denominador BM25 que solo depende del tema
+        self._norm = k1 * (1 - b + b * doc_lengths / max(self.avg_length, 1e-9))
+        self._stemmer = snowballstemmer.stemmer("spanish") if snowballstemmer is not None else None
+        # Las consultas repiten palabras: el stemmer (Python puro) se ejecuta una vez por palabra
+        self._stem = lru_cache(maxsize=8192)(self._stem)
+
+    def __len__(self) -> int:
+        return len(self.topics)
+
+    def _stem(self, token: str) -> Optional[str]:
+        if self._stemmer is not None:
+            return self._stemmer.stemWord(token)
+        token = _strip_accents(token)
+        for end in range(len(token), 2, -1):
+            if token[:end] in self.terms:
+                return token[:end]
+        return token
+
+    def analyze(self, text: str) -> List[str]:
+        """Términos de la consulta tal como aparecen en el índice"""
+        terms = []
+        for token in _TOKEN_SPLIT.split(text.lower()):
+            token = _TRIM.sub("", token)
+            if not token or token in self.stopwords:
+                continue
+            term = self._stem(token)
+            if term and term not in terms:
+                terms.append(term)
+        return terms
+
+    def search(self, query: str, limit: int = 10) -> List[KeywordHit]:
+        """Temas ordenados por BM25 (solo los que contienen algún término de la consulta)"""
+        scores = np.zeros(len(self.topics), dtype=np.float32)
+        for term in self.analyze(query):
+            index = self.terms.get(term)
+            if index is None:
+                continue
+            start, end = self.offsets[index], self.offsets[index + 1]
+            docs, tf = self.doc_ids[start:end], self.freqs[start:end]
+            scores[docs] += self.idf[index] * tf * (self.k1 + 1) / (tf + self._norm[docs])
+
+        matched = np.flatnonzero(scores)
+        if not matched.size:
+            return []
+        top = matched[np.argsort(-scores[matched], kind="stable")[:limit]]
+        return [KeywordHit(self.topics[i]["relUrl"], self.topics[i].get("title", ""), float(scores[i])) for i in top]
+
+
+def _load_stopwords(path: str) -> set:
+    if not os.path.exists(path):
+        return set()
+    return {wd.get("name", "").lower() for wd in ET.parse(path).getroot().iter("wd") if wd.get("name")}
+
+
+def load_keyword_index(whxdata_path: str, k1: float = 1.2, b: float = 0.75) -> KeywordIndex:
+    """Lee search_db.js, los tramos del índice invertido, search_topics.js y stopwords.xml"""
+    db = _read_exports(os.path.join(whxdata_path, "search_db.js"))
+    metadata = _read_exports(os.path.join(whxdata_path, "search_topics.js"))["metadata"]
+
+    # Las referencias de lunr son strings ("0".."N"); se renumeran a posiciones contiguas
+    refs = sorted(metadata, key=int)
+    doc_index = {ref: i for i, ref in enumerate(refs)}
+    topics = [metadata[ref] for ref in refs]
+
+    postings: Dict[str, Dict[int, float]] = {}
+    for chunk in db.get("invertedIndexChunks", []):
+        for term, fields in _read_exports(os.path.join(whxdata_path, chunk)):
+            if not term:
+                continue
+            term_postings = postings.setdefault(term, {})
+            for field_name, docs in fields.items():
+                if field_name == "_index":
+                    continue
+                boost = FIELD_BOOSTS.get(field_name, 1.0)
+                for ref, data in docs.items():
+                    doc = doc_index.get(ref)
+                    if doc is not None:
+                        occurrences = len(data.get("position", [])) or 1
+                        term_postings[doc] = term_postings.get(doc, 0.0) + boost * occurrences
+
+    terms, offsets, doc_ids, freqs = {}, [0], [], []
+    doc_lengths = np.zeros(len(topics), dtype=np.float32)
+    for term in sorted(postings):
+        term_postings = postings[term]
+        if not term_postings:
+            continue
+        terms[term] = len(terms)
+        for doc in sorted(term_postings):
+            doc_ids.append(doc)
+            freqs.append(term_postings[doc])
+            doc_lengths[doc] += term_postings[doc]
+        offsets.append(len(doc_ids))
+
+    return KeywordIndex(
+        terms=terms,
+        offsets=np.asarray(offsets, dtype=np.int32),
+        doc_ids=np.asarray(doc_ids, dtype=np.int32),
+        freqs=np.asarray(freqs, dtype=np.float32),
+        doc_lengths=doc_lengths,
+        topics=topics,
+        stopwords=_load_stopwords(os.path.join(whxdata_path, "stopwords.xml")),
+        k1=k1,
+        b=b
+    )